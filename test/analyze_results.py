@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Streaming Results Analytics
+Aggregates accumulated classification results without loading them: each
+JSONL file is memory-mapped and read line by line from where the previous
+analysis stopped. The aggregates and per-file offsets are persisted, so a
+re-run only parses records added since the last one.
+
+Reports:
+- template frequency over sliding windows (last 1/7/30 days by default)
+- per-subreddit hit rates (eligible / generated per analyzed meme)
+- eligibility and generation funnel
+- confidence distribution (histogram, percentiles, mean per template)
+
+Inputs default to the append-only results store partitions
+(results/store/date=*/run=*.jsonl). Extra files must also be append-only:
+a file that was replaced or shrank since the last run (like
+meme_results.jsonl, which every run rewrites) is skipped with a warning
+instead of being counted twice; --reset starts over.
+
+Usage:
+    python analyze_results.py [files ...] [--windows 1,7,30] [--top 10] [--reset]
+"""
+
+import os
+import sys
+import json
+import glob
+import mmap
+import hashlib
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from results_store import RESULTS_STORE_DIR
+
+ANALYTICS_STATE = os.getenv("ANALYTICS_STATE", os.path.join("results", "analytics_state.json"))
+ANALYTICS_WINDOWS = [int(d) for d in os.getenv("ANALYTICS_WINDOWS", "1,7,30").split(",") if d.strip()]
+CONFIDENCE_BINS = 20
+
+_STATE_VERSION = 3  # 2: template days bucketed by run, not file mtime; 3: per-file head digests
+_FUNNEL_STAGES = ("analyzed", "eligible", "selected", "generated", "billing_required")
+
+
+def default_inputs() -> List[str]:
+    return sorted(glob.glob(os.path.join(RESULTS_STORE_DIR, "date=*", "run=*.jsonl")))
+
+
+def _head_digest(path: str, offset: int) -> str:
+    """Hash of the file's first (up to 4 KB of) already-scanned bytes, to tell an append from a rewrite"""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read(min(offset, 4096))).hexdigest()
+
+
+def iter_new_records(path: str, offset: int = 0) -> Iterator[Tuple[int, Optional[Dict[str, Any]]]]:
+    """
+    (end offset, record) for each complete line after `offset`; record is
+    None for a blank or corrupt line, so the scan position still moves past
+    it. The file is memory-mapped, so only the pages actually read are
+    brought in; a partial last line (a writer still appending) is left for
+    the next run.
+    """
+    size = os.path.getsize(path)
+    if size <= offset:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        position = offset
+        while position < size:
+            end = mm.find(b"\n", position)
+            if end < 0:
+                break
+            line = mm[position:end]
+            position = end + 1
+            record = None
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    pass  # A corrupt line is skipped, not fatal
+            yield position, record
+
+
+def partition_day(path: str) -> Optional[str]:
+    """The YYYY-MM-DD of a results-store partition path (date=.../run=....jsonl), or None"""
+    directory = os.path.basename(os.path.dirname(os.path.abspath(path)))
+    return directory[len("date="):] if directory.startswith("date=") else None
+
+
+def _day(record: Dict[str, Any], partition: Optional[str] = None) -> str:
+    """
+    Day of the run that produced the record: its run_id, else the partition
+    date. The timestamp is the image file's mtime, i.e. when the blob was
+    first downloaded (possibly many runs earlier), so it is the last resort.
+    """
+    run_id = str(record.get("run_id") or "")
+    if len(run_id) >= 8 and run_id[:8].isdigit():
+        return f"{run_id[:4]}-{run_id[4:6]}-{run_id[6:8]}"
+    if partition:
+        return partition
+    timestamp = record.get("timestamp")
+    if isinstance(timestamp, (int, float)) and timestamp > 0:
+        return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y-%m-%d")
+    return "unknown"
+
+
+def subreddit_of(record: Dict[str, Any]) -> str:
+    """Subreddit from the result, or from polling's '<rank>_<post id>_<subreddit>_<title>' filename"""
+    if record.get("subreddit"):
+        return str(record["subreddit"])
+    parts = os.path.basename(str(record.get("file") or "")).split("_")
+    return parts[2] if len(parts) >= 4 and parts[0].isdigit() else "unknown"
+
+
+class ResultsAnalyzer:
+    """Incremental aggregates over result records; state is plain JSON"""
+
+    def __init__(self, state_path: str = ANALYTICS_STATE):
+        self.state_path = state_path
+        self.files: Dict[str, Dict[str, int]] = {}
+        self.records = 0
+        self.template_days: Dict[str, Counter] = defaultdict(Counter)
+        self.subreddits: Dict[str, Counter] = defaultdict(Counter)
+        self.funnel = Counter()
+        self.confidence_hist = [0] * CONFIDENCE_BINS
+        self.template_confidence: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0])
+        self.load()
+
+    # ----------------------------------------------------------- state
+    def load(self):
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Ignoring unreadable analytics state {self.state_path}: {e}")
+            return
+        if state.get("version") != _STATE_VERSION:
+            return
+        self.files = state["files"]
+        self.records = state["records"]
+        for template, days in state["template_days"].items():
+            self.template_days[template] = Counter(days)
+        for subreddit, counts in state["subreddits"].items():
+            self.subreddits[subreddit] = Counter(counts)
+        self.funnel = Counter(state["funnel"])
+        self.confidence_hist = state["confidence_hist"]
+        for template, pair in state["template_confidence"].items():
+            self.template_confidence[template] = pair
+
+    def save(self):
+        state = {
+            "version": _STATE_VERSION,
+            "updated_at": time.time(),
+            "files": self.files,
+            "records": self.records,
+            "template_days": self.template_days,
+            "subreddits": self.subreddits,
+            "funnel": self.funnel,
+            "confidence_hist": self.confidence_hist,
+            "template_confidence": self.template_confidence,
+        }
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def reset(self):
+        self.files, self.records = {}, 0
+        self.template_days.clear()
+        self.subreddits.clear()
+        self.funnel.clear()
+        self.confidence_hist = [0] * CONFIDENCE_BINS
+        self.template_confidence.clear()
+
+    # ------------------------------------------------------- ingestion
+    def add(self, record: Dict[str, Any], partition: Optional[str] = None):
+        template = record.get("template") or "Unknown"
+        confidence = float(record.get("confidence") or 0.0)
+        eligible = bool(record.get("nft_eligible"))
+        generated = bool(record.get("nft_generated"))
+        selected = generated or record.get("nft_rank") is not None or bool(record.get("billing_required"))
+
+        self.records += 1
+        self.template_days[template][_day(record, partition)] += 1
+        counts = self.subreddits[subreddit_of(record)]
+        counts["analyzed"] += 1
+        counts["eligible"] += eligible
+        counts["generated"] += generated
+
+        self.funnel["analyzed"] += 1
+        self.funnel["eligible"] += eligible
+        self.funnel["selected"] += selected
+        self.funnel["generated"] += generated
+        self.funnel["billing_required"] += bool(record.get("billing_required"))
+
+        bucket = min(CONFIDENCE_BINS - 1, max(0, int(confidence * CONFIDENCE_BINS)))
+        self.confidence_hist[bucket] += 1
+        pair = self.template_confidence[template]
+        pair[0] += confidence
+        pair[1] += 1
+
+    def update(self, paths: List[str]) -> int:
+        """
+        Process only bytes appended since the last update; returns new records.
+        A file that was replaced (new inode or different leading bytes) or
+        shrank is not append-only: it is skipped with a warning rather than
+        counted again from the start.
+        """
+        added = 0
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            key = os.path.abspath(path)
+            seen = self.files.get(key)
+            offset = 0
+            if seen:
+                if (seen.get("inode") != stat.st_ino or seen["offset"] > stat.st_size
+                        or seen.get("head") != _head_digest(path, seen["offset"])):
+                    print(f"[WARNING] Skipping {path}: rewritten since the last analysis (not append-only); "
+                          f"use --reset to recount everything")
+                    continue
+                offset = seen["offset"]
+            partition = partition_day(path)
+            for offset, record in iter_new_records(path, offset):
+                if record is not None:
+                    self.add(record, partition)
+                    added += 1
+            self.files[key] = {"offset": offset, "inode": stat.st_ino, "head": _head_digest(path, offset)}
+        return added
+
+    # ---------------------------------------------------------- reports
+    def template_window(self, days: int, now: Optional[float] = None, top: int = 10) -> List[Tuple[str, int]]:
+        """Most frequent templates in the last `days` days (by result day)"""
+        now = now if now is not None else time.time()
+        cutoff = datetime.fromtimestamp(now - days * 86400, tz=timezone.utc).strftime("%Y-%m-%d")
+        totals = Counter({
+            template: sum(c for day, c in per_day.items() if day != "unknown" and day > cutoff)
+            for template, per_day in self.template_days.items()
+        })
+        return [(t, c) for t, c in totals.most_common(top) if c > 0]
+
+    def subreddit_rates(self) -> List[Tuple[str, int, float, float]]:
+        """(subreddit, analyzed, eligible rate, generated rate), most analyzed first"""
+        rows = []
+        for subreddit, counts in self.subreddits.items():
+            analyzed = counts["analyzed"] or 1
+            rows.append((subreddit, counts["analyzed"], counts["eligible"] / analyzed, counts["generated"] / analyzed))
+        return sorted(rows, key=lambda row: -row[1])
+
+    def funnel_rates(self) -> List[Tuple[str, int, float]]:
+        """(stage, count, fraction of analyzed)"""
+        analyzed = self.funnel["analyzed"] or 1
+        return [(stage, self.funnel[stage], self.funnel[stage] / analyzed) for stage in _FUNNEL_STAGES]
+
+    def confidence_percentile(self, q: float) -> float:
+        """Approximate percentile (0-100) from the histogram, at bin resolution"""
+        total = sum(self.confidence_hist)
+        if not total:
+            return 0.0
+        target = q / 100 * total
+        running = 0
+        for i, count in enumerate(self.confidence_hist):
+            running += count
+            if running >= target:
+                return (i + 1) / CONFIDENCE_BINS
+        return 1.0
+
+    def report(self, windows: List[int] = ANALYTICS_WINDOWS, top: int = 10):
+        print(f"\n[ANALYTICS] {self.records:,} results from {len(self.files)} files")
+        print("=" * 50)
+        for days in windows:
+            print(f"\nTop templates, last {days} day{'s' if days != 1 else ''}:")
+            for template, count in self.template_window(days, top=top):
+                print(f"  {template:<35} {count}")
+
+        print("\nFunnel:")
+        for stage, count, rate in self.funnel_rates():
+            print(f"  {stage:<17} {count:>8,}  ({rate*100:5.1f}%)")
+
+        print("\nSubreddit hit rates (eligible / generated):")
+        for subreddit, analyzed, eligible, generated in self.subreddit_rates()[:top]:
+            print(f"  {subreddit:<20} {analyzed:>6,} analyzed  {eligible*100:5.1f}% / {generated*100:5.1f}%")
+
+        print("\nConfidence distribution:")
+        peak = max(self.confidence_hist) or 1
+        for i, count in enumerate(self.confidence_hist):
+            if count:
+                print(f"  {i/CONFIDENCE_BINS:.2f}-{(i+1)/CONFIDENCE_BINS:.2f} {count:>8,} {'#' * max(1, round(count / peak * 30))}")
+        print(f"  p50 <= {self.confidence_percentile(50):.2f}, p90 <= {self.confidence_percentile(90):.2f}, "
+              f"p99 <= {self.confidence_percentile(99):.2f}")
+
+        means = sorted(((s / n, t, n) for t, (s, n) in self.template_confidence.items() if n), key=lambda r: -r[2])
+        print("\nMean confidence by template:")
+        for mean, template, n in means[:top]:
+            print(f"  {template:<35} {mean:.2f}  (n={n:,})")
+
+
+def main(argv: List[str]) -> int:
+    def option(name: str, default: str) -> str:
+        if name in argv:
+            i = argv.index(name)
+            value = argv[i + 1]
+            del argv[i:i + 2]
+            return value
+        return default
+
+    windows = [int(d) for d in option("--windows", ",".join(map(str, ANALYTICS_WINDOWS))).split(",") if d]
+    top = int(option("--top", "10"))
+    reset = "--reset" in argv
+    paths = [a for a in argv if a != "--reset"] or default_inputs()
+    for path in paths:
+        if partition_day(path) is None:
+            print(f"[WARNING] {path} is not a results-store partition; it is only counted correctly "
+                  f"if it is append-only (meme_results.jsonl is rewritten by every run)")
+
+    analyzer = ResultsAnalyzer()
+    if reset:
+        analyzer.reset()
+    started = time.perf_counter()
+    added = analyzer.update(paths)
+    analyzer.save()
+    print(f"[ANALYTICS] Processed {added:,} new results in {time.perf_counter() - started:.2f}s "
+          f"(state: {analyzer.state_path})")
+    analyzer.report(windows, top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Offline Pipeline Benchmark
+Runs the real pipeline stages against the local stand-ins in fake_clients.py
+(no credentials, no network), so throughput regressions show up before a
+deploy instead of in production:
+
+1. poll.listings  - polling.collect_memes() against FakeRedditClient
+2. poll.download  - polling.download_top_memes() from a local image server
+3. classify       - gemini_fixed classification under the adaptive engine
+4. select         - RankingEngine over the results, scaled up to --select-n
+5. generate       - gemini_fixed.generate_nft_image(): Stability AI (fake
+                    server) -> Imagen (no billing) -> local fallback
+6. fallback       - the local NumPy renderer on its own
+
+Reports per-stage throughput, p50/p95/p99 latency, peak RSS and the API
+calls each fake served. Latencies in the profiles are roughly a tenth of
+production so a run takes well under a minute; --latency-scale changes that.
+
+Usage:
+    python benchmark_pipeline.py [--profile realistic] [--memes 40] [--generate 6]
+                                 [--error-rate R] [--throttle-rate R] [--latency-scale X]
+                                 [--json report.json] [--baseline report.json] [--verbose]
+
+Profiles: ideal, realistic, flaky (5% errors), throttled (15% 429s)
+With --baseline, exits 1 if a stage is more than BENCH_TOLERANCE slower.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from fake_clients import FakeApiServer, FakeGenaiClient, FakeRedditClient, FaultProfile, jitter, varied_classification
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+BENCH_TOLERANCE = float(os.getenv("BENCH_TOLERANCE", "0.2"))  # Allowed slowdown vs. a baseline (20%)
+BENCH_NOISE_FLOOR_MS = 5.0  # p95 changes smaller than this are never reported
+SELECT_REPEATS = 10
+RETRY_AFTER = 1  # Seconds the fakes ask clients to wait after a 429
+
+# Per-service latency range (seconds), error rate and 429 rate
+PROFILES: Dict[str, Dict[str, Dict[str, Any]]] = {
+    "ideal": {
+        "reddit": {"latency": (0.0, 0.0)},
+        "images": {"latency": (0.0, 0.0)},
+        "gemini": {"latency": (0.0, 0.0)},
+        "stability": {"latency": (0.0, 0.0)},
+    },
+    "realistic": {
+        "reddit": {"latency": (0.03, 0.12)},
+        "images": {"latency": (0.005, 0.03)},
+        "gemini": {"latency": (0.2, 0.6)},
+        "stability": {"latency": (0.3, 0.9)},
+    },
+}
+PROFILES["flaky"] = {service: dict(spec, error_rate=0.05) for service, spec in PROFILES["realistic"].items()}
+PROFILES["throttled"] = {service: dict(spec, throttle_rate=0.15) for service, spec in PROFILES["realistic"].items()}
+
+# The benchmark measures the code, not caches or Reddit's quota: every run starts cold
+for _name, _value in {"CASCADE": "0", "USE_CLASSIFY_CACHE": "0", "GEN_CACHE": "0", "RESULTS_STORE": "0",
+                      "INGEST_INCREMENTAL": "0", "REDDIT_QPM": "100000", "REDDIT_BURST": "1000"}.items():
+    os.environ.setdefault(_name, _value)
+
+
+def fault_profiles(name: str, latency_scale: float = 1.0, error_rate: Optional[float] = None,
+                   throttle_rate: Optional[float] = None, seed: int = 0) -> Dict[str, FaultProfile]:
+    """One seeded FaultProfile per service for a named profile, with optional overrides"""
+    profiles = {}
+    for i, (service, spec) in enumerate(PROFILES[name].items()):
+        low, high = spec["latency"]
+        profiles[service] = FaultProfile(
+            latency=jitter(low * latency_scale, high * latency_scale, seed + i) if high > 0 else 0.0,
+            error_rate=spec.get("error_rate", 0.0) if error_rate is None else error_rate,
+            throttle_rate=spec.get("throttle_rate", 0.0) if throttle_rate is None else throttle_rate,
+            retry_after=RETRY_AFTER,
+            seed=seed + 100 + i,
+        )
+    return profiles
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1048576 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB on Linux
+
+
+class StageStats:
+    """Wall time, item count and per-call latencies of one benchmark stage"""
+
+    def __init__(self, name: str, unit: str = "items"):
+        self.name = name
+        self.unit = unit
+        self.items = 0
+        self.errors = 0
+        self.wall = 0.0
+        self.latencies: List[float] = []
+        self.peak_rss_mb: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def timed(self, fn: Callable) -> Callable:
+        """Wrap fn so every call's latency is recorded (exceptions count as errors)"""
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                raise
+            finally:
+                self.record(time.perf_counter() - started)
+        return wrapper
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.latencies.append(seconds)
+
+    @contextlib.contextmanager
+    def measure(self):
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.wall = time.perf_counter() - started
+            self.peak_rss_mb = peak_rss_mb()
+
+    def percentile(self, q: float) -> float:
+        return float(np.percentile(self.latencies, q)) * 1000 if self.latencies else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "unit": self.unit,
+            "items": self.items,
+            "errors": self.errors,
+            "calls": len(self.latencies),
+            "wall_s": round(self.wall, 4),
+            "throughput": round(self.items / self.wall, 3) if self.wall > 0 else 0.0,
+            "p50_ms": round(self.percentile(50), 2),
+            "p95_ms": round(self.percentile(95), 2),
+            "p99_ms": round(self.percentile(99), 2),
+            "peak_rss_mb": round(self.peak_rss_mb, 1) if self.peak_rss_mb is not None else None,
+        }
+
+
+def _quiet(verbose: bool):
+    """The stages print per-meme progress; keep the report readable unless --verbose"""
+    return contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+
+def run_benchmark(profile: str = "realistic", memes: int = 40, generate: int = 6, select_n: int = 100_000,
+                  latency_scale: float = 1.0, error_rate: Optional[float] = None,
+                  throttle_rate: Optional[float] = None, seed: int = 0, verbose: bool = False) -> Dict[str, Any]:
+    """Run every stage once in a scratch directory; returns the report dict"""
+    faults = fault_profiles(profile, latency_scale, error_rate, throttle_rate, seed)
+    server = FakeApiServer(image_faults=faults["images"], stability_faults=faults["stability"])
+
+    # Pipeline modules read their endpoints at import time, so they are imported once the fake server is up.
+    # Host and key are always overridden: a benchmark must never reach the real Stability AI API.
+    os.environ["STABILITY_API_HOST"] = server.url
+    os.environ["STABILITY_API_KEY"] = "benchmark-key"
+    import polling
+    import gemini_fixed
+    import fallback_image_generator
+    from meme_store import MemeStore
+    from meme_downloader import MemeDownloader
+    from classification_engine import ClassificationEngine
+    from image_preprocess import needs_preprocess, preprocess_many
+    from ranking_engine import RankingEngine
+    from stability_client import get_stability_client
+
+    reddit = FakeRedditClient(server.url, faults=faults["reddit"], seed=seed)
+    client = FakeGenaiClient(responder=varied_classification, faults=faults["gemini"])
+    polling.create_reddit = lambda: reddit  # One thread-safe fake serves every ingest worker
+
+    stages: Dict[str, StageStats] = {}
+    workdir = tempfile.mkdtemp(prefix="meme_bench_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        # 1. Listings: fetch, dedupe, score and keep the top `memes`
+        stage = stages["poll.listings"] = StageStats("poll.listings", "posts")
+        with stage.measure(), _quiet(verbose):
+            top, _, _ = polling.collect_memes(polling.SUBREDDITS, top_k=memes)
+        stage.latencies = list(reddit.latencies)
+        stage.items = reddit.stats()["posts"]
+        stage.errors = reddit.stats()["failed"]
+
+        # 2. Downloads into the content-addressed store
+        stage = stages["poll.download"] = StageStats("poll.download", "images")
+        server.preload([meme.url for meme in top])
+
+        class TimedDownloader(MemeDownloader):
+            def download(self, url, dest_path):
+                return stage.timed(super().download)(url, dest_path)
+
+        with stage.measure(), _quiet(verbose), TimedDownloader() as downloader:
+            downloads = polling.download_top_memes(top, store=MemeStore(), downloader=downloader)
+        files = [os.path.join(polling.SAVE_DIR, d["filename"]) for d in downloads if not d["error"]]
+        stage.items = len(files)
+        stage.errors = len(downloads) - len(files)
+
+        # 3. Classification, as in gemini_fixed.main(): preprocess, then batched calls under the adaptive limit
+        stage = stages["classify"] = StageStats("classify", "images")
+        engine = ClassificationEngine()
+        engine.call = stage.timed(engine.call)  # One sample per request, including its 429 retries
+        with stage.measure(), _quiet(verbose):
+            to_prepare = [path for path in files if needs_preprocess(path)]
+            prepared = {item["path"]: item for item in preprocess_many(to_prepare)} if to_prepare else {}
+            if gemini_fixed.CLASSIFY_BATCH_SIZE > 1:
+                size = gemini_fixed.CLASSIFY_BATCH_SIZE
+                batches = [files[i:i + size] for i in range(0, len(files), size)]
+                outcomes = engine.run(batches, lambda batch: gemini_fixed.classify_batch(
+                    client, batch, None, [prepared.get(path) for path in batch] if prepared else None))
+                outcomes = [item for batch, outcome in zip(batches, outcomes)
+                            for item in (outcome if not isinstance(outcome, Exception) else [outcome] * len(batch))]
+            else:
+                outcomes = engine.run(files, lambda path: gemini_fixed.classify_image(client, path, None, prepared.get(path)))
+        results = [outcome for outcome in outcomes if not isinstance(outcome, Exception)]
+        stage.items = len(results)
+        stage.errors = len(outcomes) - len(results)
+
+        # 4. Selection over a result set scaled up to select_n (distinct ids, same score distribution)
+        stage = stages["select"] = StageStats("select", "results")
+        ranker = RankingEngine(min_confidence=gemini_fixed.CONFIDENCE_THRESHOLD, meme_types=gemini_fixed.ELIGIBLE_MEME_TYPES)
+        scaled = [dict(results[i % len(results)], file_hash=f"{results[i % len(results)]['file_hash']}-{i}")
+                  for i in range(select_n)] if results else []
+        rank = stage.timed(lambda: ranker.rank(scaled).top_k(gemini_fixed.MAX_NFT_IMAGES,
+                                                             gemini_fixed.RANK_GROUP_BY, gemini_fixed.RANK_MAX_PER_GROUP))
+        with stage.measure():
+            for _ in range(SELECT_REPEATS):
+                rank()
+        stage.items = len(scaled) * SELECT_REPEATS
+
+        # 5. Generation through the real provider chain; the best-scored memes, eligible or not,
+        #    so the stage always has `generate` images to make
+        ranking = ranker.rank(results)
+        picks = [results[i] for i in np.argsort(-ranking.scores, kind="stable")[:generate]]
+        stage = stages["generate"] = StageStats("generate", "images")
+        gemini_fixed.ensure_dirs()
+        generate_one = stage.timed(lambda meme: gemini_fixed.generate_nft_image(client, meme))
+        with stage.measure(), _quiet(verbose):
+            with ThreadPoolExecutor(max_workers=max(1, min(gemini_fixed.GEN_WORKERS, len(picks) or 1))) as pool:
+                paths = list(pool.map(generate_one, picks))
+        stage.items = sum(1 for path in paths if path)
+        stage.errors += len(picks) - stage.items
+
+        # 6. The local fallback renderer alone (what every meme costs when the APIs are down)
+        stage = stages["fallback"] = StageStats("fallback", "images")
+        render = stage.timed(fallback_image_generator.create_nft_style_image)
+        fallback_dir = os.path.join(workdir, "fallback")
+        os.makedirs(fallback_dir, exist_ok=True)
+        with stage.measure(), _quiet(verbose):
+            rendered = [render(meme, fallback_dir) for meme in picks]
+        stage.items = sum(1 for path in rendered if path)
+
+        stability = get_stability_client()
+        api_calls = {
+            "reddit": reddit.stats(),
+            "images": server.stats().get("images", {"requests": 0}),
+            "gemini": dict(client.stats(), engine_retries=engine.retries),
+            "stability": dict(server.stats().get("stability", {"requests": 0}),
+                              client_retried=stability.retried, client_failed=stability.failures),
+        }
+        chain = gemini_fixed.get_generation_chain(client).summary()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+        server.close()
+
+    return {
+        "profile": profile,
+        "params": {"memes": memes, "generate": generate, "select_n": select_n, "latency_scale": latency_scale,
+                   "error_rate": error_rate, "throttle_rate": throttle_rate, "seed": seed,
+                   "classify_batch_size": gemini_fixed.CLASSIFY_BATCH_SIZE},
+        "stages": {name: stage.as_dict() for name, stage in stages.items()},
+        "api_calls": api_calls,
+        "generation_chain": chain,
+        "peak_rss_mb": round(peak_rss_mb(), 1) if resource is not None else None,
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    params = report["params"]
+    print(f"\n[BENCH] Profile '{report['profile']}': {params['memes']} memes, {params['generate']} generations, "
+          f"{params['select_n']:,} results ranked (latency x{params['latency_scale']:g})")
+    print("=" * 98)
+    print(f"{'stage':<15}{'items':>9}{'errors':>8}{'wall s':>9}{'items/s':>11}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'peak RSS MB':>14}")
+    for name, s in report["stages"].items():
+        rss = f"{s['peak_rss_mb']:.1f}" if s["peak_rss_mb"] is not None else "n/a"
+        print(f"{name:<15}{s['items']:>9,}{s['errors']:>8}{s['wall_s']:>9.2f}{s['throughput']:>11,.1f}"
+              f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}{rss:>14}")
+
+    print("\n[API CALLS]")
+    for service, counts in report["api_calls"].items():
+        print(f"  {service:<10} " + ", ".join(f"{key}: {value}" for key, value in counts.items()))
+    print(f"  chain      {report['generation_chain']}")
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = BENCH_TOLERANCE) -> List[str]:
+    """Regressions of report vs. baseline: throughput down or p95 up by more than `tolerance`"""
+    regressions = []
+    for name, now in report["stages"].items():
+        before = baseline.get("stages", {}).get(name)
+        if not before:
+            continue
+        if before["throughput"] > 0 and now["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {now['throughput']:,.1f} {now['unit']}/s "
+                               f"(baseline {before['throughput']:,.1f})")
+        if now["p95_ms"] > before["p95_ms"] * (1 + tolerance) and now["p95_ms"] - before["p95_ms"] > BENCH_NOISE_FLOOR_MS:
+            regressions.append(f"{name}: p95 {now['p95_ms']:.1f} ms (baseline {before['p95_ms']:.1f} ms)")
+    return regressions
+
+
+def main(argv: List[str]) -> int:
+    def option(name: str, default: Optional[str]) -> Optional[str]:
+        return argv[argv.index(name) + 1] if name in argv else default
+
+    def number(name: str) -> Optional[float]:
+        value = option(name, None)
+        return float(value) if value is not None else None
+
+    profile = option("--profile", "realistic")
+    if profile not in PROFILES:
+        print(f"[ERROR] Unknown profile '{profile}' (choose from {', '.join(PROFILES)})")
+        return 2
+
+    report = run_benchmark(
+        profile=profile,
+        memes=int(option("--memes", "40")),
+        generate=int(option("--generate", "6")),
+        select_n=int(option("--select-n", "100000")),
+        latency_scale=float(option("--latency-scale", "1.0")),
+        error_rate=number("--error-rate"),
+        throttle_rate=number("--throttle-rate"),
+        seed=int(option("--seed", "0")),
+        verbose="--verbose" in argv,
+    )
+    print_report(report)
+
+    json_path = option("--json", None)
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[SAVED] Report written to {json_path}")
+
+    baseline_path = option("--baseline", None)
+    if baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f))
+        if regressions:
+            print(f"\n[REGRESSION] {len(regressions)} stage metrics worse than {baseline_path} (tolerance {BENCH_TOLERANCE:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\n[OK] No regressions against {baseline_path} (tolerance {BENCH_TOLERANCE:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
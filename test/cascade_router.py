@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cascaded Classification Router
+Cheap local pass in front of gemini_fixed.classify_image(): image size and
+shape, text-heavy detection, nearest known-template distance (local_vision)
+and the polling.py keyword score decide which images are worth a paid
+Gemini call. Images that are skipped get a local result instead, which
+should_generate_nft() always rejects.
+
+All thresholds are environment-configurable (CASCADE_*); CASCADE=0 sends
+every image to Gemini as before.
+"""
+
+import os
+import hashlib
+import time
+import pathlib
+import threading
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+import local_vision
+from seen_index import SeenPostIndex
+
+USE_CASCADE = os.getenv("CASCADE", "1") != "0"
+CASCADE_MIN_EDGE = int(os.getenv("CASCADE_MIN_EDGE", "200"))  # Smaller images are thumbnails/icons
+CASCADE_MAX_ASPECT = float(os.getenv("CASCADE_MAX_ASPECT", "3.0"))  # Long screenshots / banners
+CASCADE_TEXT_BRIGHT = float(os.getenv("CASCADE_TEXT_BRIGHT", "0.55"))  # Share of near-white background
+CASCADE_TEXT_EDGES = float(os.getenv("CASCADE_TEXT_EDGES", "0.08"))  # Share of sharp horizontal edges
+CASCADE_SEND_DISTANCE = int(os.getenv("CASCADE_SEND_DISTANCE", "32"))  # Template distance worth a call
+CASCADE_MIN_KEYWORDS = int(os.getenv("CASCADE_MIN_KEYWORDS", "1"))  # Viral keywords that justify a call
+CASCADE_AVG_CALL_SECONDS = float(os.getenv("CASCADE_AVG_CALL_SECONDS", "4.0"))  # For the savings report
+
+_ANALYSIS_SIZE = 256
+
+
+def text_heavy_signals(gray: np.ndarray) -> Dict[str, float]:
+    """Bright-background share and edge density of a small grayscale image"""
+    bright = float((gray > 200).mean())
+    edges = float((np.abs(np.diff(gray, axis=1)) > 30).mean())
+    return {"bright_ratio": round(bright, 3), "edge_density": round(edges, 3)}
+
+
+class CascadeRouter:
+    """
+    Decides per image whether to call Gemini. Rules, in order:
+
+    1. too_small           -> skip (thumbnails and icons)
+    2. template_match      -> send (close to a known template)
+    3. keywords            -> send (title already scored as viral)
+    4. no_index            -> send (no reference set to judge the rest against)
+    5. aspect / text_heavy -> skip (banners, screenshots, walls of text)
+    6. no_template         -> skip (far from every known template)
+
+    The shape and text heuristics only reject once a template index is
+    loaded: without one, tall multi-panel memes and white-background
+    templates (Drake) would be skipped with nothing to vouch for them.
+    """
+
+    def __init__(self, index: Optional["local_vision.TemplateIndex"] = None, use_index: bool = True,
+                 seen: Optional[SeenPostIndex] = None):
+        if index is None and use_index and os.path.exists(local_vision.INDEX_PATH):
+            index = local_vision.get_index()
+        self.index = index
+        self.seen = seen  # Seen-post index with the full post titles, if polling kept one
+        self._lock = threading.Lock()
+        self.routed = 0
+        self.sent = 0
+        self.skipped = Counter()
+
+    def keyword_score(self, path: str) -> int:
+        """
+        Viral keywords in the post title: the one stored in the seen-post index,
+        else the title part of the polling.meme_filename() name (never the
+        subreddit, which would match keywords like "memes" on every image)
+        """
+        from polling import KEYWORD_MATCHER, title_from_filename
+        title = None
+        if self.seen is not None:
+            parts = pathlib.Path(path).stem.split("_", 2)
+            if len(parts) == 3:
+                title = self.seen.get_many([parts[1]]).get(parts[1], {}).get("title")
+        if title is None:
+            title = title_from_filename(path)
+        return len(KEYWORD_MATCHER.find(title))
+
+    def signals(self, path: str, keywords: Optional[int] = None) -> Dict[str, Any]:
+        """Compute every local signal for one image"""
+        with Image.open(path) as img:
+            width, height = img.size
+            img.draft("L", (_ANALYSIS_SIZE * 2, _ANALYSIS_SIZE * 2))
+            small = img.convert("L").resize((_ANALYSIS_SIZE, _ANALYSIS_SIZE), Image.BILINEAR)
+        gray = np.asarray(small, dtype=np.float32)
+
+        found = {
+            "width": width,
+            "height": height,
+            "aspect": round(max(width, height) / max(1, min(width, height)), 2),
+            "keywords": self.keyword_score(path) if keywords is None else keywords,
+            "template_distance": None,
+            "nearest_template": None,
+        }
+        found.update(text_heavy_signals(gray))
+
+        if self.index is not None and len(self.index):
+            # Same decode path as the index build (local_vision.load_gray), so distances are comparable
+            matches = self.index.nearest(*local_vision.hash_file(path), k=1)
+            if matches:
+                found["nearest_template"], found["template_distance"] = matches[0]
+        return found
+
+    def decide(self, s: Dict[str, Any]) -> Tuple[bool, str]:
+        if min(s["width"], s["height"]) < CASCADE_MIN_EDGE:
+            return False, "too_small"
+        distance = s["template_distance"]
+        if distance is not None and distance <= CASCADE_SEND_DISTANCE:
+            return True, "template_match"
+        if s["keywords"] >= CASCADE_MIN_KEYWORDS:
+            return True, "keywords"
+        if distance is None:
+            return True, "no_index"
+        if s["aspect"] > CASCADE_MAX_ASPECT:
+            return False, "aspect"
+        if s["bright_ratio"] >= CASCADE_TEXT_BRIGHT and s["edge_density"] >= CASCADE_TEXT_EDGES:
+            return False, "text_heavy"
+        return False, "no_template"
+
+    def route(self, path: str, keywords: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Returns {"send": bool, "reason": str, "signals": {...}, "result": dict|None}.
+        "result" is the local stand-in for classify_image() when send is False.
+        """
+        try:
+            s = self.signals(path, keywords)
+            send, reason = self.decide(s)
+        except Exception as e:
+            s, send, reason = {}, True, f"signal_error: {e}"  # When unsure, let Gemini decide
+
+        with self._lock:
+            self.routed += 1
+            if send:
+                self.sent += 1
+            else:
+                self.skipped[reason] += 1
+
+        result = None if send else self.local_result(path, reason, s)
+        return {"send": send, "reason": reason, "signals": s, "result": result}
+
+    def route_many(self, paths: List[str]) -> List[Dict[str, Any]]:
+        return [self.route(path) for path in paths]
+
+    def local_result(self, path: str, reason: str, s: Dict[str, Any]) -> Dict[str, Any]:
+        """Stand-in result in the classify_image() shape for a skipped image"""
+        result = None
+        if self.index is not None and len(self.index):
+            try:
+                result = local_vision.classify_image_local(path, self.index)
+            except Exception:
+                pass
+        if result is None:
+            with open(path, "rb") as f:
+                file_hash = hashlib.sha256(f.read()).hexdigest()
+            stat = pathlib.Path(path).stat()
+            result = {
+                "template": "Unknown",
+                "confidence": 0.0,
+                "meme_type": "unknown",
+                "description": "Not analyzed",
+                "known_variants": [],
+                "nft_potential": 0.0,
+                "file": path,
+                "source": "Unknown",
+                "timestamp": int(getattr(stat, "st_mtime", time.time())),
+                "model": local_vision.LOCAL_MODEL,
+                "file_hash": file_hash,
+            }
+        result["nft_potential"] = 0.0
+        result["rationale"] = f"cascade_skip:{reason}"
+        result["cascade"] = dict(s)
+        return result
+
+    @property
+    def saved_calls(self) -> int:
+        return sum(self.skipped.values())
+
+    def summary(self) -> str:
+        if not self.routed:
+            return "Cascade: no images routed"
+        reasons = ", ".join(f"{reason}={count}" for reason, count in self.skipped.most_common())
+        return (f"Cascade: {self.sent}/{self.routed} sent to Gemini, {self.saved_calls} calls saved "
+                f"({self.saved_calls/self.routed*100:.0f}%, ~{self.saved_calls*CASCADE_AVG_CALL_SECONDS:.0f}s)"
+                + (f" [{reasons}]" if reasons else ""))
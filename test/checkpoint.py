@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Run Checkpoints
+Per-item journal of completed pipeline stages (ranked, downloaded,
+classified, generated). Every entry is appended and fsync'd as soon as the
+work finishes, so a run that dies part-way (quota error, network drop, bot
+restart) can be resumed: finished items are replayed from the journal and
+only unfinished ones cost time or API calls.
+
+Journal format (JSONL, one file per pipeline):
+    {"journal": "gemini_fixed", "run_id": "...", "started_at": 1760000000.0}
+    {"item": "downloaded_memes/01_x.png", "stage": "classified", "data": {...}, "t": ...}
+    ...
+    {"stage": "complete", "t": ...}
+
+A truncated last line (crash mid-write) is ignored on load.
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+from typing import Any, Dict, List, Optional
+
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", os.path.join("results", "checkpoints"))
+CHECKPOINT_FSYNC = os.getenv("CHECKPOINT_FSYNC", "1") != "0"  # 0 = flush only (faster, not power-loss safe)
+
+STAGES = ("ranked", "downloaded", "classified", "generated")
+
+
+def resume_requested(argv: List[str]) -> bool:
+    """--resume on the command line or RESUME=1 in the environment"""
+    return "--resume" in argv or os.getenv("RESUME", "0") != "0"
+
+
+class RunJournal:
+    """
+    Thread-safe stage journal for one pipeline.
+
+    start(resume=True) reloads an unfinished journal; otherwise (or when the
+    last run completed) a fresh journal replaces it. record() appends one
+    durable entry; done()/get() answer from memory. Items starting with "_"
+    are run-level markers and are left out of the summary counts.
+    """
+
+    def __init__(self, name: str, directory: str = CHECKPOINT_DIR):
+        self.name = name
+        self.path = os.path.join(directory, f"{name}.jsonl")
+        self.run_id: Optional[str] = None
+        self.resumed = False
+        self.replayed = 0  # Stage results served from the journal instead of recomputed
+        self._entries: Dict[str, Dict[str, Any]] = {}  # item -> {stage: data}
+        self._order: List[str] = []  # Items in first-seen order
+        self._lock = threading.Lock()
+        self._file = None
+
+    # --------------------------------------------------------------- lifecycle
+    def _load(self) -> bool:
+        """Read an existing journal; False if there is none, it is unreadable or it completed"""
+        if not os.path.exists(self.path):
+            return False
+        entries: Dict[str, Dict[str, Any]] = {}
+        order: List[str] = []
+        header = None
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Torn write from a crash (later lines were appended after a fence)
+                if header is None:
+                    header = entry
+                    continue
+                if entry.get("stage") == "complete":
+                    return False
+                item = entry["item"]
+                if item not in entries:
+                    entries[item] = {}
+                    order.append(item)
+                entries[item][entry["stage"]] = entry.get("data")
+        if header is None or header.get("journal") != self.name:
+            return False
+        self.run_id = header.get("run_id")
+        self._entries, self._order = entries, order
+        return True
+
+    def start(self, resume: bool = False) -> "RunJournal":
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock:
+            self.resumed = resume and self._load()
+            if self.resumed:
+                self._file = open(self.path, "a", encoding="utf-8")
+                if self._file.tell() and not self._ends_with_newline():
+                    self._file.write("\n")  # Fence off a torn last line
+                return self
+            self._entries, self._order = {}, []
+            self.run_id = f"{time.strftime('%Y%m%dT%H%M%S')}_{uuid.uuid4().hex[:6]}"
+            tmp_path = f"{self.path}.{os.getpid()}.part"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"journal": self.name, "run_id": self.run_id, "started_at": time.time()}, f)
+                f.write("\n")
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+        return self
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _append(self, entry: Dict[str, Any]):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if CHECKPOINT_FSYNC:
+            os.fsync(self._file.fileno())
+
+    def finish(self):
+        """Mark the run complete: the next start(resume=True) begins a fresh run"""
+        with self._lock:
+            if self._file is None:
+                if self.run_id is None:
+                    return  # Never started
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._append({"stage": "complete", "t": time.time()})
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        """Stop journalling without marking the run complete (it stays resumable)"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # ------------------------------------------------------------------ entries
+    def record(self, item: str, stage: str, data: Any = None):
+        """Durably note that `item` finished `stage` (data must be JSON-serializable)"""
+        with self._lock:
+            if item not in self._entries:
+                self._entries[item] = {}
+                self._order.append(item)
+            self._entries[item][stage] = data
+            if self._file is not None:
+                self._append({"item": item, "stage": stage, "data": data, "t": time.time()})
+
+    def done(self, item: str, stage: str) -> bool:
+        with self._lock:
+            return stage in self._entries.get(item, {})
+
+    def get(self, item: str, stage: str, default: Any = None) -> Any:
+        with self._lock:
+            return self._entries.get(item, {}).get(stage, default)
+
+    def replay(self, item: str, stage: str) -> Any:
+        """Journalled data for a finished stage (counted as a replay), or None"""
+        with self._lock:
+            stages = self._entries.get(item, {})
+            if stage not in stages:
+                return None
+            self.replayed += 1
+            return stages[stage]
+
+    def items(self, stage: Optional[str] = None) -> List[str]:
+        """Items (first-seen order) that finished `stage`, or all items"""
+        with self._lock:
+            return [item for item in self._order if stage is None or stage in self._entries[item]]
+
+    def summary(self) -> str:
+        counts = {stage: sum(1 for item in self.items(stage) if not item.startswith("_")) for stage in STAGES}
+        done = ", ".join(f"{count} {stage}" for stage, count in counts.items() if count)
+        mode = f"resumed run {self.run_id}" if self.resumed else f"run {self.run_id}"
+        return f"Checkpoint: {mode} ({done or 'nothing journalled'}; {self.replayed} stage results reused)"
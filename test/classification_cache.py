@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Classification Result Cache
+Persistent SQLite cache for Gemini meme classifications, keyed by
+(image content hash, model name, prompt hash) with size/age-based eviction
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Any, Optional
+
+CACHE_MAX_ENTRIES = int(os.getenv("CLASSIFY_CACHE_MAX_ENTRIES", "50000"))
+CACHE_MAX_AGE_DAYS = float(os.getenv("CLASSIFY_CACHE_MAX_AGE_DAYS", "30"))
+
+
+def text_hash(text: str) -> str:
+    """Stable short hash for prompts and other cache-key text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ClassificationCache:
+    """
+    Thread-safe persistent cache of classification results.
+
+    Entries expire after max_age_days; when the table grows past max_entries
+    the least recently used entries are dropped. Hits and misses are counted
+    for the end-of-run summary.
+    """
+
+    def __init__(self, path: str, max_entries: int = CACHE_MAX_ENTRIES,
+                 max_age_days: float = CACHE_MAX_AGE_DAYS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS classifications (
+                image_hash  TEXT NOT NULL,
+                model       TEXT NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                result      TEXT NOT NULL,
+                created_at  REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (image_hash, model, prompt_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON classifications (last_access)")
+        self._conn.commit()
+        self.evict()
+
+    def get(self, image_hash: str, model: str, prompt_hash: str) -> Optional[Dict[str, Any]]:
+        """Return a cached result, or None on a miss or expired entry"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result, created_at FROM classifications WHERE image_hash=? AND model=? AND prompt_hash=?",
+                (image_hash, model, prompt_hash),
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE classifications SET last_access=? WHERE image_hash=? AND model=? AND prompt_hash=?",
+                (now, image_hash, model, prompt_hash),
+            )
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, image_hash: str, model: str, prompt_hash: str, result: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO classifications VALUES (?, ?, ?, ?, ?, ?)",
+                (image_hash, model, prompt_hash, json.dumps(result, ensure_ascii=False), now, now),
+            )
+            self._conn.commit()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones above max_entries"""
+        with self._lock:
+            self._conn.execute("DELETE FROM classifications WHERE created_at < ?", (time.time() - self.max_age,))
+            self._conn.execute(
+                """
+                DELETE FROM classifications WHERE rowid IN (
+                    SELECT rowid FROM classifications ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self):
+        self.evict()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parallel Classification Engine
+Runs classification calls on a thread pool under an adaptive (AIMD)
+concurrency limit: parallelism grows while latency is healthy and is cut
+back on 429 / RESOURCE_EXHAUSTED responses. Results keep input order.
+"""
+
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, List, Optional, Sequence
+
+CLASSIFY_CONCURRENCY = int(os.getenv("CLASSIFY_CONCURRENCY", "4"))  # Starting parallelism
+CLASSIFY_MAX_CONCURRENCY = int(os.getenv("CLASSIFY_MAX_CONCURRENCY", "16"))
+CLASSIFY_TARGET_LATENCY = float(os.getenv("CLASSIFY_TARGET_LATENCY", "8.0"))  # Seconds per call considered healthy
+CLASSIFY_MAX_RETRIES = int(os.getenv("CLASSIFY_MAX_RETRIES", "5"))
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for quota/throttling errors (HTTP 429 / RESOURCE_EXHAUSTED)"""
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    return "RESOURCE_EXHAUSTED" in str(error)  # A bare "429" in the text may be a file name, size or id
+
+
+class AdaptiveLimiter:
+    """
+    Additive-increase / multiplicative-decrease concurrency limit.
+
+    - Each call finishing under target_latency raises the limit by ~1 per
+      "window" of calls (limit += 1/limit).
+    - A slow call shrinks the limit slightly; a throttled call halves it.
+    """
+
+    def __init__(self, initial: int = CLASSIFY_CONCURRENCY, minimum: int = 1,
+                 maximum: int = CLASSIFY_MAX_CONCURRENCY, target_latency: float = CLASSIFY_TARGET_LATENCY):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self.peak_limit = self.limit
+        self.throttle_events = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, latency: float, throttled: bool = False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.throttle_events += 1
+                self.limit = max(self.minimum, self.limit / 2)
+            elif latency <= self.target_latency:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            else:
+                self.limit = max(self.minimum, self.limit * 0.9)
+            self.peak_limit = max(self.peak_limit, self.limit)
+            self._cond.notify_all()
+
+
+class ClassificationEngine:
+    """
+    Bounded-concurrency executor for per-item classification calls.
+
+    run() returns one entry per input item, in input order: the function's
+    return value, or the Exception it finally raised.
+    """
+
+    def __init__(self, limiter: Optional[AdaptiveLimiter] = None, max_retries: int = CLASSIFY_MAX_RETRIES,
+                 base_backoff: float = 1.0):
+        self.limiter = limiter or AdaptiveLimiter()
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.calls = 0
+        self.retries = 0
+        self._stats_lock = threading.Lock()
+
+    def call(self, fn: Callable[[Any], Any], item: Any) -> Any:
+        """Run fn(item) under the adaptive limit, retrying throttled calls"""
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            started = time.monotonic()
+            try:
+                with self._stats_lock:
+                    self.calls += 1
+                result = fn(item)
+            except Exception as e:
+                throttled = is_rate_limit_error(e)
+                self.limiter.release(time.monotonic() - started, throttled=throttled)
+                if not throttled or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                with self._stats_lock:
+                    self.retries += 1
+                time.sleep(self.base_backoff * (2 ** (attempt - 1)) * (1 + random.random()))
+                continue
+            self.limiter.release(time.monotonic() - started)
+            return result
+
+    def run(self, items: Sequence[Any], fn: Callable[[Any], Any], progress=None) -> List[Any]:
+        """
+        Apply fn to every item concurrently.
+        `progress` may be any object with an update(n) method (e.g. a tqdm bar).
+        """
+        outcomes: List[Any] = [None] * len(items)
+        if not items:
+            return outcomes
+
+        with ThreadPoolExecutor(max_workers=min(self.limiter.maximum, len(items))) as pool:
+            futures = {pool.submit(self.call, fn, item): i for i, item in enumerate(items)}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    outcomes[i] = future.result()
+                except Exception as e:
+                    outcomes[i] = e
+                if progress is not None:
+                    progress.update(1)
+        return outcomes
@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Offline Fake API Clients
+Drop-in stand-ins for the external services, for exercising the pipeline
+without network access or API keys.
+
+    from fake_clients import FakeGenaiClient
+    client = FakeGenaiClient()
+    result = gemini_fixed.classify_image(client, "meme.jpg")
+    print(client.stats())
+
+Every fake takes a FaultProfile (latency, error and 429 rates), and
+FakeApiServer serves synthetic meme images and the Stability AI
+text-to-image endpoint over real local HTTP, so pooled sessions, retries
+and Retry-After handling are exercised as in production.
+"""
+
+import io
+import re
+import math
+import base64
+import json
+import time
+import random
+import threading
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeCachedContent:
+    def __init__(self, name: str, model: str, system_instruction: Any, ttl: Optional[str]):
+        self.name = name
+        self.model = model
+        self.system_instruction = system_instruction
+        self.ttl = ttl
+
+
+class FakeApiError(Exception):
+    """Error raised by the in-process fakes; the message carries the HTTP status like the real SDK errors"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class FaultProfile:
+    """
+    Behaviour of one fake endpoint.
+
+    - latency: seconds, or a callable returning seconds (see jitter())
+    - error_rate: share of requests failing with a 5xx
+    - throttle_rate: share of requests rejected with 429 (Retry-After: retry_after,
+      rounded up to whole seconds over HTTP)
+    Draws are seeded, so a profile replays the same fault sequence.
+    """
+
+    def __init__(self, latency: Any = 0.0, error_rate: float = 0.0, throttle_rate: float = 0.0,
+                 retry_after: float = 1.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        return self.latency() if callable(self.latency) else self.latency
+
+    def outcome(self) -> str:
+        """"ok", "throttle" or "error" for the next request"""
+        with self._lock:
+            draw = self._rng.random()
+        if draw < self.throttle_rate:
+            return "throttle"
+        if draw < self.throttle_rate + self.error_rate:
+            return "error"
+        return "ok"
+
+    def apply(self):
+        """Sleep for the latency, then raise FakeApiError for a throttled/failed request"""
+        latency = self.delay()
+        if latency:
+            time.sleep(latency)
+        outcome = self.outcome()
+        if outcome == "throttle":
+            raise FakeApiError(429, "RESOURCE_EXHAUSTED: quota exceeded")
+        if outcome == "error":
+            raise FakeApiError(503, "UNAVAILABLE: backend error")
+
+
+def synthetic_image(seed: int, size: Tuple[int, int] = (640, 640), fmt: str = "PNG") -> bytes:
+    """Deterministic meme-like picture (gradient, blobs, caption bars) encoded as PNG/JPEG"""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    start, end = rng.integers(0, 256, 3), rng.integers(0, 256, 3)
+    t = ((x / max(1, width - 1) + y / max(1, height - 1)) / 2)[..., None]
+    pixels = (start * (1 - t) + end * t).astype(np.uint8)
+    image = Image.fromarray(pixels, "RGB")
+
+    draw = ImageDraw.Draw(image)
+    for _ in range(int(rng.integers(3, 8))):
+        cx, cy = int(rng.integers(0, width)), int(rng.integers(0, height))
+        radius = int(rng.integers(min(size) // 12, min(size) // 3))
+        draw.ellipse((cx - radius, cy - radius, cx + radius, cy + radius), fill=tuple(int(c) for c in rng.integers(0, 256, 3)))
+    bar = height // 8
+    draw.rectangle((0, 0, width, bar), fill=(255, 255, 255))  # Caption bars, like an image macro
+    draw.rectangle((0, height - bar, width, height), fill=(255, 255, 255))
+
+    out = io.BytesIO()
+    image.save(out, "JPEG" if fmt.upper() in ("JPG", "JPEG") else "PNG", **({"quality": 85} if fmt.upper() in ("JPG", "JPEG") else {}))
+    return out.getvalue()
+
+
+def default_classification(number: int) -> Dict[str, Any]:
+    """Deterministic per-image answer: every third image is a confident Doge"""
+    famous = number % 3 == 0
+    return {
+        "template": "Doge" if famous else "Unknown",
+        "confidence": 0.97 if famous else 0.4,
+        "meme_type": "character" if famous else "unknown",
+        "description": "Fake classification",
+        "known_variants": [],
+        "rationale": "fake",
+        "nft_potential": 0.9 if famous else 0.1,
+    }
+
+
+def _text_of(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    parts = getattr(value, "parts", None)
+    if parts:
+        return "".join(getattr(p, "text", "") or "" for p in parts)
+    return getattr(value, "text", "") or ""
+
+
+def varied_classification(number: int) -> Dict[str, Any]:
+    """Deterministic mix of templates, types and confidences, so ranking has real work to do"""
+    rng = random.Random(number)
+    template = rng.choice(["Doge", "Pepe the Frog", "Drake Hotline Bling", "Wojak", "Distracted Boyfriend",
+                           "Expanding Brain", "Unknown", "Other", "Scooby Doo Mask Reveal", "Shrek"])
+    return {
+        "template": template,
+        "confidence": round(rng.uniform(0.85, 1.0), 3),
+        "meme_type": rng.choice(["character", "template", "reaction", "other"]),
+        "description": f"Synthetic {template} meme",
+        "known_variants": [],
+        "rationale": "fake",
+        "nft_potential": round(rng.uniform(0.5, 1.0), 3),
+    }
+
+
+class _FakeModels:
+    def __init__(self, owner: "FakeGenaiClient"):
+        self.owner = owner
+
+    def generate_content(self, model: str, contents: List[Any], config: Any = None, **kwargs) -> FakeResponse:
+        return self.owner._generate(model, contents, config)
+
+    def generate_images(self, model: str, prompt: str, **kwargs):
+        # Like the real API for projects without billing: the provider chain marks Imagen unavailable
+        raise FakeApiError(400, "INVALID_ARGUMENT: Imagen API is only accessible to billed users at this time.")
+
+
+class _FakeCaches:
+    def __init__(self, owner: "FakeGenaiClient"):
+        self.owner = owner
+
+    def create(self, model: str, config: Any = None) -> FakeCachedContent:
+        return self.owner._create_cache(model, config)
+
+    def delete(self, name: str, config: Any = None):
+        with self.owner._lock:
+            self.owner.cached.pop(name, None)
+            self.owner.cache_deletes += 1
+
+
+class FakeGenaiClient:
+    """
+    Stand-in for google.genai.Client (models.generate_content, caches.create/delete).
+
+    - responder(number) returns the dict for the Nth image seen (default_classification)
+    - latency: seconds (or a callable returning seconds) slept per request
+    - faults: a FaultProfile (overrides latency); throttled requests raise
+      "429 RESOURCE_EXHAUSTED" like the SDK, which the classification engine retries
+    - min_cache_chars: caches.create rejects shorter instructions, like the real
+      minimum cacheable token count
+    - Records per-request input text size so prompt savings can be measured
+    """
+
+    def __init__(self, responder: Callable[[int], Dict[str, Any]] = default_classification,
+                 latency: Any = 0.0, min_cache_chars: int = 0, faults: Optional[FaultProfile] = None,
+                 *args, **kwargs):
+        self.responder = responder
+        self.latency = latency
+        self.faults = faults
+        self.throttled = 0
+        self.errors = 0
+        self.min_cache_chars = min_cache_chars
+        self.models = _FakeModels(self)
+        self.caches = _FakeCaches(self)
+        self.cached: Dict[str, FakeCachedContent] = {}
+        self.requests: List[Dict[str, Any]] = []
+        self.cache_creates = 0
+        self.cache_deletes = 0
+        self._images_seen = 0
+        self._lock = threading.Lock()
+
+    def _create_cache(self, model: str, config: Any) -> FakeCachedContent:
+        instruction = _text_of(getattr(config, "system_instruction", None))
+        if len(instruction) < self.min_cache_chars:
+            raise ValueError("400 INVALID_ARGUMENT: cached content is too small")
+        with self._lock:
+            self.cache_creates += 1
+            name = f"cachedContents/fake-{self.cache_creates}"
+            self.cached[name] = FakeCachedContent(name, model, instruction, getattr(config, "ttl", None))
+        return self.cached[name]
+
+    def _generate(self, model: str, contents: List[Any], config: Any) -> FakeResponse:
+        if self.faults is not None:
+            try:
+                self.faults.apply()
+            except FakeApiError as e:
+                with self._lock:
+                    if e.code == 429:
+                        self.throttled += 1
+                    else:
+                        self.errors += 1
+                raise
+        else:
+            latency = self.latency() if callable(self.latency) else self.latency
+            if latency:
+                time.sleep(latency)
+
+        images = [c for c in contents if not isinstance(c, str)]
+        cached_name = getattr(config, "cached_content", None)
+        if cached_name and cached_name not in self.cached:
+            raise ValueError(f"404 NOT_FOUND: {cached_name}")
+        with self._lock:
+            self.requests.append({
+                "model": model,
+                "images": len(images),
+                "text_chars": sum(len(c) for c in contents if isinstance(c, str)),
+                "system_chars": len(_text_of(getattr(config, "system_instruction", None))),
+                "cached_content": cached_name,
+            })
+            first = self._images_seen
+            self._images_seen += max(1, len(images))
+
+        answers = [self.responder(first + i) for i in range(max(1, len(images)))]
+        if len(images) > 1:
+            return FakeResponse(json.dumps([dict(a, index=i) for i, a in enumerate(answers, 1)]))
+        return FakeResponse(json.dumps(answers[0]))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": len(self.requests),
+                "images": sum(r["images"] for r in self.requests),
+                "text_chars": sum(r["text_chars"] for r in self.requests),
+                "system_chars": sum(r["system_chars"] for r in self.requests),
+                "cached_requests": sum(1 for r in self.requests if r["cached_content"]),
+                "cache_creates": self.cache_creates,
+                "throttled": self.throttled,
+                "errors": self.errors,
+            }
+
+
+def jitter(low: float, high: float, seed: Optional[int] = None) -> Callable[[], float]:
+    """Latency callable drawing uniformly from [low, high] seconds"""
+    rng = random.Random(seed)
+    return lambda: rng.uniform(low, high)
+
+
+# ---------------------------------------------------------------- Reddit
+
+class _FakeSubredditRef:
+    def __init__(self, display_name: str):
+        self.display_name = display_name
+
+
+class FakePost:
+    """The PRAW Submission attributes polling.py reads"""
+
+    __slots__ = ("id", "fullname", "title", "score", "url", "subreddit")
+
+    def __init__(self, post_id: str, title: str, score: int, url: str, subreddit: str):
+        self.id = post_id
+        self.fullname = f"t3_{post_id}"
+        self.title = title
+        self.score = score
+        self.url = url
+        self.subreddit = _FakeSubredditRef(subreddit)
+
+
+_TITLE_WORDS = ["doge", "pepe", "wojak", "chad", "stonks", "sus", "drake", "this is fine", "cat", "monday",
+                "when", "the", "code", "finally", "works", "me", "irl", "boss", "exam", "weekend"]
+
+
+class _FakeSubreddit:
+    def __init__(self, owner: "FakeRedditClient", name: str):
+        self.owner = owner
+        self.names = name.split("+")
+        self.key = name
+
+    def _listing(self, sort: str, limit: int, params: Optional[Dict[str, Any]]) -> List[FakePost]:
+        started = time.perf_counter()
+        try:
+            self.owner._call(sort)
+            after = (params or {}).get("after")
+            start = self.owner._positions.get((self.key, sort, after), -1) + 1 if after else 0
+            posts = [self.owner.post(self.names[i % len(self.names)], sort, i // len(self.names))
+                     for i in range(start, min(start + limit, self.owner.posts_per_listing * len(self.names)))]
+            self.owner._page_end((self.key, sort), posts, start)
+            return posts
+        finally:
+            self.owner._record_latency(time.perf_counter() - started)
+
+    def hot(self, limit: int = 100, params: Optional[Dict[str, Any]] = None) -> List[FakePost]:
+        return self._listing("hot", limit, params)
+
+    def top(self, time_filter: str = "day", limit: int = 100, params: Optional[Dict[str, Any]] = None) -> List[FakePost]:
+        return self._listing("top", limit, params)
+
+
+class FakeRedditClient:
+    """
+    Stand-in for praw.Reddit (subreddit(name).hot/top, multireddits "a+b").
+
+    - Posts are deterministic per (subreddit, position); hot and top overlap
+      by half, like the real listings. Image URLs point at image_host
+      (a FakeApiServer), so downloads go over local HTTP.
+    - faults: FaultProfile applied to every listing call
+    - Counts listing calls and posts, and records each call's latency;
+      thread-safe, so one instance can serve all workers
+    """
+
+    def __init__(self, image_host: str, posts_per_listing: int = 100, faults: Optional[FaultProfile] = None,
+                 seed: int = 0, *args, **kwargs):
+        self.image_host = image_host.rstrip("/")
+        self.posts_per_listing = posts_per_listing
+        self.faults = faults or FaultProfile()
+        self.seed = seed
+        self.calls = Counter()
+        self.failed = 0
+        self.posts_returned = 0
+        self.latencies: List[float] = []
+        self._positions: Dict[tuple, int] = {}  # (listing, sort, "after" cursor) -> listing position
+        self._lock = threading.Lock()
+
+    def subreddit(self, name: str) -> _FakeSubreddit:
+        return _FakeSubreddit(self, name)
+
+    def _call(self, sort: str):
+        with self._lock:
+            self.calls[sort] += 1
+        try:
+            self.faults.apply()
+        except FakeApiError:
+            with self._lock:
+                self.failed += 1
+            raise
+
+    def _page_end(self, listing: tuple, posts: List[FakePost], start: int):
+        with self._lock:
+            self.posts_returned += len(posts)
+            if posts:
+                self._positions[listing + (posts[-1].fullname,)] = start + len(posts) - 1
+
+    def _record_latency(self, seconds: float):
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def post(self, subreddit: str, sort: str, position: int) -> FakePost:
+        # "top" reuses the second half of "hot", so the pipeline's dedup has work to do
+        number = position + (self.posts_per_listing // 2 if sort == "top" else 0)
+        rng = random.Random(zlib.crc32(f"{self.seed}/{subreddit}/{number}".encode()))
+        post_id = f"{subreddit[:3].lower()}{number:05d}"
+        title = " ".join(rng.choice(_TITLE_WORDS) for _ in range(rng.randint(3, 8)))
+        ext = ".png" if number % 2 else ".jpg"
+        return FakePost(post_id, title, rng.randint(200, 60000), f"{self.image_host}/images/{post_id}{ext}", subreddit)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"requests": sum(self.calls.values()), "hot": self.calls["hot"], "top": self.calls["top"],
+                    "failed": self.failed, "posts": self.posts_returned}
+
+
+# ------------------------------------------------------ local HTTP server
+
+_IMAGE_PATH = re.compile(r"^/images/([\w-]+)\.(png|jpg|jpeg)$")
+_STABILITY_PATH = re.compile(r"^/v1/generation/([\w.-]+)/text-to-image$")
+
+
+class FakeApiServer:
+    """
+    Local HTTP stand-in for Reddit's image hosts and the Stability AI API.
+
+    - GET  /images/<name>.png|jpg                  -> synthetic meme image
+    - POST /v1/generation/<engine>/text-to-image   -> PNG of the requested size
+      (Accept: image/png) or base64 JSON artifacts, like the real endpoint
+    - image_faults / stability_faults: FaultProfile per route; throttled
+      requests get 429 with a Retry-After header, failures get 503
+    - Counts requests by route and status
+
+        with FakeApiServer() as server:
+            client = StabilityClient(api_key="test", host=server.url)
+    """
+
+    def __init__(self, image_faults: Optional[FaultProfile] = None, stability_faults: Optional[FaultProfile] = None,
+                 image_size: Tuple[int, int] = (640, 640), port: int = 0):
+        self.image_faults = image_faults or FaultProfile()
+        self.stability_faults = stability_faults or FaultProfile()
+        self.image_size = image_size
+        self.counts = Counter()  # (route, status) -> requests
+        self._images: Dict[Tuple[str, int, int], bytes] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-api", daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def preload(self, urls: List[str]):
+        """Render the images behind these URLs now, so encoding time is not billed to the downloads"""
+        for url in urls:
+            match = _IMAGE_PATH.match(url[len(self.url):] if url.startswith(self.url) else url)
+            if match:
+                self._image(match.group(1), self.image_size, "PNG" if match.group(2) == "png" else "JPEG")
+
+    def _image(self, name: str, size: Tuple[int, int], fmt: str) -> bytes:
+        key = (f"{name}.{fmt}", size[0], size[1])
+        with self._lock:
+            cached = self._images.get(key)
+        if cached is None:
+            cached = synthetic_image(zlib.crc32(name.encode()), size, fmt)
+            with self._lock:
+                self._images[key] = cached
+        return cached
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, so client connection pooling is measured
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, route: str, status: int, body: bytes, content_type: str, headers: Dict[str, str] = None):
+                with server._lock:
+                    server.counts[(route, status)] += 1
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _faulted(self, route: str, faults: FaultProfile) -> bool:
+                latency = faults.delay()
+                if latency:
+                    time.sleep(latency)
+                outcome = faults.outcome()
+                if outcome == "throttle":
+                    body = json.dumps({"name": "rate_limit_exceeded", "message": "Too many requests"}).encode()
+                    # HTTP allows whole seconds only (urllib3 rejects "0.5")
+                    self._reply(route, 429, body, "application/json",
+                                {"Retry-After": str(max(0, math.ceil(faults.retry_after)))})
+                    return True
+                if outcome == "error":
+                    body = json.dumps({"name": "server_error", "message": "Service unavailable"}).encode()
+                    self._reply(route, 503, body, "application/json")
+                    return True
+                return False
+
+            def do_GET(self):
+                match = _IMAGE_PATH.match(self.path)
+                if not match:
+                    self._reply("other", 404, b"not found", "text/plain")
+                    return
+                if self._faulted("images", server.image_faults):
+                    return
+                fmt = "PNG" if match.group(2) == "png" else "JPEG"
+                body = server._image(match.group(1), server.image_size, fmt)
+                self._reply("images", 200, body, "image/png" if fmt == "PNG" else "image/jpeg")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                match = _STABILITY_PATH.match(self.path)
+                if not match:
+                    self._reply("other", 404, b"not found", "text/plain")
+                    return
+                if not self.headers.get("Authorization", "").startswith("Bearer ") or \
+                        self.headers["Authorization"] == "Bearer ":
+                    self._reply("stability", 401, json.dumps({"message": "Missing API key"}).encode(), "application/json")
+                    return
+                try:
+                    payload = json.loads(raw)
+                    prompt = payload["text_prompts"][0]["text"]
+                    size = (int(payload.get("width", 1024)), int(payload.get("height", 1024)))
+                except (ValueError, KeyError, IndexError, TypeError):
+                    self._reply("stability", 400, json.dumps({"message": "Bad payload"}).encode(), "application/json")
+                    return
+                if self._faulted("stability", server.stability_faults):
+                    return
+                seed = zlib.crc32(f"{prompt}/{payload.get('seed', 0)}".encode())
+                body = server._image(f"gen{seed}", size, "PNG")
+                if "image/png" in self.headers.get("Accept", ""):
+                    self._reply("stability", 200, body, "image/png")
+                else:
+                    artifacts = {"artifacts": [{"base64": base64.b64encode(body).decode(), "seed": seed,
+                                                "finishReason": "SUCCESS"}]}
+                    self._reply("stability", 200, json.dumps(artifacts).encode(), "application/json")
+
+        return Handler
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """{route: {"requests": n, "200": n, "429": n, ...}}"""
+        with self._lock:
+            counts = dict(self.counts)
+        stats: Dict[str, Dict[str, int]] = {}
+        for (route, status), n in counts.items():
+            route_stats = stats.setdefault(route, {"requests": 0})
+            route_stats["requests"] += n
+            route_stats[str(status)] = route_stats.get(str(status), 0) + n
+        return stats
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Offline NFT Artwork Renderer
+Last-resort generator used when Stability AI and Imagen are unavailable.
+Turns the source meme into stylized NFT artwork with NumPy array
+operations only (no API, no GPU): palette quantization, posterize,
+ink outlines, a themed gradient backdrop and a frame with the template
+name. Output is deterministic for the same meme and renders a 1024x1024
+image in well under a second on one core.
+
+Usage:
+    python fallback_image_generator.py meme.jpg [more.png ...] [--out DIR]
+    python fallback_image_generator.py --bench
+"""
+
+import os
+import sys
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+FALLBACK_SIZE = int(os.getenv("FALLBACK_SIZE", "1024"))  # Output edge (px)
+FALLBACK_COLORS = int(os.getenv("FALLBACK_COLORS", "8"))  # Palette size after quantization
+FALLBACK_WORKERS = int(os.getenv("FALLBACK_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_KMEANS_SAMPLES = 4096
+_KMEANS_ITERATIONS = 8
+_POSTERIZE_LEVELS = 5
+_EDGE_THRESHOLD = 0.12  # Luminance gradient (0-1) that becomes an outline
+_FRAME_RATIO = 0.045  # Frame width relative to the image edge
+
+# (backdrop top, backdrop bottom, frame, accent) per theme
+THEMES = {
+    "neon": ((20, 4, 48), (255, 0, 140), (0, 255, 220), (255, 240, 0)),
+    "vaporwave": ((255, 113, 206), (1, 205, 254), (185, 103, 255), (255, 251, 150)),
+    "gold": ((24, 18, 6), (120, 84, 18), (212, 175, 55), (255, 236, 170)),
+    "ocean": ((3, 22, 52), (0, 150, 170), (220, 240, 255), (255, 180, 60)),
+    "sunset": ((45, 10, 60), (255, 120, 60), (255, 214, 120), (255, 255, 255)),
+}
+
+
+def _seed(meme_data: Dict[str, Any]) -> int:
+    """Stable per-meme seed: the image hash if known, otherwise template + description"""
+    basis = meme_data.get("file_hash") or f"{meme_data.get('template', 'Unknown')}\n{meme_data.get('description', '')}"
+    return int(hashlib.sha256(str(basis).encode("utf-8")).hexdigest()[:16], 16)
+
+
+def _load_source(path: Optional[str], size: int) -> Optional[np.ndarray]:
+    """Centre-cropped square RGB float32 array (0-1), or None if there is no usable image"""
+    if not path or not os.path.isfile(path):
+        return None
+    try:
+        with Image.open(path) as img:
+            img.draft("RGB", (size, size))  # JPEG: decode at reduced scale
+            img.seek(0)
+            rgb = img.convert("RGB")
+    except (OSError, ValueError):
+        return None
+    edge = min(rgb.size)
+    left, top = (rgb.width - edge) // 2, (rgb.height - edge) // 2
+    rgb = rgb.crop((left, top, left + edge, top + edge)).resize((size, size), Image.BILINEAR)
+    return np.asarray(rgb, dtype=np.float32) / 255.0
+
+
+def _procedural_source(rng: np.random.Generator, size: int) -> np.ndarray:
+    """Smooth random blobs, used when the meme image itself is missing"""
+    coarse = rng.random((6, 6, 3), dtype=np.float32)
+    img = Image.fromarray((coarse * 255).astype(np.uint8)).resize((size, size), Image.BICUBIC)
+    return np.asarray(img, dtype=np.float32) / 255.0
+
+
+def _luminance(rgb: np.ndarray) -> np.ndarray:
+    return rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def quantize_palette(rgb: np.ndarray, colors: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    k-means palette fitted on a pixel sample, then every pixel mapped to its
+    nearest palette colour. Returns an array of the same shape.
+    """
+    pixels = rgb.reshape(-1, 3)
+    sample = pixels[rng.choice(len(pixels), size=min(_KMEANS_SAMPLES, len(pixels)), replace=False)]
+    centres = sample[rng.choice(len(sample), size=colors, replace=False)]
+    for _ in range(_KMEANS_ITERATIONS):
+        labels = ((sample[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+        counts = np.bincount(labels, minlength=colors).astype(np.float32)
+        sums = np.zeros_like(centres)
+        np.add.at(sums, labels, sample)
+        filled = counts > 0
+        centres[filled] = sums[filled] / counts[filled, None]
+
+    # ||p - c||^2 = ||p||^2 - 2 p.c + ||c||^2; ||p||^2 is the same for every centre
+    scores = pixels @ (-2.0 * centres.T) + (centres ** 2).sum(axis=1)
+    return centres[scores.argmin(axis=1)].reshape(rgb.shape)
+
+
+def posterize(rgb: np.ndarray, levels: int = _POSTERIZE_LEVELS) -> np.ndarray:
+    return np.floor(rgb * (levels - 1) + 0.5) / (levels - 1)
+
+
+def outline_mask(rgb: np.ndarray, threshold: float = _EDGE_THRESHOLD, thickness: int = 2) -> np.ndarray:
+    """Boolean ink mask where the luminance gradient is steep, thickened by `thickness` px"""
+    lum = _luminance(rgb)
+    grad = np.zeros_like(lum)
+    grad[:, :-1] = np.abs(np.diff(lum, axis=1))
+    grad[:-1, :] = np.maximum(grad[:-1, :], np.abs(np.diff(lum, axis=0)))
+    mask = grad > threshold
+    for _ in range(thickness - 1):  # Dilate with a 3x3 cross
+        grown = mask.copy()
+        grown[1:, :] |= mask[:-1, :]
+        grown[:-1, :] |= mask[1:, :]
+        grown[:, 1:] |= mask[:, :-1]
+        grown[:, :-1] |= mask[:, 1:]
+        mask = grown
+    return mask
+
+
+def gradient(size: int, top: tuple, bottom: tuple, angle: float = 0.0) -> np.ndarray:
+    """Linear two-colour gradient, rotated by `angle` radians"""
+    axis = np.linspace(-1.0, 1.0, size, dtype=np.float32)
+    t = (np.sin(angle) * axis[None, :] + np.cos(angle) * axis[:, None]) * 0.5 + 0.5
+    np.clip(t, 0.0, 1.0, out=t)
+    top = np.asarray(top, dtype=np.float32) / 255.0
+    bottom = np.asarray(bottom, dtype=np.float32) / 255.0
+    return top + t[..., None] * (bottom - top)
+
+
+def _vignette(size: int, strength: float = 0.55) -> np.ndarray:
+    axis = np.linspace(-1.0, 1.0, size, dtype=np.float32)
+    radius = np.sqrt(axis[None, :] ** 2 + axis[:, None] ** 2) / np.sqrt(2.0)
+    return (1.0 - strength * radius ** 2)[..., None]
+
+
+def _add_frame(canvas: np.ndarray, frame_rgb: tuple, accent_rgb: tuple) -> np.ndarray:
+    size = canvas.shape[0]
+    width = max(4, int(size * _FRAME_RATIO))
+    frame = gradient(size, frame_rgb, tuple(int(c * 0.45) for c in frame_rgb), angle=np.pi / 4)
+    border = np.ones((size, size), dtype=bool)
+    border[width:-width, width:-width] = False
+    canvas[border] = frame[border]
+    line = max(2, width // 6)  # Accent line just inside the frame
+    accent = np.asarray(accent_rgb, dtype=np.float32) / 255.0
+    inner = slice(width, size - width)
+    canvas[width:width + line, inner] = accent
+    canvas[size - width - line:size - width, inner] = accent
+    canvas[inner, width:width + line] = accent
+    canvas[inner, size - width - line:size - width] = accent
+    return canvas
+
+
+def render_nft_array(meme_data: Dict[str, Any], size: int = FALLBACK_SIZE,
+                     colors: int = FALLBACK_COLORS) -> np.ndarray:
+    """Stylized NFT artwork for one meme as a (size, size, 3) uint8 array"""
+    seed = _seed(meme_data)
+    rng = np.random.default_rng(seed)
+    theme_name = sorted(THEMES)[seed % len(THEMES)]
+    top, bottom, frame_rgb, accent_rgb = THEMES[theme_name]
+
+    source = _load_source(meme_data.get("file"), size)
+    if source is None:
+        source = _procedural_source(rng, size)
+
+    art = quantize_palette(source, colors, rng)
+    art = posterize(art * 0.8 + posterize(source) * 0.2)
+
+    # Duotone tint toward the theme, keeping the meme's light/dark structure
+    backdrop = gradient(size, top, bottom, angle=float(rng.uniform(-0.6, 0.6)))
+    lum = _luminance(art)[..., None]
+    art = 0.6 * art + 0.4 * backdrop * (0.35 + lum)
+    art = art * _vignette(size)
+
+    ink = outline_mask(source)
+    art[ink] = np.asarray(top, dtype=np.float32) / 255.0 * 0.3
+
+    art = _add_frame(np.clip(art, 0.0, 1.0), frame_rgb, accent_rgb)
+    return (art * 255.0 + 0.5).astype(np.uint8)
+
+
+def _draw_title(img: Image.Image, title: str, accent_rgb: tuple):
+    size = img.width
+    try:
+        font = ImageFont.truetype("DejaVuSans-Bold.ttf", max(12, size // 22))
+    except OSError:
+        font = ImageFont.load_default()
+    draw = ImageDraw.Draw(img)
+    left, top, right, bottom = draw.textbbox((0, 0), title, font=font)
+    x = (size - (right - left)) // 2
+    y = size - int(size * _FRAME_RATIO) * 2 - (bottom - top)
+    draw.text((x + 2, y + 2), title, font=font, fill=(0, 0, 0))
+    draw.text((x, y), title, font=font, fill=accent_rgb)
+
+
+def _output_name(meme_data: Dict[str, Any]) -> str:
+    template = meme_data.get("template", "Unknown")
+    safe = "".join(c for c in template if c.isalnum() or c in (" ", "-", "_")).strip().replace(" ", "_") or "meme"
+    return f"{safe}_{_seed(meme_data):016x}"[:60] + "_fallback_NFT.png"
+
+
+def create_nft_style_image(meme_data: Dict[str, Any], output_dir: str, size: int = FALLBACK_SIZE) -> str:
+    """
+    Render NFT artwork for one meme into output_dir.
+
+    Returns:
+        Path to the PNG, or empty string if rendering failed
+    """
+    try:
+        pixels = render_nft_array(meme_data, size)
+        img = Image.fromarray(pixels)
+        theme = THEMES[sorted(THEMES)[_seed(meme_data) % len(THEMES)]]
+        _draw_title(img, meme_data.get("template", "Unknown"), theme[3])
+
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, _output_name(meme_data))
+        tmp_path = f"{output_path}.{os.getpid()}.part"
+        img.save(tmp_path, format="PNG", compress_level=1)  # Quantized art compresses well even at level 1
+        os.replace(tmp_path, output_path)
+        return output_path
+    except Exception as e:
+        print(f"    [ERROR] Fallback renderer failed: {e}")
+        return ""
+
+
+def _create_one(args) -> str:
+    meme_data, output_dir, size = args
+    return create_nft_style_image(meme_data, output_dir, size)
+
+
+def create_nft_style_images(memes: List[Dict[str, Any]], output_dir: str, size: int = FALLBACK_SIZE,
+                            workers: int = FALLBACK_WORKERS) -> List[str]:
+    """Render many memes in a process pool; paths are in input order ("" for failures)"""
+    jobs = [(meme, output_dir, size) for meme in memes]
+    if workers <= 1 or len(jobs) <= 1:
+        return [_create_one(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_create_one, jobs))
+
+
+def _bench(count: int = 8, size: int = FALLBACK_SIZE):
+    memes = [{"template": f"Bench {i}", "description": "synthetic"} for i in range(count)]
+    render_nft_array(memes[0], size)  # Warm-up
+    started = time.perf_counter()
+    for meme in memes:
+        render_nft_array(meme, size)
+    per_image = (time.perf_counter() - started) / count
+    print(f"[BENCH] render {size}x{size}: {per_image*1000:.0f} ms/image (single core)")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if "--bench" in args:
+        _bench()
+        sys.exit(0)
+    out_dir = "fallback_nfts"
+    if "--out" in args:
+        i = args.index("--out")
+        out_dir = args[i + 1]
+        del args[i:i + 2]
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+    memes = [{"template": os.path.splitext(os.path.basename(p))[0].replace("_", " "), "file": p} for p in args]
+    for meme, path in zip(memes, create_nft_style_images(memes, out_dir)):
+        print(f"[FALLBACK] {meme['file']} -> {path or 'failed'}")
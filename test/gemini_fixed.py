@@ -1,12 +1,15 @@
 # -*- coding: utf-8 -*-
 # -*- coding: utf-8 -*-
 import os
+import sys
 import json
 import time
 import pathlib
-import base64
-import requests
+import hashlib
+import tempfile
+import threading
 from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
 from dotenv import load_dotenv
 
@@ -14,6 +17,22 @@ from google import genai
 from google.genai import types
 from tqdm import tqdm
 
+from classification_cache import ClassificationCache, text_hash
+from classification_engine import ClassificationEngine
+from cascade_router import CascadeRouter, USE_CASCADE
+from prompt_context import get_prompt_context, close_prompt_context
+from image_preprocess import needs_preprocess, preprocess_many, summarize as summarize_preprocess
+from keyframes import ANIMATED_EXTS
+from provider_chain import Provider, ProviderChain, ProviderUnavailable
+from generation_cache import GenerationCache, generation_key
+from meme_store import MemeStore
+from stability_client import StabilityError, get_stability_client
+from results_store import record_run, RESULTS_STORE_DIR
+from checkpoint import RunJournal, resume_requested
+from seen_index import SeenPostIndex, SEEN_INDEX_PATH
+from ranking_engine import (RankingEngine, FAMOUS_KEYWORDS, GENERIC_TEMPLATES, RANK_MIN_POTENTIAL,
+                            RANK_NON_CHARACTER_CONFIDENCE)
+
 # Load environment variables
 load_dotenv()
 
@@ -24,6 +43,9 @@ MEME_DIR = os.getenv("MEME_DIR", "downloaded_memes")  # Changed to use downloade
 OUT_DIR = os.getenv("OUT_DIR", "results")
 NFT_DIR = os.path.join(OUT_DIR, "nft_images")  # Changed from nft_generated to nft_images
 OUT_JSONL = os.path.join(OUT_DIR, "meme_results.jsonl")
+CLASSIFY_CACHE_PATH = os.getenv("CLASSIFY_CACHE_PATH", os.path.join(OUT_DIR, "classification_cache.sqlite"))
+USE_CLASSIFY_CACHE = os.getenv("USE_CLASSIFY_CACHE", "1") != "0"
+CLASSIFY_BATCH_SIZE = int(os.getenv("CLASSIFY_BATCH_SIZE", "4"))  # Images per Gemini request (1 = one call per image)
 
 # Confidence threshold for generating NFTs (only generate for highly confident identifications)
 CONFIDENCE_THRESHOLD = 0.95  # Increased for better quality
@@ -31,6 +53,23 @@ CONFIDENCE_THRESHOLD = 0.95  # Increased for better quality
 # Maximum NFT images to generate (for accuracy purposes)
 MAX_NFT_IMAGES = 3  # Focus on top 3 best memes
 
+# Optional diversity cap on the NFT selection, e.g. RANK_GROUP_BY=template RANK_MAX_PER_GROUP=1
+RANK_GROUP_BY = os.getenv("RANK_GROUP_BY", "") or None
+RANK_MAX_PER_GROUP = int(os.getenv("RANK_MAX_PER_GROUP", "0"))
+
+# Image generation: per-provider timeouts (seconds) and concurrent generations
+GEN_TIMEOUT_STABILITY = float(os.getenv("GEN_TIMEOUT_STABILITY", "90"))
+GEN_TIMEOUT_IMAGEN = float(os.getenv("GEN_TIMEOUT_IMAGEN", "60"))
+GEN_TIMEOUT_FALLBACK = float(os.getenv("GEN_TIMEOUT_FALLBACK", "30"))
+GEN_WORKERS = int(os.getenv("GEN_WORKERS", str(MAX_NFT_IMAGES)))
+USE_GEN_CACHE = os.getenv("GEN_CACHE", "1") != "0"
+
+# Stability AI request parameters (also part of the artwork cache key)
+STABILITY_ENGINE = "stable-diffusion-xl-1024-v1-0"
+STABILITY_SIZE = 1024
+STABILITY_STEPS = 40
+STABILITY_CFG = 7
+
 # Meme types that qualify for NFT generation (familiar/recognizable memes)
 ELIGIBLE_MEME_TYPES = {"reaction", "template", "character"}
 
@@ -86,8 +125,19 @@ Rules:
 - Be descriptive and helpful in your analysis
 """
 
+BATCH_INSTRUCTIONS = """
+Batch mode:
+You will receive several images, each preceded by a label "Image 1", "Image 2", ...
+Analyze each image independently and return ONLY a JSON array with one object per image,
+in the same order, each with the keys above plus "index" (the image number).
+"""
+
+# Cache key component: results are only reused for the exact same instructions
+# (batch answers are cached under the single-image prompt hash: same per-image schema)
+PROMPT_HASH = text_hash(PROMPT_INSTRUCTIONS)
+
 # ====== Helpers ======
-IMG_EXTS = {".jpg", ".jpeg", ".png", ".webp"}
+IMG_EXTS = {".jpg", ".jpeg", ".png", ".webp"} | ANIMATED_EXTS  # Animations are sent as keyframe contact sheets
 
 def mime_from_path(path: str) -> str:
     ext = pathlib.Path(path).suffix.lower()
@@ -97,6 +147,8 @@ def mime_from_path(path: str) -> str:
         return "image/png"
     if ext == ".webp":
         return "image/webp"
+    if ext == ".gif":
+        return "image/gif"
     # Fallback (Gemini can still handle)
     return "application/octet-stream"
 
@@ -110,18 +162,124 @@ def iter_images(directory: str):
         for fp in p.rglob(f"*{ext}"):
             yield str(fp)
 
-def classify_image(client: genai.Client, path: str) -> Dict[str, Any]:
+def _upload_source(path: str, prepared: Dict[str, Any] = None):
+    """(sha256 of the original, path to upload, mime type); `prepared` comes from image_preprocess"""
+    if prepared is not None:
+        return prepared["sha256"], prepared["upload_path"], prepared["mime_type"]
     with open(path, "rb") as f:
-        image_bytes = f.read()
+        return hashlib.sha256(f.read()).hexdigest(), path, mime_from_path(path)
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def classify_image(client: genai.Client, path: str, cache: ClassificationCache = None,
+                   prepared: Dict[str, Any] = None) -> Dict[str, Any]:
+    # Same bytes + same model + same prompt => reuse the earlier answer
+    # (keyed by the original file, whatever copy is uploaded)
+    image_hash, upload_path, mime_type = _upload_source(path, prepared)
+    data = cache.get(image_hash, MODEL, PROMPT_HASH) if cache is not None else None
+    cache_hit = data is not None
+
+    if not cache_hit:
+        data = _classify_bytes(client, _read(upload_path), mime_type)
+        if cache is not None and data.get("rationale") != "parse_error":
+            cache.put(image_hash, MODEL, PROMPT_HASH, data)
+
+    return _with_metadata(data, path, image_hash, cache_hit)
+
+def cached_classification(path: str, cache: ClassificationCache = None,
+                          prepared: Dict[str, Any] = None) -> Dict[str, Any]:
+    """The cached answer for this image, or None; checked before taking a concurrency slot"""
+    if cache is None:
+        return None
+    image_hash, _, _ = _upload_source(path, prepared)
+    data = cache.get(image_hash, MODEL, PROMPT_HASH)
+    return _with_metadata(data, path, image_hash, True) if data is not None else None
+
+def _with_metadata(data: Dict[str, Any], path: str, image_hash: str, cache_hit: bool) -> Dict[str, Any]:
+    # Add common metadata
+    stat = pathlib.Path(path).stat()
+    data.update({
+        "file": path,
+        "source": guess_source_from_path(path),  # crude guess; edit as needed
+        "timestamp": int(getattr(stat, "st_mtime", time.time())),
+        "model": MODEL,
+        "file_hash": image_hash,
+        "cache_hit": cache_hit,
+    })
+    return data
+
+def classify_batch(client: genai.Client, paths: List[str], cache: ClassificationCache = None,
+                   prepared: List[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Classify several images with one request per batch; results are in `paths` order"""
+    hashes, uploads, results = [], [], []
+    for i, path in enumerate(paths):
+        image_hash, upload_path, mime_type = _upload_source(path, prepared[i] if prepared else None)
+        hashes.append(image_hash)
+        uploads.append((upload_path, mime_type))
+        results.append(cache.get(image_hash, MODEL, PROMPT_HASH) if cache is not None else None)
+
+    misses = [i for i, data in enumerate(results) if data is None]
+    if misses:
+        answers = _classify_batch_bytes(client, [(_read(uploads[i][0]), uploads[i][1]) for i in misses])
+        for i, data in zip(misses, answers):
+            results[i] = data
+            if cache is not None and data.get("rationale") != "parse_error":
+                cache.put(hashes[i], MODEL, PROMPT_HASH, data)
+
+    missed = set(misses)
+    return [_with_metadata(data, path, image_hash, i not in missed)
+            for i, (path, image_hash, data) in enumerate(zip(paths, hashes, results))]
+
+def _parse_batch_response(text: str, count: int) -> List[Dict[str, Any]]:
+    """Map a JSON-array answer back to image positions; ValueError if it does not fit"""
+    data = json.loads(text)
+    if isinstance(data, dict) and count == 1:
+        data = [data]
+    if not isinstance(data, list) or len(data) != count or not all(isinstance(d, dict) for d in data):
+        raise ValueError(f"Expected a JSON array of {count} objects")
+    indexes = [d.get("index") for d in data]
+    if sorted(indexes) == list(range(1, count + 1)):
+        data = sorted(data, key=lambda d: d["index"])
+    for d in data:
+        d.pop("index", None)
+    return data
 
-    part = types.Part.from_bytes(data=image_bytes, mime_type=mime_from_path(path))
+def _classify_batch_bytes(client: genai.Client, images: List[tuple]) -> List[Dict[str, Any]]:
+    """One request for all images; a malformed answer splits the batch in two and retries"""
+    if len(images) == 1:
+        return [_classify_bytes(client, *images[0])]
+
+    context = get_prompt_context(client, MODEL, PROMPT_INSTRUCTIONS)
+    contents = [PROMPT_INSTRUCTIONS + BATCH_INSTRUCTIONS if context.inline else BATCH_INSTRUCTIONS]
+    for number, (image_bytes, mime_type) in enumerate(images, 1):
+        contents.append(f"Image {number}:")
+        contents.append(types.Part.from_bytes(data=image_bytes, mime_type=mime_type))
+    response = client.models.generate_content(
+        model=MODEL,
+        contents=contents,
+        config=context.config(response_mime_type="application/json"),
+    )
+    try:
+        return _parse_batch_response(response.text, len(images))
+    except Exception:
+        middle = len(images) // 2
+        return _classify_batch_bytes(client, images[:middle]) + _classify_batch_bytes(client, images[middle:])
+
+def _classify_bytes(client: genai.Client, image_bytes: bytes, mime_type: str) -> Dict[str, Any]:
+    part = types.Part.from_bytes(data=image_bytes, mime_type=mime_type)
+
+    # The static instructions are registered once (cached content / system
+    # instruction), so normally only the image is sent with each request
+    context = get_prompt_context(client, MODEL, PROMPT_INSTRUCTIONS)
 
     # Ask for JSON mode so we get machine-readable output
     # Official pattern for passing image + text is used here. (See docs)
     response = client.models.generate_content(
         model=MODEL,
-        contents=[part, PROMPT_INSTRUCTIONS],
-        config=types.GenerateContentConfig(
+        contents=[part, PROMPT_INSTRUCTIONS] if context.inline else [part],
+        config=context.config(
             response_mime_type="application/json"  # request JSON output
         ),
     )
@@ -141,97 +299,67 @@ def classify_image(client: genai.Client, path: str) -> Dict[str, Any]:
             "rationale": "parse_error",
             "raw": response.text
         }
-
-    # Add common metadata
-    stat = pathlib.Path(path).stat()
-    data.update({
-        "file": path,
-        "source": guess_source_from_path(path),  # crude guess; edit as needed
-        "timestamp": int(getattr(stat, "st_mtime", time.time())),
-        "model": MODEL,
-    })
     return data
 
-def generate_nft_image_with_stability(meme_data: Dict[str, Any], output_dir: str) -> str:
-    """Generate a high-quality NFT image using Stability AI"""
+def _safe_filename(template: str) -> str:
+    safe_filename = "".join(c for c in template if c.isalnum() or c in (' ', '-', '_')).rstrip()
+    return safe_filename.replace(' ', '_')
+
+def _write_atomic(path: str, data: bytes):
+    tmp_path = f"{path}.{threading.get_ident()}.part"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _stability_prompt(meme_data: Dict[str, Any]) -> str:
     template = meme_data.get("template", "Unknown")
     description = meme_data.get("description", "")
     
     # Create NFT-style prompt optimized for Stability AI
-    nft_prompt = f"""Professional NFT digital artwork of {template} meme character, high-quality detailed illustration, vibrant colors, modern art style, premium NFT collection quality, digital painting, trending on artstation, 4K resolution, collectible art piece
+    return f"""Professional NFT digital artwork of {template} meme character, high-quality detailed illustration, vibrant colors, modern art style, premium NFT collection quality, digital painting, trending on artstation, 4K resolution, collectible art piece
     
 Based on: {description}
 
 Style: Modern digital art, professional NFT quality, vibrant and eye-catching, suitable for blockchain marketplace"""
+
+def _stability_seed(prompt: str) -> int:
+    # Explicit per-prompt seed (0 would ask the API for a random one), so a cached image is what a new call returns
+    return int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:4], "big") or 1
+
+def _stability_key(meme_data: Dict[str, Any]) -> Dict[str, Any]:
+    prompt = _stability_prompt(meme_data)
+    return generation_key("stability", STABILITY_ENGINE, prompt,
+                          STABILITY_SIZE, STABILITY_SIZE, STABILITY_STEPS, STABILITY_CFG, _stability_seed(prompt))
+
+def _stability_png(meme_data: Dict[str, Any]) -> bytes:
+    """Stability AI text-to-image; PNG bytes, or b"" on an API error"""
+    template = meme_data.get("template", "Unknown")
+    nft_prompt = _stability_prompt(meme_data)
+    print(f"    [STABILITY] Generating high-quality NFT image for {template}...")
+    
+    client = get_stability_client()
+    if not client.api_key:
+        raise ProviderUnavailable("STABILITY_API_KEY not found in environment")
     
     try:
-        print(f"    [STABILITY] Generating high-quality NFT image for {template}...")
-        
-        api_key = os.getenv("STABILITY_API_KEY")
-        if not api_key:
-            print(f"    [ERROR] STABILITY_API_KEY not found in environment")
-            return ""
-        
-        response = requests.post(
-            'https://api.stability.ai/v1/generation/stable-diffusion-xl-1024-v1-0/text-to-image',
-            headers={
-                'Authorization': f'Bearer {api_key}',
-                'Content-Type': 'application/json'
-            },
-            json={
-                'text_prompts': [{'text': nft_prompt}],
-                'cfg_scale': 7,
-                'height': 1024,
-                'width': 1024,
-                'samples': 1,
-                'steps': 40  # Higher steps for better quality
-            }
+        return client.text_to_image(
+            STABILITY_ENGINE, nft_prompt,
+            width=STABILITY_SIZE, height=STABILITY_SIZE,
+            steps=STABILITY_STEPS,  # Higher steps for better quality
+            cfg_scale=STABILITY_CFG,
+            seed=_stability_seed(nft_prompt),
         )
-        
-        if response.status_code == 200:
-            data = response.json()
-            
-            if data.get('artifacts'):
-                # Save the generated image
-                safe_filename = "".join(c for c in template if c.isalnum() or c in (' ', '-', '_')).rstrip()
-                safe_filename = safe_filename.replace(' ', '_')
-                output_path = os.path.join(output_dir, f"{safe_filename}_NFT.png")
-                
-                # Decode and save the image
-                image_data = base64.b64decode(data['artifacts'][0]['base64'])
-                with open(output_path, "wb") as f:
-                    f.write(image_data)
-                
-                print(f"    [SUCCESS] Generated high-quality NFT: {safe_filename}_NFT.png")
-                return output_path
-            else:
-                print(f"    [ERROR] No images returned from Stability AI")
-                return ""
-        else:
-            print(f"    [ERROR] Stability AI API error: {response.status_code}")
-            print(f"    [ERROR] Response: {response.text}")
-            return ""
-            
-    except Exception as e:
-        print(f"    [ERROR] Error generating NFT with Stability AI: {e}")
-        return ""
+    except StabilityError as e:
+        if e.auth_problem:
+            raise ProviderUnavailable(f"Stability AI: {e}")
+        print(f"    [ERROR] Stability AI API error: {e}")
+        return b""
 
-def generate_nft_image(client: genai.Client, meme_data: Dict[str, Any]) -> str:
-    """Generate an NFT-style image using Stability AI API"""
+def _imagen_prompt(meme_data: Dict[str, Any]) -> str:
     template = meme_data.get("template", "Unknown")
-    
-    # Try Stability AI first (high quality NFT generation)
-    print(f"    [GENERATE] Generating high-quality NFT with Stability AI...")
-    stability_result = generate_nft_image_with_stability(meme_data, NFT_DIR)
-    
-    if stability_result:
-        return stability_result
-    
-    # Fallback to Gemini Imagen if Stability AI fails
-    print(f"    [FALLBACK] Trying Gemini Imagen as fallback...")
     description = meme_data.get("description", "")
     
-    nft_prompt = f"""Create a high-quality NFT digital artwork inspired by the "{template}" meme template.
+    return f"""Create a high-quality NFT digital artwork inspired by the "{template}" meme template.
 
 Style requirements:
 - Professional NFT collection quality
@@ -244,45 +372,128 @@ Style requirements:
 Original meme context: {description}
 
 Make it visually appealing, premium quality, and perfect for NFT collection. Use a modern digital art style with professional lighting and composition."""
-    
+
+def _imagen_png(client: genai.Client, meme_data: Dict[str, Any]) -> bytes:
+    """Gemini Imagen; raises ProviderUnavailable when billing is not set up"""
+    template = meme_data.get("template", "Unknown")
+    nft_prompt = _imagen_prompt(meme_data)
     try:
         response = client.models.generate_images(
             model=IMAGE_MODEL,
             prompt=nft_prompt
         )
-        
-        if response.images and len(response.images) > 0:
-            # Save the generated image
-            safe_filename = "".join(c for c in template if c.isalnum() or c in (' ', '-', '_')).rstrip()
-            safe_filename = safe_filename.replace(' ', '_')
-            output_path = os.path.join(NFT_DIR, f"{safe_filename}_NFT.png")
-            
-            with open(output_path, "wb") as f:
-                f.write(response.images[0].image_bytes)
-            
-            print(f"    [SUCCESS] Generated NFT image with Gemini: {safe_filename}_NFT.png")
-            return output_path
-        else:
-            print(f"    [ERROR] No images returned from Gemini for {template}")
-            return ""
-            
     except Exception as e:
         error_msg = str(e)
         if "billed users" in error_msg or "INVALID_ARGUMENT" in error_msg:
             print(f"    [BILLING] Gemini image generation requires billing setup. Using fallback generator...")
-            
-            # Use fallback image generation
+            raise ProviderUnavailable(error_msg)
+        raise
+
+    if response.images and len(response.images) > 0:
+        return response.images[0].image_bytes
+    print(f"    [ERROR] No images returned from Gemini for {template}")
+    return b""
+
+def _fallback_png(meme_data: Dict[str, Any]) -> bytes:
+    """Local fallback generator (no API)"""
+    from fallback_image_generator import create_nft_style_image
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = create_nft_style_image(meme_data, tmp_dir)
+        return _read(path) if path else b""
+
+_chain_lock = threading.Lock()
+_chains: Dict[int, ProviderChain] = {}
+_generation_cache: GenerationCache = None
+
+def get_generation_chain(client: genai.Client) -> ProviderChain:
+    """Stability AI -> Gemini Imagen -> local fallback, shared by every generation of a run"""
+    with _chain_lock:
+        chain = _chains.get(id(client))
+        if chain is None:
+            chain = _chains[id(client)] = ProviderChain([
+                Provider("stability", _stability_png, GEN_TIMEOUT_STABILITY, cache_key=_stability_key),
+                Provider("imagen", lambda meme: _imagen_png(client, meme), GEN_TIMEOUT_IMAGEN,
+                         cache_key=lambda meme: generation_key("imagen", IMAGE_MODEL, _imagen_prompt(meme))),
+                # No cache key: fallback art stands in for an outage, and caching it would keep
+                # later runs from ever asking the paid providers again
+                Provider("fallback", _fallback_png, GEN_TIMEOUT_FALLBACK),
+            ])
+        return chain
+
+def get_generation_cache() -> GenerationCache:
+    """Shared artwork cache (None when GEN_CACHE=0)"""
+    global _generation_cache
+    with _chain_lock:
+        if _generation_cache is None and USE_GEN_CACHE:
+            _generation_cache = GenerationCache()
+        return _generation_cache
+
+def _nft_output_name(template: str, sha256: str) -> str:
+    # Content hash in the name: two memes of the same template no longer overwrite each other
+    return f"{_safe_filename(template)}_{sha256[:10]}_NFT.png"
+
+def generate_nft_image(client: genai.Client, meme_data: Dict[str, Any]) -> str:
+    """Generate an NFT-style image (Stability AI, then Imagen, then the local fallback)"""
+    template = meme_data.get("template", "Unknown")
+    chain = get_generation_chain(client)
+    cache = get_generation_cache()
+
+    # Same provider/engine/prompt/parameters as an earlier paid-provider run => reuse that artwork
+    if cache is not None:
+        cached = cache.get_any([p.cache_key(meme_data) for p in chain.providers if p.cache_key])
+        if cached:
+            sha256 = os.path.splitext(os.path.basename(cached))[0]
             try:
-                from fallback_image_generator import create_nft_style_image
-                output_path = create_nft_style_image(meme_data, NFT_DIR)
-                print(f"    [FALLBACK] Created NFT-style image using fallback generator")
+                output_path = MemeStore.link_into(NFT_DIR, cached, _nft_output_name(template, sha256), symlink=False)
+            except FileNotFoundError:
+                pass  # Evicted by another worker since the lookup: generate it again
+            else:
+                print(f"    [CACHE] Reused generated NFT for {template}: {os.path.basename(output_path)}")
                 return output_path
-            except Exception as fallback_error:
-                print(f"    [ERROR] Fallback generator also failed: {fallback_error}")
-                return ""
-        else:
-            print(f"    [ERROR] Error generating NFT for {template}: {e}")
-            return ""
+
+    print(f"    [GENERATE] Generating high-quality NFT for {template}...")
+    provider, image_data = chain.generate(meme_data)
+    if not image_data:
+        print(f"    [ERROR] Every image provider failed for {template}")
+        return ""
+
+    # The output is written from the bytes in hand, so cache eviction can never take it away
+    sha256 = hashlib.sha256(image_data).hexdigest()
+    output_path = os.path.join(NFT_DIR, _nft_output_name(template, sha256))
+    _write_atomic(output_path, image_data)
+    winner = next(p for p in chain.providers if p.name == provider)
+    if cache is not None and winner.cache_key is not None:
+        cache.put(winner.cache_key(meme_data), image_data)
+    print(f"    [SUCCESS] Generated NFT image with {provider}: {os.path.basename(output_path)}")
+    return output_path
+
+def select_nft_candidates(results: List[Dict[str, Any]], k: int = MAX_NFT_IMAGES):
+    """(ranking, top k results): the NFT selection shared by main() and streaming_pipeline"""
+    ranking = RankingEngine(min_confidence=CONFIDENCE_THRESHOLD, meme_types=ELIGIBLE_MEME_TYPES).rank(results)
+    return ranking, ranking.top_k(k, RANK_GROUP_BY, RANK_MAX_PER_GROUP)
+
+def generate_nft_image_checkpointed(client: genai.Client, meme: Dict[str, Any], journal: RunJournal = None) -> str:
+    """generate_nft_image(), reusing an image a crashed run already generated for this meme"""
+    if journal is None:
+        return generate_nft_image(client, meme)
+    item = meme.get("file", "")
+    earlier = journal.get(item, "generated")
+    if earlier and os.path.exists(earlier):
+        journal.replay(item, "generated")
+        print(f"    [RESUME] Reusing NFT from the interrupted run: {os.path.basename(earlier)}")
+        return earlier
+    nft_path = generate_nft_image(client, meme)
+    if nft_path:
+        journal.record(item, "generated", nft_path)
+    return nft_path
+
+def generate_nft_images(client: genai.Client, memes: List[Dict[str, Any]], workers: int = GEN_WORKERS,
+                        journal: RunJournal = None) -> List[str]:
+    """Generate NFT images for several memes concurrently; paths ("" on failure) in input order"""
+    if not memes:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(memes)))) as pool:
+        return list(pool.map(lambda meme: generate_nft_image_checkpointed(client, meme, journal), memes))
 
 def should_generate_nft(meme_data: Dict[str, Any], current_nft_count: int) -> bool:
     """Determine if this meme qualifies for NFT generation - focus on famous meme characters"""
@@ -300,7 +511,7 @@ def should_generate_nft(meme_data: Dict[str, Any], current_nft_count: int) -> bo
         return False
     
     # Require high NFT potential for quality
-    if nft_potential < 0.8:
+    if nft_potential < RANK_MIN_POTENTIAL:
         return False
     
     # Skip if it's not a familiar meme type
@@ -308,15 +519,14 @@ def should_generate_nft(meme_data: Dict[str, Any], current_nft_count: int) -> bo
         return False
     
     # Skip generic or unknown templates
-    if template.lower() in ["unknown", "other", "custom", "image macro", "top text"]:
+    if template.lower() in GENERIC_TEMPLATES:
         return False
     
     # Prioritize famous character memes
-    famous_keywords = ["tom", "jerry", "pepe", "doge", "wojak", "chad", "harold", "drake", "scooby", "spongebob", "shrek"]
-    if any(keyword in template.lower() for keyword in famous_keywords):
+    if any(keyword in template.lower() for keyword in FAMOUS_KEYWORDS):
         return True
     
-    return confidence >= 0.98  # Very high bar for non-character memes
+    return confidence >= RANK_NON_CHARACTER_CONFIDENCE  # Very high bar for non-character memes
 
 def guess_source_from_path(path: str) -> str:
     lower = path.lower()
@@ -328,6 +538,7 @@ def guess_source_from_path(path: str) -> str:
 # ====== Main ======
 def main():
     ensure_dirs()
+    started_at = time.time()
     client = genai.Client()  # reads GEMINI_API_KEY from environment
 
     files = list(iter_images(MEME_DIR))
@@ -335,6 +546,14 @@ def main():
         print(f"No images found in '{MEME_DIR}'. Put memes there first.")
         return
 
+    cache = ClassificationCache(CLASSIFY_CACHE_PATH) if USE_CLASSIFY_CACHE else None
+
+    # Stage journal: with --resume, memes an interrupted run already analyzed/generated are not redone
+    journal = RunJournal("gemini_fixed").start(resume=resume_requested(sys.argv[1:]))
+    replayed = {path: journal.replay(path, "classified") for path in files if journal.done(path, "classified")}
+    if journal.resumed:
+        print(f"[RESUME] Resuming run {journal.run_id}: {len(replayed)}/{len(files)} memes already analyzed")
+
     print(f"Analyzing {len(files)} trending memes with Gemini AI: {MODEL}")
     print(f"Focus: Only FAMOUS meme characters & templates (confidence >= {CONFIDENCE_THRESHOLD})")
     print(f"[TARGET] Generating top {MAX_NFT_IMAGES} highest quality NFT images")
@@ -347,89 +566,137 @@ def main():
     all_results = []
     
     print("\n[ANALYZE] Step 1: Analyzing all trending memes...")
-    for path in tqdm(files, desc="Analyzing"):
-        try:
-            result = classify_image(client, path)
-            all_results.append(result)
-            counts[result.get("template", "Unknown")] += 1
-            time.sleep(0.5)  # Small delay to avoid rate limits
-        except Exception as e:
-            print(f"  [ERROR] Error analyzing {path}: {e}")
+    # Cheap local pass first: only images that could become NFTs get a Gemini call
+    pending = [path for path in files if path not in replayed]
+    router = None
+    if USE_CASCADE:
+        # polling.py's seen-post index holds the full titles for the keyword rule
+        router = CascadeRouter(seen=SeenPostIndex() if os.path.exists(SEEN_INDEX_PATH) else None)
+    routes = router.route_many(pending) if router is not None else [{"send": True, "result": None}] * len(pending)
+    if router is not None and router.seen is not None:
+        router.seen.close()
+    to_send = [path for path, route in zip(pending, routes) if route["send"]]
+    for path, route in zip(pending, routes):
+        if not route["send"]:
+            journal.record(path, "classified", route["result"])
+    if router is not None:
+        print(f"  {router.summary()}")
+
+    # Decode once, drop non-images and upload downscaled copies (originals stay for NFT use);
+    # GIF/MP4 memes are reduced to a contact sheet of scene-change keyframes
+    prepared: Dict[str, Dict[str, Any]] = {}
+    to_prepare = [path for path in to_send if needs_preprocess(path)]
+    if to_prepare:
+        prepared = {item["path"]: item for item in preprocess_many(to_prepare)}
+        print(f"  {summarize_preprocess(list(prepared.values()))}")
+    rejected = {path: ValueError(item["error"]) for path, item in prepared.items() if item["error"]}
+    to_send = [path for path in to_send if path not in rejected]
+
+    # Parallel calls under an adaptive limit (backs off on 429 instead of sleeping per image)
+    engine = ClassificationEngine()
+
+    def journalled(path: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        if result.get("rationale") != "parse_error":  # Unparsed answers are retried on resume
+            journal.record(path, "classified", result)
+        return result
+
+    # Cache hits never take a concurrency slot (their ~0s latency would inflate the adaptive limit)
+    cached = {}
+    for path in to_send:
+        hit = cached_classification(path, cache, prepared.get(path))
+        if hit is not None:
+            cached[path] = journalled(path, hit)
+    to_call = [path for path in to_send if path not in cached]
+    if cached:
+        print(f"  [CACHE] {len(cached)} memes answered from the classification cache")
+
+    with tqdm(total=len(to_call), desc="Analyzing") as progress:
+        if CLASSIFY_BATCH_SIZE > 1:
+            # N images per request; a failed batch reports its error for every image in it
+            batches = [to_call[i:i + CLASSIFY_BATCH_SIZE] for i in range(0, len(to_call), CLASSIFY_BATCH_SIZE)]
+
+            def run_batch(batch):
+                outcome = classify_batch(client, batch, cache, [prepared.get(path) for path in batch] if prepared else None)
+                progress.update(len(batch))
+                return [journalled(path, result) for path, result in zip(batch, outcome)]
+
+            batch_outcomes = engine.run(batches, run_batch)
+            sent_outcomes = iter([
+                item
+                for batch, outcome in zip(batches, batch_outcomes)
+                for item in (outcome if not isinstance(outcome, Exception) else [outcome] * len(batch))
+            ])
+        else:
+            sent_outcomes = iter(engine.run(
+                to_call, lambda path: journalled(path, classify_image(client, path, cache, prepared.get(path))),
+                progress=progress))
+    fresh = {
+        path: rejected[path] if path in rejected else cached[path] if path in cached
+        else next(sent_outcomes) if route["send"] else route["result"]
+        for path, route in zip(pending, routes)
+    }
+    outcomes = [replayed[path] if path in replayed else fresh[path] for path in files]
+
+    # Outcomes come back in file order, so meme_results.jsonl keeps a stable order
+    for path, outcome in zip(files, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"  [ERROR] Error analyzing {path}: {outcome}")
             continue
+        all_results.append(outcome)
+        counts[outcome.get("template", "Unknown")] += 1
     
-    # Sort by quality and filter eligible memes
-    eligible_memes = []
-    for result in all_results:
-        if should_generate_nft(result, 0):  # Check eligibility without count limit
-            eligible_memes.append(result)
+    # Score and filter every result in one vectorized pass: NFT potential + confidence + famous character bonus.
+    # Selection is tracked by stable id (file hash), so marking results below is a dict lookup per result.
+    ranking, top_candidates = select_nft_candidates(all_results)
+    eligible_count = ranking.eligible_count
     
-    # Sort by multiple criteria: NFT potential + confidence + famous character bonus
-    def meme_quality_score(meme):
-        confidence = meme.get("confidence", 0.0)
-        nft_potential = meme.get("nft_potential", 0.0)
-        template = meme.get("template", "").lower()
-        
-        # Bonus for famous characters
-        famous_keywords = ["tom", "jerry", "pepe", "doge", "wojak", "chad", "harold", "drake", "scooby", "spongebob"]
-        fame_bonus = 0.1 if any(keyword in template for keyword in famous_keywords) else 0
-        
-        return (nft_potential * 0.5) + (confidence * 0.4) + fame_bonus
-    
-    eligible_memes.sort(key=meme_quality_score, reverse=True)
-    top_candidates = eligible_memes[:MAX_NFT_IMAGES]
-    
-    print(f"\n[QUALITY] Found {len(eligible_memes)} eligible memes, selecting top {len(top_candidates)} highest quality")
+    print(f"\n[QUALITY] Found {eligible_count} eligible memes, selecting top {len(top_candidates)} highest quality")
     
     if top_candidates:
         print(f"\n[TOP 3] Selected memes for NFT generation:")
-        for i, meme in enumerate(top_candidates, 1):
+        for i, item_id in enumerate(ranking.selected_ids(), 1):
+            meme = ranking.result(item_id)
             template = meme.get('template', 'Unknown')
             confidence = meme.get('confidence', 0)
             nft_potential = meme.get('nft_potential', 0)
-            quality_score = meme_quality_score(meme)
+            quality_score = ranking.score_of(item_id)
             print(f"  {i}. {template} (confidence: {confidence:.2f}, NFT potential: {nft_potential:.2f}, quality: {quality_score:.2f})")
     
     # Second pass: generate NFT images for top candidates
     print(f"\n[GENERATE] Step 2: Generating premium NFT images for top meme characters...")
+    for result in top_candidates:
+        print(f"\n[GENERATE] Generating NFT image for: {result.get('template')} (confidence: {result.get('confidence', 0):.2f})")
+    # All top candidates at once; the provider chain bounds each provider's latency
+    nft_paths = dict(zip(ranking.selected_ids(), generate_nft_images(client, top_candidates, journal=journal)))
     
-    with open(OUT_JSONL, "w", encoding="utf-8") as out:
-        for result in all_results:
-            # Check if this meme is in our top candidates for NFT generation
-            if result in top_candidates and nft_generated < MAX_NFT_IMAGES:
-                print(f"\n[GENERATE] Generating NFT image for: {result.get('template')} (confidence: {result.get('confidence', 0):.2f})")
-                nft_path = generate_nft_image(client, result)
-                if nft_path and nft_path != "BILLING_REQUIRED":
-                    nft_generated += 1
-                    result["nft_image_path"] = nft_path
-                    result["nft_eligible"] = True
-                    result["nft_generated"] = True
-                    result["nft_rank"] = nft_generated
-                elif nft_path == "BILLING_REQUIRED":
-                    # Still count as eligible, just no image generated due to billing
-                    result["nft_eligible"] = True
-                    result["nft_generated"] = False
-                    result["nft_image_path"] = None
-                    result["nft_rank"] = None
-                    result["billing_required"] = True
-                else:
-                    result["nft_eligible"] = True
-                    result["nft_generated"] = False
-                    result["nft_image_path"] = None
-                    result["nft_rank"] = None
-                
-                time.sleep(3)  # Longer delay for image generation
+    for item_id, result in zip(ranking.ids, all_results):
+        # Check if this meme is in our top candidates for NFT generation
+        if ranking.is_selected(item_id) and nft_generated < MAX_NFT_IMAGES:
+            nft_path = nft_paths.get(item_id, "")
+            if nft_path:
+                nft_generated += 1
+                result["nft_image_path"] = nft_path
+                result["nft_eligible"] = True
+                result["nft_generated"] = True
+                result["nft_rank"] = nft_generated
             else:
-                # Mark as not selected for NFT generation
-                result["nft_eligible"] = result in eligible_memes
+                result["nft_eligible"] = True
                 result["nft_generated"] = False
                 result["nft_image_path"] = None
                 result["nft_rank"] = None
-                if result not in eligible_memes:
-                    print(f"  [SKIP] Skipping NFT for: {result.get('template')} (confidence: {result.get('confidence', 0):.2f}, type: {result.get('meme_type', 'unknown')})")
-            
-            # Write result to file
-            json.dump(result, out, ensure_ascii=False)
-            out.write("\n")
+        else:
+            # Mark as not selected for NFT generation
+            result["nft_eligible"] = ranking.is_eligible(item_id)
+            result["nft_generated"] = False
+            result["nft_image_path"] = None
+            result["nft_rank"] = None
+            if not result["nft_eligible"]:
+                print(f"  [SKIP] Skipping NFT for: {result.get('template')} (confidence: {result.get('confidence', 0):.2f}, type: {result.get('meme_type', 'unknown')})")
+
+    # New partition in the append-only store; meme_results.jsonl is replaced with this run's snapshot
+    run_id = record_run(all_results, OUT_JSONL, started_at)
+    print(f"\n[CHECKPOINT] {journal.summary()}")
+    journal.finish()
 
     # Simple trend summary
     print(f"\n[COMPLETE] ANALYSIS COMPLETE")
@@ -442,13 +709,25 @@ def main():
     
     print(f"\n[SUMMARY] NFT ANALYSIS SUMMARY:")
     print(f"  - Total trending memes analyzed: {len(files)}")
-    print(f"  - Eligible memes found: {len(eligible_memes)}")
+    print(f"  - Eligible memes found: {eligible_count}")
     print(f"  - NFT images generated: {nft_generated}/{MAX_NFT_IMAGES}")
     
-    if nft_generated == 0 and len(eligible_memes) > 0:
+    if nft_generated == 0 and eligible_count > 0:
         print(f"  - Note: Image generation may require billing setup, but memes are ready for NFT creation")
     
-    print(f"  - Analysis success rate: {(len(eligible_memes)/len(files)*100):.1f}%")
+    print(f"  - Analysis success rate: {(eligible_count/len(files)*100):.1f}%")
+    if router is not None:
+        print(f"  - {router.summary()}")
+    print(f"  - Image providers: {get_generation_chain(client).summary()}")
+    if get_stability_client().requests:
+        print(f"  - {get_stability_client().summary()}")
+    if get_generation_cache() is not None:
+        print(f"  - Artwork cache: {get_generation_cache().hits} reused / {get_generation_cache().misses} generated")
+    print(f"  - Classification calls: {engine.calls} ({engine.retries} throttled retries, peak concurrency {engine.limiter.peak_limit:.0f})")
+    if cache is not None:
+        print(f"  - Classification cache: {cache.hits} hits / {cache.misses} misses ({cache.hit_rate*100:.0f}% hit rate)")
+        cache.close()
+    close_prompt_context(client)
 
     if nft_generated > 0:
         print(f"\n[TROPHY] TOP {nft_generated} NFT MEMES GENERATED:")
@@ -459,6 +738,8 @@ def main():
 
     print(f"\n[FOLDER] OUTPUT LOCATIONS:")
     print(f"  - Analysis results: {OUT_JSONL}")
+    if run_id:
+        print(f"  - Results history: {RESULTS_STORE_DIR} (run {run_id})")
     print(f"  - Generated NFT images: {NFT_DIR}")
     print(f"  - Ready for minting on NFT marketplaces!")
 
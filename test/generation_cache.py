@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Generated-Artwork Cache
+Persistent cache of NFT images keyed by everything that determines the
+output: (provider, engine, prompt hash, width, height, steps, cfg, seed).
+Images are stored content-addressed (objects/ab/<sha256>.png) with a SQLite
+index from cache key to artifact, and evicted least-recently-used first
+once the cache exceeds its size or entry budget.
+
+Layout:
+    results/generation_cache/
+        index.sqlite
+        objects/ab/abcdef....png
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Any, List, Optional
+
+GEN_CACHE_DIR = os.getenv("GEN_CACHE_DIR", os.path.join("results", "generation_cache"))
+GEN_CACHE_MAX_MB = float(os.getenv("GEN_CACHE_MAX_MB", "500"))
+GEN_CACHE_MAX_ENTRIES = int(os.getenv("GEN_CACHE_MAX_ENTRIES", "2000"))
+
+KEY_FIELDS = ("provider", "engine", "prompt_hash", "width", "height", "steps", "cfg", "seed")
+
+
+def generation_key(provider: str, engine: str, prompt: str, width: int = None, height: int = None,
+                   steps: int = None, cfg: float = None, seed: int = None) -> Dict[str, Any]:
+    """
+    Cache-key fields for one generation request (the prompt is stored as its
+    hash). Leave seed as None for requests that ask the API for a random seed.
+    """
+    return {
+        "provider": provider,
+        "engine": engine,
+        "prompt_hash": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+        "width": width,
+        "height": height,
+        "steps": steps,
+        "cfg": cfg,
+        "seed": seed,
+    }
+
+
+def _key_id(key: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps([key.get(f) for f in KEY_FIELDS]).encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """
+    Thread-safe artwork cache. get() returns the path of a cached image,
+    put() stores new image bytes and returns their content-addressed path.
+    Several keys may point at the same object; an object is deleted when its
+    last key is evicted, so anything exposing an object elsewhere must hardlink
+    or copy it (MemeStore.link_into(..., symlink=False)), never symlink it.
+    """
+
+    def __init__(self, root: str = GEN_CACHE_DIR, max_bytes: float = GEN_CACHE_MAX_MB * 1024 * 1024,
+                 max_entries: int = GEN_CACHE_MAX_ENTRIES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS artworks (
+                key_id      TEXT PRIMARY KEY,
+                provider    TEXT,
+                engine      TEXT,
+                prompt_hash TEXT,
+                width       INTEGER,
+                height      INTEGER,
+                steps       INTEGER,
+                cfg         REAL,
+                seed        INTEGER,
+                sha256      TEXT NOT NULL,
+                size        INTEGER NOT NULL,
+                created_at  REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_artworks_last_access ON artworks (last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_artworks_sha256 ON artworks (sha256)")
+        self._conn.commit()
+
+    def object_path(self, sha256: str, ext: str = ".png") -> str:
+        return os.path.join(self.root, "objects", sha256[:2], f"{sha256}{ext}")
+
+    def get(self, key: Dict[str, Any]) -> Optional[str]:
+        """Path of the cached image for this key, or None"""
+        return self.get_any([key])
+
+    def get_any(self, keys: List[Dict[str, Any]]) -> Optional[str]:
+        """First cached image among several keys (e.g. one per provider); one hit or miss"""
+        with self._lock:
+            for key in keys:
+                key_id = _key_id(key)
+                row = self._conn.execute("SELECT sha256 FROM artworks WHERE key_id=?", (key_id,)).fetchone()
+                if row is None:
+                    continue
+                path = self.object_path(row[0])
+                if not os.path.exists(path):  # Object removed behind our back
+                    self._conn.execute("DELETE FROM artworks WHERE key_id=?", (key_id,))
+                    self._conn.commit()
+                    continue
+                self._conn.execute("UPDATE artworks SET last_access=? WHERE key_id=?", (time.time(), key_id))
+                self._conn.commit()
+                self.hits += 1
+                return path
+            self.misses += 1
+        return None
+
+    def put(self, key: Dict[str, Any], data: bytes) -> str:
+        """Store image bytes under this key; returns the object path"""
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.object_path(sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.part"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        now = time.time()
+        key_id = _key_id(key)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO artworks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key_id, *[key.get(f) for f in KEY_FIELDS], sha256, len(data), now, now),
+            )
+            self._conn.commit()
+        self.evict(keep=key_id)
+        return path
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """
+        Drop least recently used entries until within budget. Returns entries
+        removed. The entry with key id `keep` (the one just stored) is never
+        evicted, even if it alone exceeds the budget.
+        """
+        removed = 0
+        with self._lock:
+            total = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size FROM artworks GROUP BY sha256)"
+            ).fetchone()[0]
+            entries = self._conn.execute("SELECT COUNT(*) FROM artworks").fetchone()[0]
+            if total <= self.max_bytes and entries <= self.max_entries:
+                return 0
+            for key_id, sha256, size in self._conn.execute(
+                "SELECT key_id, sha256, size FROM artworks ORDER BY last_access ASC"
+            ).fetchall():
+                if total <= self.max_bytes and entries <= self.max_entries:
+                    break
+                if key_id == keep:
+                    continue
+                self._conn.execute("DELETE FROM artworks WHERE key_id=?", (key_id,))
+                entries -= 1
+                removed += 1
+                still_used = self._conn.execute("SELECT 1 FROM artworks WHERE sha256=? LIMIT 1", (sha256,)).fetchone()
+                if not still_used:
+                    total -= size
+                    try:
+                        os.remove(self.object_path(sha256))
+                    except FileNotFoundError:
+                        pass
+            self._conn.commit()
+        return removed
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM artworks").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Image Preprocessing Before Upload
+Decodes each image once, rejects files that are not images (HTML error
+pages, truncated downloads), downscales to a maximum edge and re-encodes to
+a compact JPEG/WebP for the classification request. The original file is
+never modified; it is still what NFT generation and the results point at.
+
+Prepared copies are cached by the original's SHA-256 and the encode
+settings, so an image is only re-encoded once.
+"""
+
+import os
+import hashlib
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List
+
+from PIL import Image, ImageFile, UnidentifiedImageError
+
+from keyframes import is_animated_path, prepare_animated, VIDEO_EXTS
+
+USE_PREPROCESS = os.getenv("PREPROCESS", "1") != "0"
+PREPROCESS_MAX_EDGE = int(os.getenv("PREPROCESS_MAX_EDGE", "1024"))
+PREPROCESS_FORMAT = os.getenv("PREPROCESS_FORMAT", "JPEG").upper()  # JPEG or WEBP
+PREPROCESS_QUALITY = int(os.getenv("PREPROCESS_QUALITY", "85"))
+PREPROCESS_DIR = os.getenv("PREPROCESS_DIR", os.path.join("meme_store", "prepared"))
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Originals at or below this size that need no resize are uploaded as-is
+PASSTHROUGH_BYTES = 300 * 1024
+PASSTHROUGH_FORMATS = {"JPEG", "WEBP"}
+
+_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+_EXTENSIONS = {"JPEG": ".jpg", "WEBP": ".webp"}
+
+
+@contextmanager
+def _reject_truncated():
+    """Make truncated files raise while decoding (Pillow's flag is global, so it is restored after)"""
+    previous = ImageFile.LOAD_TRUNCATED_IMAGES
+    ImageFile.LOAD_TRUNCATED_IMAGES = False  # A truncated download is a rejection, not a grey half-image
+    try:
+        yield
+    finally:
+        ImageFile.LOAD_TRUNCATED_IMAGES = previous
+
+
+def _flatten(img: Image.Image) -> Image.Image:
+    """RGB copy; transparency is composited onto white (JPEG has no alpha)"""
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        rgba = img.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.split()[-1])
+        return background
+    return img.convert("RGB")
+
+
+def preprocess_image(path: str, max_edge: int = PREPROCESS_MAX_EDGE, fmt: str = PREPROCESS_FORMAT,
+                     quality: int = PREPROCESS_QUALITY, out_dir: str = PREPROCESS_DIR) -> Dict[str, Any]:
+    """
+    Prepare one image for upload. Never raises; returns a dict with
+    path, upload_path, mime_type, sha256 (of the original), bytes_in,
+    bytes_out, width, height and error (None on success).
+    Animated GIF/WebP and videos become a keyframe contact sheet.
+    """
+    if os.path.splitext(path)[1].lower() in VIDEO_EXTS:
+        return prepare_animated(path)
+    result = {"path": path, "upload_path": None, "mime_type": None, "sha256": None,
+              "bytes_in": 0, "bytes_out": 0, "width": 0, "height": 0, "error": None}
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+        result["bytes_in"] = len(raw)
+        result["sha256"] = hashlib.sha256(raw).hexdigest()
+
+        with _reject_truncated(), Image.open(path) as img:
+            if getattr(img, "is_animated", False):
+                return prepare_animated(path)
+            source_format = img.format
+            result["width"], result["height"] = img.size
+            needs_resize = max(img.size) > max_edge
+
+            if not needs_resize and source_format in PASSTHROUGH_FORMATS and len(raw) <= PASSTHROUGH_BYTES:
+                img.load()  # Still decode fully: catches truncated files
+                result.update(upload_path=path, mime_type=_MIME_TYPES[source_format], bytes_out=len(raw))
+                return result
+
+            out_path = os.path.join(out_dir, result["sha256"][:2],
+                                    f"{result['sha256']}_{max_edge}_{quality}{_EXTENSIONS.get(fmt, '.jpg')}")
+            if os.path.exists(out_path):
+                result.update(upload_path=out_path, mime_type=_MIME_TYPES.get(fmt, "image/jpeg"),
+                              bytes_out=os.path.getsize(out_path))
+                return result
+
+            img.draft("RGB", (max_edge, max_edge))  # JPEG: decode at reduced scale
+            img.seek(0)  # Animated images: first frame
+            frame = _flatten(img)
+        frame.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        tmp_path = f"{out_path}.{os.getpid()}.part"
+        frame.save(tmp_path, format=fmt if fmt in _EXTENSIONS else "JPEG", quality=quality, optimize=True)
+        os.replace(tmp_path, out_path)
+        result.update(upload_path=out_path, mime_type=_MIME_TYPES.get(fmt, "image/jpeg"),
+                      bytes_out=os.path.getsize(out_path))
+    except (UnidentifiedImageError, OSError, ValueError, Image.DecompressionBombError) as e:
+        result["error"] = f"Not a valid image: {e}"
+    return result
+
+
+def needs_preprocess(path: str) -> bool:
+    """Animations always need keyframes; still images only when preprocessing is on"""
+    return USE_PREPROCESS or is_animated_path(path)
+
+
+def preprocess_many(paths: List[str], workers: int = PREPROCESS_WORKERS) -> List[Dict[str, Any]]:
+    """Prepare images in a process pool; results are in input order"""
+    if workers <= 1 or len(paths) <= 1:
+        return [preprocess_image(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(preprocess_image, paths, chunksize=4))
+
+
+def summarize(prepared: List[Dict[str, Any]]) -> str:
+    ok = [p for p in prepared if not p["error"]]
+    bytes_in = sum(p["bytes_in"] for p in ok)
+    bytes_out = sum(p["bytes_out"] for p in ok)
+    rejected = len(prepared) - len(ok)
+    ratio = f"{bytes_out/bytes_in*100:.0f}%" if bytes_in else "n/a"
+    return (f"Preprocess: {len(ok)} images, {bytes_in/1048576:.1f} MB -> {bytes_out/1048576:.1f} MB "
+            f"({ratio} of original), {rejected} rejected")
+
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Keyframe Sampling for Animated Memes
+Decodes GIF (Pillow) and MP4 (OpenCV, optional) one frame at a time, keeps a
+few representative keyframes chosen by scene-change detection, and tiles
+them into a single contact-sheet JPEG that classification can upload like
+any other image. At most KEYFRAME_MAX frames (downscaled) are ever held in
+memory, however long the animation is.
+
+Usage:
+    python keyframes.py animation.gif [more.mp4 ...]
+"""
+
+import os
+import sys
+import math
+import hashlib
+from typing import Dict, Any, Iterator, List, Tuple
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+try:
+    import cv2  # opencv-python, only needed for video files
+except ImportError:
+    cv2 = None
+
+KEYFRAME_MAX = int(os.getenv("KEYFRAME_MAX", "4"))  # Frames on the contact sheet
+KEYFRAME_SCENE_THRESHOLD = float(os.getenv("KEYFRAME_SCENE_THRESHOLD", "0.12"))  # Mean abs diff, 0-1
+KEYFRAME_MAX_SCANNED = int(os.getenv("KEYFRAME_MAX_SCANNED", "600"))  # Frames decoded at most
+KEYFRAME_TILE = int(os.getenv("KEYFRAME_TILE", "512"))  # Contact-sheet tile edge (px)
+KEYFRAME_DIR = os.getenv("KEYFRAME_DIR", os.path.join("meme_store", "keyframes"))
+
+ANIMATED_EXTS = {".gif", ".mp4", ".webm", ".mov"}
+VIDEO_EXTS = {".mp4", ".webm", ".mov"}
+
+_SIGNATURE_SIZE = 32
+
+
+def is_animated_path(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in ANIMATED_EXTS
+
+
+def _iter_gif_frames(path: str) -> Iterator[Image.Image]:
+    with Image.open(path) as img:
+        for frame in ImageSequence.Iterator(img):
+            yield frame.convert("RGB")
+
+
+def _iter_video_frames(path: str, max_scanned: int) -> Iterator[Image.Image]:
+    if cv2 is None:
+        raise ValueError("video keyframes need opencv-python (pip install opencv-python)")
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"cannot open video '{path}'")
+    try:
+        total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        step = max(1, math.ceil(total / max_scanned)) if total else 1
+        index = 0
+        while True:
+            # grab() skips the colour conversion for frames we do not sample
+            if not capture.grab():
+                break
+            if index % step == 0:
+                ok, frame = capture.retrieve()
+                if not ok:
+                    break
+                yield Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            index += 1
+    finally:
+        capture.release()
+
+
+def iter_frames(path: str, max_scanned: int = KEYFRAME_MAX_SCANNED) -> Iterator[Image.Image]:
+    """Lazily decoded RGB frames (videos are subsampled to about max_scanned frames)"""
+    ext = os.path.splitext(path)[1].lower()
+    frames = _iter_video_frames(path, max_scanned) if ext in VIDEO_EXTS else _iter_gif_frames(path)
+    for count, frame in enumerate(frames):
+        if count >= max_scanned:
+            break
+        yield frame
+
+
+def _signature(frame: Image.Image) -> np.ndarray:
+    small = frame.convert("L").resize((_SIGNATURE_SIZE, _SIGNATURE_SIZE), Image.BILINEAR)
+    return np.asarray(small, dtype=np.float32) / 255.0
+
+
+def select_keyframes(frames: Iterator[Image.Image], max_frames: int = KEYFRAME_MAX,
+                     threshold: float = KEYFRAME_SCENE_THRESHOLD, tile: int = KEYFRAME_TILE) -> Tuple[List[Image.Image], int]:
+    """
+    Scene-change keyframes in playback order, plus the number of frames scanned.
+
+    The first frame is always kept. A frame that differs from the last
+    keyframe by more than `threshold` starts a new scene; when there are more
+    scenes than max_frames, the weakest changes are dropped.
+    """
+    kept: List[Tuple[int, float, Image.Image]] = []  # (frame index, change score, thumbnail)
+    last_signature = None
+    scanned = 0
+    for index, frame in enumerate(frames):
+        scanned += 1
+        signature = _signature(frame)
+        change = float("inf") if last_signature is None else float(np.abs(signature - last_signature).mean())
+        if change < threshold:
+            continue
+        last_signature = signature
+        thumb = frame.copy()
+        thumb.thumbnail((tile, tile), Image.BILINEAR)
+        kept.append((index, change, thumb))
+        if len(kept) > max_frames:
+            weakest = min(range(1, len(kept)), key=lambda i: kept[i][1])
+            del kept[weakest]
+    return [thumb for _, _, thumb in kept], scanned
+
+
+def contact_sheet(frames: List[Image.Image], tile: int = KEYFRAME_TILE) -> Image.Image:
+    """Tile frames left-to-right, top-to-bottom on a near-square grid"""
+    columns = math.ceil(math.sqrt(len(frames)))
+    rows = math.ceil(len(frames) / columns)
+    sheet = Image.new("RGB", (columns * tile, rows * tile), (0, 0, 0))
+    for i, frame in enumerate(frames):
+        x = (i % columns) * tile + (tile - frame.width) // 2
+        y = (i // columns) * tile + (tile - frame.height) // 2
+        sheet.paste(frame, (x, y))
+    return sheet
+
+
+def prepare_animated(path: str, out_dir: str = KEYFRAME_DIR, quality: int = 85) -> Dict[str, Any]:
+    """
+    Contact sheet for an animated meme, in the same dict shape as
+    image_preprocess.preprocess_image() (plus frames / frames_scanned).
+    Never raises; failures are reported in "error".
+    """
+    result = {"path": path, "upload_path": None, "mime_type": None, "sha256": None,
+              "bytes_in": 0, "bytes_out": 0, "width": 0, "height": 0, "error": None,
+              "frames": 0, "frames_scanned": 0}
+    try:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+                result["bytes_in"] += len(chunk)
+        result["sha256"] = digest.hexdigest()
+
+        out_path = os.path.join(out_dir, result["sha256"][:2],
+                                f"{result['sha256']}_{KEYFRAME_MAX}_{KEYFRAME_TILE}.jpg")
+        if not os.path.exists(out_path):
+            frames, scanned = select_keyframes(iter_frames(path))
+            if not frames:
+                raise ValueError("no decodable frames")
+            sheet = contact_sheet(frames)
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            tmp_path = f"{out_path}.{os.getpid()}.part"
+            sheet.save(tmp_path, format="JPEG", quality=quality, optimize=True)
+            os.replace(tmp_path, out_path)
+            result.update(frames=len(frames), frames_scanned=scanned)
+
+        with Image.open(out_path) as sheet:
+            result["width"], result["height"] = sheet.size
+        result.update(upload_path=out_path, mime_type="image/jpeg", bytes_out=os.path.getsize(out_path))
+    except Exception as e:
+        result["error"] = f"Not a valid animation: {e}"
+    return result
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+    for arg in sys.argv[1:]:
+        info = prepare_animated(arg)
+        if info["error"]:
+            print(f"[ERROR] {arg}: {info['error']}")
+        else:
+            print(f"[KEYFRAMES] {arg}: {info['frames']} keyframes from {info['frames_scanned']} frames -> {info['upload_path']}")
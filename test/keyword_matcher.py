@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Aho-Corasick Keyword Matcher
+Scores a post title against every viral keyword in a single pass, with
+whole-word semantics ("sus" does not match "suspect") and deduplicated
+patterns.
+
+Usage:
+    python keyword_matcher.py --bench   # micro-benchmark against the naive loop
+"""
+
+import sys
+import time
+import random
+from collections import deque
+from typing import Iterable, List
+
+
+def normalize_keyword(keyword: str) -> str:
+    """Lowercase and collapse whitespace so duplicates like "stonks"/"Stonks " merge"""
+    return " ".join(keyword.lower().split())
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class KeywordMatcher:
+    """
+    Compiled multi-pattern matcher (Aho-Corasick automaton).
+
+    find() returns each keyword that occurs in the text as a whole word, once,
+    in the order the keywords were given.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: List[str] = []
+        seen = set()
+        for keyword in keywords:
+            normalized = normalize_keyword(keyword)
+            if normalized and normalized not in seen:
+                seen.add(normalized)
+                self.keywords.append(normalized)
+
+        # State 0 is the root. goto[state] maps a character to the next state;
+        # out[state] lists the keyword indices that end at this state.
+        self._goto: List[dict] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        for index, keyword in enumerate(self.keywords):
+            self._add(keyword, index)
+        self._build_failure_links()
+
+    def _add(self, keyword: str, index: int):
+        state = 0
+        for ch in keyword:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(index)
+
+    def _build_failure_links(self):
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for ch, nxt in self._goto[state].items():
+                pending.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+                # Inherit matches that end at the failure state (suffix keywords)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> List[str]:
+        """Whole-word keywords present in text (unique, in keyword order)"""
+        text = " ".join(text.lower().split())
+        goto, fail, out, keywords = self._goto, self._fail, self._out, self.keywords
+        length = len(text)
+        found = set()
+        state = 0
+        for end, ch in enumerate(text, 1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            # Right boundary is shared by every keyword ending here
+            if end < length and _is_word_char(text[end]):
+                continue
+            for index in out[state]:
+                start = end - len(keywords[index])
+                if start == 0 or not _is_word_char(text[start - 1]):
+                    found.add(index)
+        return [keywords[i] for i in sorted(found)]
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+
+def _naive_find(keywords: List[str], text: str) -> List[str]:
+    """The original polling.py loop: substring test per keyword"""
+    title_lower = text.lower()
+    return [keyword for keyword in keywords if keyword in title_lower]
+
+
+def benchmark(num_keywords: int = 2000, num_titles: int = 10000, seed: int = 7):
+    """Compare the compiled matcher with the naive per-keyword loop"""
+    from polling import VIRAL_KEYWORDS
+
+    rng = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyz"
+    keywords = list(VIRAL_KEYWORDS)
+    while len(keywords) < num_keywords:
+        words = ["".join(rng.choice(alphabet) for _ in range(rng.randint(3, 9))) for _ in range(rng.randint(1, 2))]
+        keywords.append(" ".join(words))
+
+    vocabulary = keywords[:200] + ["when", "the", "my", "code", "works", "me", "after", "monday", "cat", "dog"]
+    titles = [" ".join(rng.choice(vocabulary) for _ in range(rng.randint(5, 14))) for _ in range(num_titles)]
+
+    started = time.perf_counter()
+    matcher = KeywordMatcher(keywords)
+    build_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for title in titles:
+        _naive_find(keywords, title)
+    naive_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for title in titles:
+        matcher.find(title)
+    matcher_time = time.perf_counter() - started
+
+    print(f"[BENCH] {len(matcher)} keywords (from {len(keywords)}), {num_titles} titles")
+    print(f"  - Automaton build: {build_time*1000:.1f} ms")
+    print(f"  - Naive loop:      {naive_time:.3f} s ({num_titles/naive_time:,.0f} titles/s)")
+    print(f"  - Aho-Corasick:    {matcher_time:.3f} s ({num_titles/matcher_time:,.0f} titles/s)")
+    print(f"  - Speedup:         {naive_time/matcher_time:.1f}x")
+
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        benchmark()
+    else:
+        print(__doc__)
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Offline CPU Meme-Template Recognizer
+Perceptual-hash nearest-neighbour lookup against a prebuilt reference index
+of known templates (gemini_fixed.LABELS + additional_meme_labels.txt).
+Returns the same JSON shape as gemini_fixed.classify_image() with no
+network calls, so large candidate sets can be triaged locally.
+
+Reference images live in one folder per template:
+    meme_templates/Drakeposting/1.jpg
+    meme_templates/Distracted Boyfriend/a.png
+
+Usage:
+    python local_vision.py build [meme_templates] [results/template_index.npz]
+    python local_vision.py classify image1.jpg image2.png ...
+    python local_vision.py --bench [directory]
+"""
+
+import os
+import re
+import sys
+import time
+import pathlib
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+REFERENCE_DIR = os.getenv("TEMPLATE_REFERENCE_DIR", "meme_templates")
+INDEX_PATH = os.getenv("TEMPLATE_INDEX_PATH", os.path.join("results", "template_index.npz"))
+ADDITIONAL_LABELS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "additional_meme_labels.txt")
+
+# Distances are pHash + dHash Hamming distances (0-128)
+MATCH_DISTANCE = int(os.getenv("TEMPLATE_MATCH_DISTANCE", "24"))  # At or below: same template
+MAX_DISTANCE = 64  # Distance that maps to confidence 0.0
+
+LOCAL_MODEL = "local-phash"
+IMG_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp"}
+
+# meme_type for known templates (anything else is reported as "template")
+LABEL_TYPES = {
+    "Pepe the Frog": "character",
+    "Doge": "character",
+    "Wojak": "character",
+    "NPC Wojak": "character",
+    "Chad": "character",
+    "Doomer": "character",
+    "Gigachad": "character",
+    "Grumpy Cat": "character",
+    "Trollface": "character",
+    "Hide the Pain Harold": "character",
+    "Crying Michael Jordan": "reaction",
+    "Arthur Fist": "reaction",
+    "Vince McMahon Reactions": "reaction",
+    "Tom the Cat (Reaction)": "reaction",
+    "Sad Cat Thumbs Up": "reaction",
+    "Cat Reaction Memes": "reaction",
+}
+
+_HASH_SIZE = 8
+_DCT_SIZE = 32
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0, :] = np.sqrt(1.0 / n)
+    return matrix
+
+
+_DCT = _dct_matrix(_DCT_SIZE)
+_BIT_WEIGHTS = (1 << np.arange(63, -1, -1, dtype=np.uint64)).astype(np.uint64)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int(np.bitwise_or.reduce(_BIT_WEIGHTS[bits.ravel()]) if bits.any() else 0)
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values).astype(np.int32)
+    as_bytes = values.view(np.uint8).reshape(values.shape + (8,))
+    return np.unpackbits(as_bytes, axis=-1).sum(axis=-1).astype(np.int32)
+
+
+def load_gray(path: str, size: int = _DCT_SIZE) -> np.ndarray:
+    """Decode an image straight to a small grayscale array (JPEG draft mode skips full decode)"""
+    with Image.open(path) as img:
+        img.draft("L", (size * 2, size * 2))
+        return np.asarray(img.convert("L").resize((size, size), Image.BILINEAR), dtype=np.float32)
+
+
+def image_hashes(gray: np.ndarray) -> Tuple[int, int]:
+    """(pHash, dHash) 64-bit perceptual hashes of a 32x32 grayscale array"""
+    low = (_DCT @ gray @ _DCT.T)[:_HASH_SIZE, :_HASH_SIZE]
+    phash = _bits_to_int(low > np.median(low.ravel()[1:]))
+
+    small = np.asarray(Image.fromarray(gray.astype(np.uint8)).resize((_HASH_SIZE + 1, _HASH_SIZE), Image.BILINEAR),
+                       dtype=np.int16)
+    dhash = _bits_to_int(small[:, 1:] > small[:, :-1])
+    return phash, dhash
+
+
+def hash_file(path: str) -> Tuple[int, int]:
+    return image_hashes(load_gray(path))
+
+
+def load_label_taxonomy() -> List[str]:
+    """gemini_fixed.LABELS plus the names listed in additional_meme_labels.txt"""
+    from gemini_fixed import LABELS
+
+    labels = list(LABELS)
+    try:
+        with open(ADDITIONAL_LABELS_PATH, "r", encoding="utf-8") as f:
+            labels += re.findall(r'"([^"]+)"', f.read())
+    except FileNotFoundError:
+        pass
+    seen = set()
+    return [label for label in labels if not (label.lower() in seen or seen.add(label.lower()))]
+
+
+class TemplateIndex:
+    """Reference hashes for known templates, searched with vectorized Hamming distance"""
+
+    def __init__(self, labels: List[str], phashes: np.ndarray, dhashes: np.ndarray, sources: List[str]):
+        self.labels = labels
+        self.phashes = phashes.astype(np.uint64)
+        self.dhashes = dhashes.astype(np.uint64)
+        self.sources = sources
+
+    @classmethod
+    def build(cls, reference_dir: str = REFERENCE_DIR) -> "TemplateIndex":
+        """Hash every image under reference_dir/<template name>/"""
+        taxonomy = {label.lower(): label for label in load_label_taxonomy()}
+        labels, phashes, dhashes, sources = [], [], [], []
+        for folder in sorted(pathlib.Path(reference_dir).iterdir()):
+            if not folder.is_dir():
+                continue
+            label = taxonomy.get(folder.name.lower())
+            if label is None:
+                print(f"  [WARN] '{folder.name}' is not in the label taxonomy; indexing it as-is")
+                label = folder.name
+            for image_path in sorted(folder.iterdir()):
+                if image_path.suffix.lower() not in IMG_EXTS:
+                    continue
+                try:
+                    phash, dhash = hash_file(str(image_path))
+                except Exception as e:
+                    print(f"  [WARN] Skipping {image_path}: {e}")
+                    continue
+                labels.append(label)
+                phashes.append(phash)
+                dhashes.append(dhash)
+                sources.append(str(image_path))
+        return cls(labels, np.array(phashes, dtype=np.uint64), np.array(dhashes, dtype=np.uint64), sources)
+
+    def save(self, path: str = INDEX_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez_compressed(path, labels=np.array(self.labels), phashes=self.phashes,
+                            dhashes=self.dhashes, sources=np.array(self.sources))
+
+    @classmethod
+    def load(cls, path: str = INDEX_PATH) -> "TemplateIndex":
+        data = np.load(path, allow_pickle=False)
+        return cls(data["labels"].tolist(), data["phashes"], data["dhashes"], data["sources"].tolist())
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def nearest(self, phash: int, dhash: int, k: int = 3) -> List[Tuple[str, int]]:
+        """k nearest distinct templates as (label, distance), closest first"""
+        if not self.labels:
+            return []
+        distances = (_popcount(self.phashes ^ np.uint64(phash)) + _popcount(self.dhashes ^ np.uint64(dhash)))
+        order = np.argsort(distances, kind="stable")
+        matches, seen = [], set()
+        for i in order:
+            label = self.labels[i]
+            if label in seen:
+                continue
+            seen.add(label)
+            matches.append((label, int(distances[i])))
+            if len(matches) == k:
+                break
+        return matches
+
+
+_index_cache: Dict[str, TemplateIndex] = {}
+
+
+def get_index(path: str = INDEX_PATH) -> TemplateIndex:
+    """Load (once per process) the reference index"""
+    if path not in _index_cache:
+        _index_cache[path] = TemplateIndex.load(path)
+    return _index_cache[path]
+
+
+def classify_image_local(path: str, index: Optional[TemplateIndex] = None) -> Dict[str, Any]:
+    """Classify one image against the template index (same keys as gemini_fixed.classify_image)"""
+    index = index or get_index()
+    with open(path, "rb") as f:
+        file_hash = hashlib.sha256(f.read()).hexdigest()
+
+    phash, dhash = hash_file(path)
+    matches = index.nearest(phash, dhash)
+    best_label, best_distance = matches[0] if matches else ("Unknown", MAX_DISTANCE * 2)
+    confidence = round(max(0.0, 1.0 - best_distance / MAX_DISTANCE), 3)
+    matched = best_distance <= MATCH_DISTANCE
+
+    stat = pathlib.Path(path).stat()
+    return {
+        "template": best_label if matched else "Unknown",
+        "confidence": confidence if matched else 0.0,
+        "meme_type": LABEL_TYPES.get(best_label, "template") if matched else "unknown",
+        "description": f"Perceptual-hash match to reference template '{best_label}'" if matched
+                       else "No close reference template",
+        "known_variants": [label for label, _ in matches[1:] if matched],
+        "rationale": f"local phash+dhash distance {best_distance} to '{best_label}' (match <= {MATCH_DISTANCE})",
+        "nft_potential": 0.0,  # Local matches never qualify for NFT generation on their own
+        "template_distance": best_distance,
+        "nearest_template": best_label,
+        "file": path,
+        "source": "Unknown",
+        "timestamp": int(getattr(stat, "st_mtime", time.time())),
+        "model": LOCAL_MODEL,
+        "file_hash": file_hash,
+    }
+
+
+def _classify_worker(args: Tuple[str, str]) -> Dict[str, Any]:
+    path, index_path = args
+    try:
+        return classify_image_local(path, get_index(index_path))
+    except Exception as e:
+        return {"file": path, "template": "Unknown", "confidence": 0.0, "meme_type": "unknown",
+                "rationale": f"local_error: {e}", "model": LOCAL_MODEL}
+
+
+def classify_many(paths: List[str], index_path: str = INDEX_PATH, workers: int = 0) -> List[Dict[str, Any]]:
+    """Classify a batch of images in input order (workers > 1 uses a process pool)"""
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_classify_worker, [(p, index_path) for p in paths], chunksize=16))
+    return [_classify_worker((p, index_path)) for p in paths]
+
+
+def _bench(directory: str):
+    paths = [str(p) for p in pathlib.Path(directory).rglob("*") if p.suffix.lower() in IMG_EXTS]
+    if not paths:
+        print(f"No images found in '{directory}'")
+        return
+    started = time.perf_counter()
+    for path in paths:
+        hash_file(path)
+    elapsed = time.perf_counter() - started
+    print(f"[BENCH] Hashed {len(paths)} images in {elapsed:.2f}s ({len(paths)/elapsed:,.0f} images/s on one core)")
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        return
+    if args[0] == "build":
+        reference_dir = args[1] if len(args) > 1 else REFERENCE_DIR
+        index_path = args[2] if len(args) > 2 else INDEX_PATH
+        index = TemplateIndex.build(reference_dir)
+        index.save(index_path)
+        print(f"[INDEX] {len(index)} reference images across {len(set(index.labels))} templates -> {index_path}")
+    elif args[0] == "classify":
+        for result in classify_many(args[1:]):
+            print(f"{result['file']}: {result['template']} (confidence: {result['confidence']:.2f}, "
+                  f"distance: {result.get('template_distance')})")
+    elif args[0] == "--bench":
+        _bench(args[1] if len(args) > 1 else "downloaded_memes")
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
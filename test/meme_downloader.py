@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pooled, Parallel Image Downloader
+Streams meme images (and short videos) to disk over a shared keep-alive
+session with size caps, content-type checks and retries on transient failures
+"""
+
+import os
+import time
+import random
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Downloader configuration
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "8"))
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(20 * 1024 * 1024)))  # 20 MB cap per image
+DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", "3"))
+CHUNK_SIZE = 64 * 1024
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 20
+USER_AGENT = "MemeTrendApp/1.0 (image downloader)"
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+ACCEPTED_TYPES = ("image/", "video/")  # Video memes are reduced to keyframes downstream
+
+
+class DownloadError(Exception):
+    """Raised when a download is rejected (bad content type, too large, etc.)"""
+
+
+def _failed(url: str, error: Exception) -> Dict[str, Any]:
+    return {"url": url, "path": None, "bytes": 0, "sha256": None, "content_type": None, "error": str(error)}
+
+
+class MemeDownloader:
+    """
+    Concurrent image downloader sharing one pooled keep-alive session.
+
+    Bodies are streamed to a temporary ".part" file in chunks and renamed into
+    place only when complete, so memory stays at one chunk per worker and a
+    failed download never leaves a half-written image behind.
+    """
+
+    def __init__(self, max_workers: int = DOWNLOAD_WORKERS, max_bytes: int = MAX_IMAGE_BYTES,
+                 retries: int = DOWNLOAD_RETRIES, timeout: Tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT),
+                 chunk_size: int = CHUNK_SIZE):
+        self.max_workers = max(1, max_workers)
+        self.max_bytes = max_bytes
+        self.retries = retries
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.session = self._build_session()
+
+    def _build_session(self) -> requests.Session:
+        session = requests.Session()
+        # Status-code retries (429/5xx, honouring Retry-After) are handled by urllib3;
+        # connection errors, timeouts and drops mid-body are retried in download().
+        retry = Retry(
+            total=None,
+            connect=0,
+            read=0,
+            status=self.retries,
+            backoff_factor=0.5,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers, max_retries=retry)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({"User-Agent": USER_AGENT})
+        return session
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _stream_to_file(self, url: str, dest_path: str) -> Dict[str, Any]:
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+
+            content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            if not content_type.startswith(ACCEPTED_TYPES):
+                raise DownloadError(f"unexpected content type '{content_type or 'missing'}'")
+
+            declared = response.headers.get("Content-Length")
+            if declared and declared.isdigit() and int(declared) > self.max_bytes:
+                raise DownloadError(f"image too large ({int(declared):,} bytes > {self.max_bytes:,})")
+
+            digest = hashlib.sha256()
+            size = 0
+            tmp_path = dest_path + ".part"
+            try:
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        if not chunk:
+                            continue
+                        size += len(chunk)
+                        if size > self.max_bytes:
+                            raise DownloadError(f"image too large (> {self.max_bytes:,} bytes)")
+                        digest.update(chunk)
+                        f.write(chunk)
+                os.replace(tmp_path, dest_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        return {
+            "url": url,
+            "path": dest_path,
+            "bytes": size,
+            "sha256": digest.hexdigest(),
+            "content_type": content_type,
+            "error": None,
+        }
+
+    def download(self, url: str, dest_path: str) -> Dict[str, Any]:
+        """Download one image to dest_path. Never raises; check result["error"]."""
+        attempt = 0
+        while True:
+            try:
+                return self._stream_to_file(url, dest_path)
+            except DownloadError as e:
+                return _failed(url, e)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                attempt += 1
+                if attempt > self.retries:
+                    return _failed(url, e)
+                time.sleep(0.5 * (2 ** (attempt - 1)) * (1 + random.random()))
+            except Exception as e:
+                return _failed(url, e)
+
+    def download_many(self, jobs: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Download (url, dest_path) jobs concurrently.
+        Results are returned in the same order as jobs.
+        """
+        if not jobs:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(jobs))) as pool:
+            return list(pool.map(lambda job: self.download(*job), jobs))
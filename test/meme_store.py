@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Content-Addressed Meme Store
+Keeps every downloaded meme once, keyed by SHA-256, with a small JSON index
+from Reddit post id and URL to the blob. Each poll's "current top 10" is a
+view of hardlinks (or symlinks) into the store, so repeated polls only pay
+for posts we have not seen before.
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+STORE_DIR = os.getenv("MEME_STORE_DIR", "meme_store")
+
+
+def sha256_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _extension_from_url(url: str) -> str:
+    ext = os.path.splitext(url.split("?", 1)[0])[1].lower()
+    return ext or ".jpg"
+
+
+class MemeStore:
+    """
+    Persistent content-addressed blob store.
+
+    Layout:
+        <root>/blobs/ab/abcdef....jpg   - image bytes, named by SHA-256
+        <root>/index.json               - {"posts": {post_id: entry}, "urls": {url: sha256}}
+        <root>/tmp/                     - in-flight downloads
+    """
+
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        self.tmp_dir = os.path.join(root, "tmp")
+        self.index_path = os.path.join(root, "index.json")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.index = self._load_index()
+
+    def _load_index(self) -> Dict[str, Any]:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            index = {}
+        index.setdefault("posts", {})
+        index.setdefault("urls", {})
+        return index
+
+    def save(self):
+        """Atomically write the index to disk"""
+        with self._lock:
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.index, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+
+    def blob_path(self, sha256: str, ext: str) -> str:
+        return os.path.join(self.blob_dir, sha256[:2], f"{sha256}{ext}")
+
+    def lookup(self, post_id: Optional[str] = None, url: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Find a stored blob by post id or URL. Returns None if unknown or the blob is gone."""
+        with self._lock:
+            entry = self.index["posts"].get(post_id) if post_id else None
+            if entry is None and url:
+                sha = self.index["urls"].get(url)
+                if sha:
+                    entry = {"sha256": sha, "ext": _extension_from_url(url), "url": url}
+        if entry is None:
+            return None
+        path = self.blob_path(entry["sha256"], entry["ext"])
+        if not os.path.exists(path):
+            return None
+        return dict(entry, path=path)
+
+    def add_file(self, src_path: str, post_id: str, url: str, sha256: Optional[str] = None) -> Dict[str, Any]:
+        """Move a downloaded file into the store and index it"""
+        if sha256 is None:
+            sha256 = sha256_file(src_path)
+        ext = _extension_from_url(url)
+        path = self.blob_path(sha256, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.remove(src_path)  # Same bytes already stored (e.g. a repost)
+        else:
+            os.replace(src_path, path)
+
+        entry = {
+            "sha256": sha256,
+            "ext": ext,
+            "url": url,
+            "bytes": os.path.getsize(path),
+            "stored_at": int(time.time()),
+        }
+        with self._lock:
+            self.index["posts"][post_id] = entry
+            self.index["urls"][url] = sha256
+        return dict(entry, path=path)
+
+    def fetch_many(self, downloader, items: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Resolve (post_id, url) pairs to stored blobs.
+
+        Known posts/URLs skip the network entirely; the rest are downloaded
+        concurrently with `downloader` (a MemeDownloader) and added to the store.
+        Results come back in input order with a "cached" flag and "error" key.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        jobs, job_slots = [], []
+
+        for i, (post_id, url) in enumerate(items):
+            entry = self.lookup(post_id=post_id, url=url)
+            if entry is not None:
+                if post_id not in self.index["posts"]:
+                    with self._lock:
+                        self.index["posts"][post_id] = {k: v for k, v in entry.items() if k != "path"}
+                results[i] = dict(entry, cached=True, error=None)
+                continue
+            tmp_path = os.path.join(self.tmp_dir, f"{post_id}-{uuid.uuid4().hex}{_extension_from_url(url)}")
+            jobs.append((url, tmp_path))
+            job_slots.append(i)
+
+        for i, download in zip(job_slots, downloader.download_many(jobs)):
+            post_id, url = items[i]
+            if download["error"]:
+                results[i] = {"path": None, "sha256": None, "url": url, "cached": False, "error": download["error"]}
+                continue
+            entry = self.add_file(download["path"], post_id, url, sha256=download["sha256"])
+            results[i] = dict(entry, cached=False, error=None)
+
+        self.save()
+        return results
+
+    @staticmethod
+    def clear_view(view_dir: str):
+        """Remove files/links from a view directory (never the store itself)"""
+        os.makedirs(view_dir, exist_ok=True)
+        for name in os.listdir(view_dir):
+            path = os.path.join(view_dir, name)
+            if os.path.isfile(path) or os.path.islink(path):
+                os.remove(path)
+
+    @staticmethod
+    def link_into(view_dir: str, blob_path: str, filename: str, symlink: bool = True) -> str:
+        """
+        Expose one blob in a view directory. Hardlinks are used where possible,
+        then symlinks, then plain copies (e.g. across filesystems without
+        symlink permission). symlink=False skips straight to a copy, for blobs
+        a cache may delete while the view is still in use.
+        """
+        link_path = os.path.join(view_dir, filename)
+        if os.path.lexists(link_path):
+            os.remove(link_path)
+        try:
+            os.link(blob_path, link_path)
+        except OSError:
+            try:
+                if not symlink:
+                    raise OSError("symlinks not allowed for this view")
+                os.symlink(os.path.abspath(blob_path), link_path)
+            except OSError:
+                shutil.copy2(blob_path, link_path)
+        return link_path
+
+    @staticmethod
+    def materialize_view(view_dir: str, entries: List[Tuple[str, str]]) -> List[str]:
+        """Replace the contents of view_dir with links to store blobs ((blob_path, filename) pairs)"""
+        MemeStore.clear_view(view_dir)
+        return [MemeStore.link_into(view_dir, blob_path, filename) for blob_path, filename in entries]
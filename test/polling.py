@@ -1,4 +1,3 @@
-
 # -*- coding: utf-8 -*-
 
 import sys
@@ -11,11 +10,18 @@ if os.name == 'nt':  # Windows
     sys.stderr = codecs.getwriter('utf-8')(sys.stderr.detach())
 
 import praw
-import requests
-import os
+import threading
 from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 
+from rate_limiter import TokenBucket
+from meme_downloader import MemeDownloader
+from meme_store import MemeStore
+from keyword_matcher import KeywordMatcher
+from topk_selector import TopKSelector
+from seen_index import SeenPostIndex
+
 def safe_str(text, max_length=60):
     """Safely encode string for console output, removing problematic Unicode characters"""
     if not isinstance(text, str):
@@ -65,144 +71,482 @@ VIRAL_KEYWORDS = [
     "expanding brain", "stonks", "not stonks"
 ]
 
+# Compiled once: deduplicated keywords, matched as whole words in one pass over the title
+KEYWORD_MATCHER = KeywordMatcher(VIRAL_KEYWORDS)
+
 # Minimum score threshold for viral content
 MIN_SCORE = 1000  # Only get highly upvoted content
 
 # Save folder
-SAVE_DIR = "downloaded_memes"
-os.makedirs(SAVE_DIR, exist_ok=True)
-
-# Clear previous downloads for fresh trending data
-import shutil
-if os.path.exists(SAVE_DIR):
-    shutil.rmtree(SAVE_DIR)
-os.makedirs(SAVE_DIR, exist_ok=True)
-
-print("[SEARCH] Starting viral meme hunt across multiple subreddits...")
-print(f"[TARGET] Top 10 viral memes from {len(SUBREDDITS)} subreddits")
-print(f"[FILTER] Minimum score threshold: {MIN_SCORE} upvotes")
-print("="*60)
-
-reddit = praw.Reddit(
-    client_id=CLIENT_ID,
-    client_secret=CLIENT_SECRET,
-    username=USERNAME,
-    password=PASSWORD,
-    user_agent=USER_AGENT
-)
-
-# 📊 Store all potential memes with scores
-all_memes = []
-viral_keywords_found = Counter()
-
-# 🔍 Search through multiple subreddits
-for subreddit_name in SUBREDDITS:
-    print(f"\n[SEARCH] Checking r/{subreddit_name}...")
-    
-    try:
-        subreddit = reddit.subreddit(subreddit_name)
-        
-        # Get hot and top posts from today
-        hot_posts = list(subreddit.hot(limit=20))
-        top_posts = list(subreddit.top(time_filter="day", limit=20))
-        
-        # Combine and check all posts
-        all_posts = hot_posts + top_posts
-        
-        for post in all_posts:
-            # Skip if not an image
-            if not post.url.endswith((".jpg", ".jpeg", ".png", ".gif", ".webp")):
-                continue
-            
-            # Skip if score too low
-            if post.score < MIN_SCORE:
+SAVE_DIR = "downloaded_memes"  # View of the current top 10 (links into the meme store)
+
+# Listing fetch settings
+LISTING_LIMIT = 20  # Posts per hot/top listing call
+INGEST_MODE = os.getenv("INGEST_MODE", "concurrent")  # "concurrent", "sequential" or "multireddit"
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "8"))  # Parallel listing fetches
+
+# Reddit OAuth quota: 100 queries per minute per client id.
+# The token bucket starts with REDDIT_BURST tokens so a normal poll never waits.
+REDDIT_QPM = float(os.getenv("REDDIT_QPM", "100"))
+REDDIT_BURST = float(os.getenv("REDDIT_BURST", "30"))
+
+TOP_K = 10  # Memes kept from the virality ranking
+MAX_PER_SUBREDDIT = int(os.getenv("MAX_PER_SUBREDDIT", "0"))  # Cap per subreddit in the top K (0 = no cap)
+
+# Multireddit mode: one combined r/a+b+c listing per sort, up to 100 posts per request
+MULTIREDDIT_PAGE_SIZE = 100
+
+# Incremental polling: page through listings with `after` cursors and stop once a
+# page holds nothing new; posts whose score barely moved keep their stored scoring
+INGEST_INCREMENTAL = os.getenv("INGEST_INCREMENTAL", "1") != "0"
+PAGE_SIZE = int(os.getenv("INGEST_PAGE_SIZE", str(LISTING_LIMIT)))
+# Cap on pages per listing; a warm index usually stops after the first one
+MAX_PAGES = int(os.getenv("INGEST_MAX_PAGES", "3"))
+SCORE_CHANGE_THRESHOLD = 0.05  # Relative score change that counts as "changed"
+CARRY_OVER_SECONDS = int(os.getenv("INGEST_CARRY_OVER_SECONDS", "1800"))  # Keep ranking unrefetched candidates this long
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".mp4", ".webm", ".mov")  # Videos are analyzed as keyframes
+
+def create_reddit() -> praw.Reddit:
+    """Create an authenticated Reddit client"""
+    return praw.Reddit(
+        client_id=CLIENT_ID,
+        client_secret=CLIENT_SECRET,
+        username=USERNAME,
+        password=PASSWORD,
+        user_agent=USER_AGENT
+    )
+
+def is_unchanged(score, known):
+    """True if a known post's score moved less than SCORE_CHANGE_THRESHOLD since the last poll"""
+    if not known or known.get('last_score') is None:
+        return False
+    last_score = known['last_score']
+    return abs(score - last_score) <= max(1, abs(last_score) * SCORE_CHANGE_THRESHOLD)
+
+def fetch_listing_pages(listing, index, limiter=None, page_size=PAGE_SIZE, max_pages=MAX_PAGES):
+    """
+    Page through one listing with `after` cursors, stopping at the first page
+    that holds no post the index has not seen (deeper pages were covered by
+    earlier polls). Returns (posts, skipped_from): the listing position where
+    pages were skipped that way, or None if the listing was read as far as allowed.
+    """
+    posts = []
+    after = None
+    for page_number in range(max_pages):
+        if limiter:
+            limiter.acquire()
+        params = {"after": after} if after else {}
+        page = list(listing(limit=page_size, params=params))
+        posts.extend(page)
+        if len(page) < page_size or page_number == max_pages - 1:
+            break
+        known = index.get_many(post.id for post in page)
+        if all(post.id in known for post in page):
+            return posts, len(posts)
+        after = page[-1].fullname
+    return posts, None
+
+class ListingPosts(list):
+    """
+    hot + top posts of one subreddit (a plain list for scoring), plus each
+    post's position per listing and where each listing's pages were skipped
+    """
+
+    def __init__(self, listings):
+        # listings: {"hot": (posts, skipped_from), "top": (posts, skipped_from)}
+        super().__init__(post for posts, _ in listings.values() for post in posts)
+        self.skipped_from = {sort: skipped_from for sort, (_, skipped_from) in listings.items()}
+        self.positions = {sort: {} for sort in listings}
+        for sort, (posts, _) in listings.items():
+            for position, post in enumerate(posts):
+                self.positions[sort].setdefault(post.id, position)
+
+    def position_row(self, post_id):
+        return {f"{sort}_position": positions.get(post_id) for sort, positions in self.positions.items()}
+
+    def carries_over(self, previous):
+        """
+        True if a known candidate missing from this poll sat on a page that was
+        skipped as unchanged. One that was on a fetched page and is gone now
+        fell off the listing (or was removed) and is dropped.
+        """
+        skipped = False
+        for sort, skipped_from in self.skipped_from.items():
+            position = previous.get(f"{sort}_position")
+            if position is None:
                 continue
-            
-            title_lower = post.title.lower()
-            
-            # Check for viral keywords
-            viral_score = 0
-            found_keywords = []
-            
-            for keyword in VIRAL_KEYWORDS:
-                if keyword in title_lower:
-                    viral_score += 1
-                    found_keywords.append(keyword)
-                    viral_keywords_found[keyword] += 1
-            
-            # Calculate total virality score (upvotes + keyword matches)
-            total_score = post.score + (viral_score * 500)  # Boost keyword matches
-            
-            meme_data = {
-                'post': post,
-                'subreddit': subreddit_name,
-                'score': post.score,
-                'viral_score': viral_score,
-                'total_score': total_score,
-                'keywords': found_keywords,
-                'title': post.title,
-                'url': post.url
-            }
-            
-            all_memes.append(meme_data)
-        
-        print(f"  [STATS] Found {len([m for m in all_memes if m['subreddit'] == subreddit_name])} potential viral memes")
+            if skipped_from is None or position < skipped_from:
+                return False
+            skipped = True
+        return skipped
+
+def fetch_subreddit_posts(reddit, subreddit_name, limiter=None, index=None):
+    """Fetch hot and today's top posts for one subreddit"""
+    subreddit = reddit.subreddit(subreddit_name)
+
+    if index is not None:
+        return ListingPosts({
+            "hot": fetch_listing_pages(subreddit.hot, index, limiter),
+            "top": fetch_listing_pages(lambda **kw: subreddit.top(time_filter="day", **kw), index, limiter),
+        })
+
+    # Get hot and top posts from today (two listing calls)
+    if limiter:
+        limiter.acquire()
+    hot_posts = list(subreddit.hot(limit=LISTING_LIMIT))
+    if limiter:
+        limiter.acquire()
+    top_posts = list(subreddit.top(time_filter="day", limit=LISTING_LIMIT))
+
+    # Combine and check all posts
+    return hot_posts + top_posts
+
+def iter_listings_sequential(reddit, subreddits, index=None):
+    """Yield (subreddit_name, posts, error) one subreddit at a time"""
+    for subreddit_name in subreddits:
+        try:
+            yield subreddit_name, fetch_subreddit_posts(reddit, subreddit_name, index=index), None
+        except Exception as e:
+            yield subreddit_name, [], e
         time.sleep(1)  # Be nice to Reddit API
-        
-    except Exception as e:
-        print(f"  [ERROR] Error accessing r/{subreddit_name}: {e}")
-        continue
 
-# RANKING: Sort by total virality score and get top 10
-print(f"\n[RANKING] Ranking {len(all_memes)} total memes by virality...")
-top_viral_memes = sorted(all_memes, key=lambda x: x['total_score'], reverse=True)[:10]
+def iter_listings_concurrent(subreddits, limiter=None, max_workers=INGEST_WORKERS, index=None):
+    """
+    Yield (subreddit_name, posts, error) as each subreddit's listings arrive.
 
-print(f"\n[TOP] TOP 10 VIRAL MEMES:")
-print("="*60)
+    Listing calls run in parallel and share one token bucket, so total wall
+    time is bound by the Reddit quota rather than the number of subreddits.
+    PRAW is not thread-safe, so each worker thread gets its own client; each
+    client's OAuth password-grant request is charged to the bucket as well.
+    """
+    if limiter is None:
+        limiter = TokenBucket.per_minute(REDDIT_QPM, burst=REDDIT_BURST)
+
+    local = threading.local()
+
+    def worker(subreddit_name):
+        if not hasattr(local, "reddit"):
+            limiter.acquire()  # The new client's token request (PRAW authenticates on its first call)
+            local.reddit = create_reddit()
+        return fetch_subreddit_posts(local.reddit, subreddit_name, limiter, index)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(subreddits)))) as pool:
+        futures = {pool.submit(worker, name): name for name in subreddits}
+        for future in as_completed(futures):
+            subreddit_name = futures[future]
+            try:
+                yield subreddit_name, future.result(), None
+            except Exception as e:
+                yield subreddit_name, [], e
+
+def iter_listings_multireddit(reddit, subreddits, limiter=None, index=None):
+    """
+    Yield (subreddit_name, posts, error) from one combined multireddit listing
+    per sort (r/memes+dankmemes+...), attributing each post back to its subreddit.
+
+    Pulls LISTING_LIMIT posts per subreddit in total, so 10 subreddits cost
+    2 paginated listings of 2 requests each instead of 20 listing calls.
+    """
+    if limiter is None:
+        limiter = TokenBucket.per_minute(REDDIT_QPM, burst=REDDIT_BURST)
+
+    limit = LISTING_LIMIT * len(subreddits)
+    pages = -(-limit // MULTIREDDIT_PAGE_SIZE)
+    names = {name.lower(): name for name in subreddits}
+    multireddit = reddit.subreddit("+".join(subreddits))
+    combined_name = "+".join(subreddits)
 
-# 💾 Download the top 10 viral memes
-downloaded_count = 0
-for i, meme_data in enumerate(top_viral_memes, 1):
-    post = meme_data['post']
-    
-    print(f"\n{i:2d}. [MEME] {safe_str(meme_data['title'], 60)}")
-    print(f"    [SCORE] Score: {meme_data['score']:,} | Viral Keywords: {len(meme_data['keywords'])}")
-    print(f"    [TAGS] Keywords: {', '.join(meme_data['keywords'][:5])}")
-    print(f"    [SUBREDDIT] r/{meme_data['subreddit']}")
-    
     try:
-        # Download the image
-        img_response = requests.get(post.url, timeout=10)
-        img_response.raise_for_status()
-        
-        # Create filename with ranking and subreddit info
-        file_extension = os.path.splitext(post.url)[1] or '.jpg'
-        safe_title = safe_str(post.title, 30)
-        safe_title = "".join(c for c in safe_title if c.isalnum() or c in (' ', '-', '_'))
-        safe_title = safe_title.replace(' ', '_')
-        
-        filename = f"{i:02d}_{post.id}_{meme_data['subreddit']}_{safe_title}{file_extension}"
-        filepath = os.path.join(SAVE_DIR, filename)
-        
-        with open(filepath, "wb") as f:
-            f.write(img_response.content)
-        
-        downloaded_count += 1
-        print(f"    [SUCCESS] Saved: {filename}")
-        
+        if index is not None:
+            hot_posts, hot_skipped = fetch_listing_pages(multireddit.hot, index, limiter, MULTIREDDIT_PAGE_SIZE, pages)
+            top_posts, top_skipped = fetch_listing_pages(lambda **kw: multireddit.top(time_filter="day", **kw),
+                                                         index, limiter, MULTIREDDIT_PAGE_SIZE, pages)
+        else:
+            for _ in range(pages):
+                limiter.acquire()
+            hot_posts = list(multireddit.hot(limit=limit))
+            for _ in range(pages):
+                limiter.acquire()
+            top_posts = list(multireddit.top(time_filter="day", limit=limit))
     except Exception as e:
-        print(f"    [ERROR] Error downloading: {e}")
-        continue
+        yield combined_name, [], e
+        return
+
+    by_subreddit = defaultdict(lambda: {"hot": [], "top": []})
+    for sort, posts in (("hot", hot_posts), ("top", top_posts)):
+        for post in posts:
+            # display_name comes with the listing data; no extra request
+            name = names.get(post.subreddit.display_name.lower())
+            if name is not None:
+                by_subreddit[name][sort].append(post)
+
+    for subreddit_name in subreddits:
+        listings = by_subreddit[subreddit_name]
+        if index is not None:
+            # Positions are within this subreddit's share of the combined listing,
+            # so a skipped page starts right after its last fetched post
+            yield subreddit_name, ListingPosts({
+                "hot": (listings["hot"], None if hot_skipped is None else len(listings["hot"])),
+                "top": (listings["top"], None if top_skipped is None else len(listings["top"])),
+            }), None
+        else:
+            yield subreddit_name, listings["hot"] + listings["top"], None
+
+class MemeRecord:
+    """Compact ranked-post record (only the fields we use, no live PRAW object)"""
+    __slots__ = ("post_id", "subreddit", "score", "viral_score", "total_score",
+                 "keywords", "title", "url", "rank")
+
+    def __init__(self, post_id, subreddit, score, viral_score, total_score, keywords, title, url):
+        self.post_id = post_id
+        self.subreddit = subreddit
+        self.score = score
+        self.viral_score = viral_score
+        self.total_score = total_score
+        self.keywords = keywords
+        self.title = title
+        self.url = url
+        self.rank = None
+
+def score_post(post, subreddit_name, viral_keywords_found, keywords=None):
+    """
+    Score one post, or return None if it is not a viral image.
+    Pass `keywords` (from the seen-post index) to skip keyword matching.
+    """
+    # Skip if not an image
+    if not post.url.endswith(IMAGE_EXTS):
+        return None
+
+    # Skip if score too low
+    if post.score < MIN_SCORE:
+        return None
+
+    # Check for viral keywords (single pass, whole words only)
+    found_keywords = keywords if keywords is not None else KEYWORD_MATCHER.find(post.title)
+    viral_score = len(found_keywords)
+    viral_keywords_found.update(found_keywords)
+
+    # Calculate total virality score (upvotes + keyword matches)
+    total_score = post.score + (viral_score * 500)  # Boost keyword matches
+
+    return MemeRecord(post.id, subreddit_name, post.score, viral_score, total_score,
+                      found_keywords, post.title, post.url)
+
+def collect_memes(subreddits=SUBREDDITS, mode=INGEST_MODE, top_k=TOP_K, index=None):
+    """
+    Fetch listings for all subreddits and keep the top_k memes by virality.
+
+    Candidates stream through a bounded heap deduplicated by post id, so only
+    top_k compact records are held no matter how many posts are scanned.
+    With a SeenPostIndex, listings are paged incrementally, known posts whose
+    score has not changed keep their stored scoring without being re-scored,
+    and keyword matches are reused for any known post whose title is the same.
+    Returns (top memes best-first, keyword counter, number of candidates).
+    """
+    viral_keywords_found = Counter()
+    selector = TopKSelector(top_k, max_per_group=MAX_PER_SUBREDDIT)
+    candidates = 0
+    unchanged = 0
+    carried = 0
+    subreddit_order = {name: i for i, name in enumerate(subreddits)}
+
+    if mode == "sequential":
+        listings = iter_listings_sequential(create_reddit(), subreddits, index=index)
+    elif mode == "multireddit":
+        listings = iter_listings_multireddit(create_reddit(), subreddits, index=index)
+    else:
+        listings = iter_listings_concurrent(subreddits, index=index)
+
+    # 🔍 Search through multiple subreddits
+    for subreddit_name, posts, error in listings:
+        print(f"\n[SEARCH] Checking r/{subreddit_name}...")
+        if error is not None:
+            print(f"  [ERROR] Error accessing r/{subreddit_name}: {error}")
+            continue
+
+        known = index.get_many(post.id for post in posts) if index is not None else {}
+
+        # hot and top overlap heavily; score each post once
+        seen_ids = set()
+        seen_rows = []
+        touched_rows = []
+        found = 0
+        for position, post in enumerate(posts):
+            if post.id in seen_ids:
+                continue
+            seen_ids.add(post.id)
+
+            previous = known.get(post.id)
+            if is_unchanged(post.score, previous):
+                # Score barely moved: keep the stored verdict and only refresh when/where it was seen
+                unchanged += 1
+                touched_rows.append({'post_id': post.id, **posts.position_row(post.id)})
+                if previous['total_score'] is None:
+                    continue
+                record = MemeRecord(post.id, subreddit_name, previous['last_score'], len(previous['keywords']),
+                                    previous['total_score'], previous['keywords'], post.title, post.url)
+                viral_keywords_found.update(record.keywords)
+            else:
+                # Keyword matches depend only on the title
+                keywords = None
+                if previous and previous['total_score'] is not None and previous['title'] == post.title:
+                    keywords = previous['keywords']
+                record = score_post(post, subreddit_name, viral_keywords_found, keywords)
+                seen_rows.append({
+                    'post_id': post.id,
+                    'subreddit': subreddit_name,
+                    'title': post.title,
+                    'url': post.url,
+                    'score': post.score,
+                    'total_score': record.total_score if record else None,
+                    'keywords': record.keywords if record else None,
+                    **(posts.position_row(post.id) if index is not None else {}),
+                })
+            if record is None:
+                continue
+            found += 1
+            # Tie-break on configured subreddit order, then listing position,
+            # so results do not depend on which fetch finished first
+            order = subreddit_order.get(subreddit_name, len(subreddits)) * 1_000_000 + position
+            selector.push(record.post_id, record.total_score, record, order, group=subreddit_name)
+
+        if index is not None:
+            # Candidates on pages skipped as unchanged keep their place in the ranking;
+            # ones that were on a fetched page and are missing now are dropped
+            position = len(posts)
+            for previous in index.recent_candidates(subreddit_name, time.time() - CARRY_OVER_SECONDS):
+                if previous['post_id'] in seen_ids or not posts.carries_over(previous):
+                    continue
+                record = MemeRecord(previous['post_id'], subreddit_name, previous['last_score'],
+                                    len(previous['keywords']), previous['total_score'],
+                                    previous['keywords'], previous['title'], previous['url'])
+                viral_keywords_found.update(record.keywords)
+                order = subreddit_order.get(subreddit_name, len(subreddits)) * 1_000_000 + position
+                selector.push(record.post_id, record.total_score, record, order, group=subreddit_name)
+                position += 1
+                found += 1
+                carried += 1
+            index.record_seen(seen_rows)
+            index.touch(touched_rows)
+        candidates += found
+
+        print(f"  [STATS] Found {found} potential viral memes")
+
+    if index is not None:
+        print(f"\n[INCREMENTAL] {unchanged} posts unchanged since the last poll (not re-scored), "
+              f"{carried} candidates carried over from skipped pages")
+    return selector.results(), viral_keywords_found, candidates
+
+def meme_filename(rank, meme):
+    """Create filename with ranking and subreddit info"""
+    file_extension = os.path.splitext(meme.url)[1] or '.jpg'
+    safe_title = safe_str(meme.title, 30)
+    safe_title = "".join(c for c in safe_title if c.isalnum() or c in (' ', '-', '_'))
+    safe_title = safe_title.replace(' ', '_')
+    return f"{rank:02d}_{meme.post_id}_{meme.subreddit}_{safe_title}{file_extension}"
+
+def title_from_filename(filename):
+    """The (sanitised) title part of a meme_filename() name, without the rank/post id/subreddit prefix"""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    parts = stem.split('_', 2)
+    if len(parts) < 3:
+        return stem.replace('_', ' ')
+    rest = parts[2]
+    for subreddit in sorted(SUBREDDITS, key=len, reverse=True):
+        if rest.lower().startswith(subreddit.lower() + '_') or rest.lower() == subreddit.lower():
+            rest = rest[len(subreddit) + 1:]
+            break
+    else:
+        rest = rest.split('_', 1)[1] if '_' in rest else ''  # Unknown subreddit: names have no underscores
+    return rest.replace('_', ' ')
+
+def download_top_memes(top_viral_memes, store=None, index=None, downloader=None):
+    """
+    Fetch the ranked memes into the content-addressed store and rebuild
+    SAVE_DIR as a view of links into it. Posts already in the store skip
+    the network. Returns one store result per meme, in rank order.
+    Pass `downloader` to reuse (or instrument) a MemeDownloader; it is not closed.
+    """
+    if store is None:
+        store = MemeStore()
+
+    if downloader is not None:
+        results = store.fetch_many(downloader, [(m.post_id, m.url) for m in top_viral_memes])
+    else:
+        with MemeDownloader() as downloader:
+            results = store.fetch_many(downloader, [(m.post_id, m.url) for m in top_viral_memes])
+
+    # Current top 10 = hardlinks/symlinks into the store (the store itself is never wiped)
+    view_entries = []
+    for i, (meme, result) in enumerate(zip(top_viral_memes, results), 1):
+        if not result['error']:
+            if index is not None:
+                index.mark_downloaded(meme.post_id, result['sha256'])
+            result['filename'] = meme_filename(i, meme)
+            view_entries.append((result['path'], result['filename']))
+    MemeStore.materialize_view(SAVE_DIR, view_entries)
+    return results
+
+def main():
+    print("[SEARCH] Starting viral meme hunt across multiple subreddits...")
+    print(f"[TARGET] Top 10 viral memes from {len(SUBREDDITS)} subreddits")
+    print(f"[FILTER] Minimum score threshold: {MIN_SCORE} upvotes")
+    print(f"[MODE] Listing fetch mode: {INGEST_MODE}")
+    print("="*60)
+
+    # Remember what earlier polls saw so unchanged posts are cheap
+    index = SeenPostIndex() if INGEST_INCREMENTAL else None
+    if index is not None:
+        index.prune()
+
+    # 📊 Keep only the top 10 viral memes while streaming through every listing
+    started = time.monotonic()
+    top_viral_memes, viral_keywords_found, candidates = collect_memes(index=index)
+    print(f"\n[TIMING] Listings fetched in {time.monotonic() - started:.1f}s")
+    print(f"\n[RANKING] Ranked {candidates} total memes by virality...")
+
+    print(f"\n[TOP] TOP 10 VIRAL MEMES:")
+    print("="*60)
+
+    for i, meme in enumerate(top_viral_memes, 1):
+        print(f"\n{i:2d}. [MEME] {safe_str(meme.title, 60)}")
+        print(f"    [SCORE] Score: {meme.score:,} | Viral Keywords: {len(meme.keywords)}")
+        print(f"    [TAGS] Keywords: {', '.join(meme.keywords[:5])}")
+        print(f"    [SUBREDDIT] r/{meme.subreddit}")
+
+    # 💾 Download the top 10 viral memes (new posts only) in parallel over a pooled session
+    started = time.monotonic()
+    results = download_top_memes(top_viral_memes, index=index)
+    if index is not None:
+        index.close()
+    print(f"\n[DOWNLOAD] Resolved {len(results)} images in {time.monotonic() - started:.1f}s")
+
+    downloaded_count = 0
+    cached_count = 0
+    for i, result in enumerate(results, 1):
+        if result['error']:
+            print(f"  {i:2d}. [ERROR] Error downloading: {result['error']}")
+            continue
+        downloaded_count += 1
+        if result['cached']:
+            cached_count += 1
+            print(f"  {i:2d}. [CACHED] Already stored: {result['filename']}")
+        else:
+            print(f"  {i:2d}. [SUCCESS] Saved: {result['filename']} ({result['bytes']:,} bytes)")
+
+    # 📊 Print final statistics
+    print(f"\n" + "="*60)
+    print(f"[COMPLETE] VIRAL MEME HUNT COMPLETE!")
+    print(f"[DOWNLOADED] Successfully downloaded: {downloaded_count}/10 viral memes ({cached_count} already in store)")
+    print(f"[LOCATION] Location: {SAVE_DIR}")
 
-# 📊 Print final statistics
-print(f"\n" + "="*60)
-print(f"[COMPLETE] VIRAL MEME HUNT COMPLETE!")
-print(f"[DOWNLOADED] Successfully downloaded: {downloaded_count}/10 viral memes")
-print(f"[LOCATION] Location: {SAVE_DIR}")
+    print(f"\n[KEYWORDS] TOP VIRAL KEYWORDS FOUND:")
+    for keyword, count in viral_keywords_found.most_common(10):
+        print(f"  {keyword}: {count} mentions")
 
-print(f"\n[KEYWORDS] TOP VIRAL KEYWORDS FOUND:")
-for keyword, count in viral_keywords_found.most_common(10):
-    print(f"  {keyword}: {count} mentions")
+    print(f"\n[INFO] Ready for NFT generation! These are the most viral memes right now.")
+    print(f"[INFO] Run the NFT generator to create images from the top familiar memes!")
 
-print(f"\n[INFO] Ready for NFT generation! These are the most viral memes right now.")
-print(f"[INFO] Run the NFT generator to create images from the top familiar memes!")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
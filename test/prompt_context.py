@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prompt Context Caching
+Registers the static classification instructions once per session so each
+Gemini request only carries the image(s):
+
+- "cache":  google-genai cached content (client.caches.create), referenced by
+            name in every request; falls back to "system" if the model or
+            prompt cannot be cached (e.g. below the minimum cacheable size)
+- "system": the instructions as a system instruction on every request
+- "inline": the original behaviour (instructions sent as a content part)
+
+The cached content is re-created when the prompt hash or model changes, or
+shortly before its TTL runs out.
+"""
+
+import os
+import time
+import threading
+from typing import Any, Dict, Optional
+
+from google.genai import types
+
+from classification_cache import text_hash
+
+PROMPT_CONTEXT_MODE = os.getenv("PROMPT_CONTEXT_MODE", "cache")  # cache | system | inline
+PROMPT_CACHE_TTL = int(os.getenv("PROMPT_CACHE_TTL", "3600"))  # Seconds
+PROMPT_CACHE_REFRESH_MARGIN = 60  # Re-create this many seconds before expiry
+
+
+class PromptContext:
+    """Per-client holder of the cached (or system) instructions; thread-safe"""
+
+    def __init__(self, client: Any, model: str, instructions: str, mode: str = PROMPT_CONTEXT_MODE,
+                 ttl: int = PROMPT_CACHE_TTL):
+        self.client = client
+        self.model = model
+        self.instructions = instructions
+        self.mode = mode
+        self.ttl = ttl
+        self.cache_name: Optional[str] = None
+        self._key = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self.creates = 0
+        self.fallback_reason: Optional[str] = None
+
+    @property
+    def inline(self) -> bool:
+        """True when the instructions still have to be sent with each request"""
+        return self.mode == "inline"
+
+    def update(self, model: str, instructions: str):
+        """Point the context at a new model/prompt; the cache is rebuilt on next use"""
+        with self._lock:
+            self.model = model
+            self.instructions = instructions
+
+    def _ensure_cache(self) -> Optional[str]:
+        key = (self.model, text_hash(self.instructions))
+        now = time.time()
+        if self.cache_name and key == self._key and now < self._expires_at - PROMPT_CACHE_REFRESH_MARGIN:
+            return self.cache_name
+
+        self._delete_cache()
+        try:
+            cached = self.client.caches.create(
+                model=self.model,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=self.instructions,
+                    display_name=f"meme-classifier-{key[1][:12]}",
+                    ttl=f"{self.ttl}s",
+                ),
+            )
+        except Exception as e:
+            self.mode = "system"
+            self.fallback_reason = str(e)
+            print(f"  [CACHE] Prompt caching unavailable, using system instruction instead: {e}")
+            return None
+        self.cache_name = cached.name
+        self._key = key
+        self._expires_at = now + self.ttl
+        self.creates += 1
+        return self.cache_name
+
+    def _delete_cache(self):
+        if self.cache_name:
+            try:
+                self.client.caches.delete(name=self.cache_name)
+            except Exception:
+                pass  # Expires on its own
+            self.cache_name = None
+
+    def config(self, **kwargs) -> types.GenerateContentConfig:
+        """GenerateContentConfig carrying the instructions the cheapest available way"""
+        with self._lock:
+            if self.mode == "cache":
+                name = self._ensure_cache()
+                if name:
+                    return types.GenerateContentConfig(cached_content=name, **kwargs)
+            if self.mode in ("cache", "system"):
+                return types.GenerateContentConfig(system_instruction=self.instructions, **kwargs)
+        return types.GenerateContentConfig(**kwargs)
+
+    def close(self):
+        with self._lock:
+            self._delete_cache()
+
+
+_contexts: Dict[int, PromptContext] = {}
+_contexts_lock = threading.Lock()
+
+
+def get_prompt_context(client: Any, model: str, instructions: str) -> PromptContext:
+    """One PromptContext per client; a changed model/prompt triggers a refresh"""
+    with _contexts_lock:
+        context = _contexts.get(id(client))
+        if context is None or context.client is not client:
+            context = _contexts[id(client)] = PromptContext(client, model, instructions)
+    if context.model != model or context.instructions != instructions:
+        context.update(model, instructions)
+    return context
+
+
+def close_prompt_context(client: Any):
+    with _contexts_lock:
+        context = _contexts.pop(id(client), None)
+    if context is not None:
+        context.close()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Image-Generation Provider Chain
+Runs NFT image providers (Stability AI -> Gemini Imagen -> local fallback)
+with a per-provider timeout and circuit breaker, so one hung or failing
+provider cannot stall a run:
+
+- sequential (default): the next provider starts when the previous one
+  fails, returns nothing or exceeds its timeout
+- hedged (GEN_HEDGE_AFTER > 0): the next provider also starts if the
+  current one has not answered after GEN_HEDGE_AFTER seconds; the first
+  success wins
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+GEN_HEDGE_AFTER = float(os.getenv("GEN_HEDGE_AFTER", "0"))  # Seconds; 0 = sequential fallback only
+GEN_BREAKER_FAILURES = int(os.getenv("GEN_BREAKER_FAILURES", "3"))  # Consecutive failures that open a breaker
+GEN_BREAKER_RESET = float(os.getenv("GEN_BREAKER_RESET", "120"))  # Seconds before a trial call is allowed
+
+
+class ProviderUnavailable(Exception):
+    """Raised by a provider that will keep failing for this run (e.g. billing not enabled)"""
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failures` consecutive failures; after `reset_after`
+    seconds one trial call is let through (half-open): success closes the
+    breaker, failure re-opens it.
+    """
+
+    def __init__(self, failures: int = GEN_BREAKER_FAILURES, reset_after: float = GEN_BREAKER_RESET):
+        self.max_failures = failures
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_after else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.failures >= self.max_failures or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+    def trip(self):
+        """Open immediately (permanent-looking failure)"""
+        with self._lock:
+            self.failures = max(self.failures, self.max_failures)
+            self.opened_at = time.monotonic()
+            self._trial = False
+
+
+class Provider:
+    """
+    A named generation function with its own timeout and breaker.
+    cache_key(meme_data), if given, describes the request for result caching.
+    """
+
+    def __init__(self, name: str, fn: Callable[[Dict[str, Any]], Any], timeout: float,
+                 breaker: Optional[CircuitBreaker] = None,
+                 cache_key: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        self.name = name
+        self.fn = fn
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.cache_key = cache_key
+        self.calls = 0
+        self.successes = 0
+        self.timeouts = 0
+        self.total_latency = 0.0
+
+
+class ProviderChain:
+    """
+    generate(meme_data) returns (provider name, result) for the first
+    provider that returns a truthy result, or (None, None) if all fail.
+    Providers run on a shared thread pool; a timed-out call is abandoned
+    (its thread finishes in the background) and counted as a failure.
+    """
+
+    def __init__(self, providers: List[Provider], hedge_after: float = GEN_HEDGE_AFTER, max_workers: int = 8):
+        self.providers = providers
+        self.hedge_after = hedge_after
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nft-gen")
+        self._stats_lock = threading.Lock()
+        self.hedges = 0
+
+    def _invoke(self, provider: Provider, meme_data: Dict[str, Any]) -> Tuple[Any, float]:
+        started = time.monotonic()
+        result = provider.fn(meme_data)
+        return result, time.monotonic() - started
+
+    def _fail(self, provider: Provider, error: Optional[BaseException] = None):
+        if isinstance(error, ProviderUnavailable):
+            provider.breaker.trip()
+        else:
+            provider.breaker.record_failure()
+
+    def generate(self, meme_data: Dict[str, Any]) -> Tuple[Optional[str], Any]:
+        queue = list(self.providers)
+        running: Dict[Any, Tuple[Provider, float]] = {}  # future -> (provider, deadline)
+        last_launch = 0.0
+
+        def launch_next() -> bool:
+            nonlocal last_launch
+            while queue:
+                provider = queue.pop(0)
+                if not provider.breaker.allow():
+                    print(f"    [CHAIN] Skipping {provider.name} (circuit open)")
+                    continue
+                with self._stats_lock:
+                    provider.calls += 1
+                future = self._pool.submit(self._invoke, provider, meme_data)
+                last_launch = time.monotonic()
+                running[future] = (provider, last_launch + provider.timeout)
+                return True
+            return False
+
+        launch_next()
+        while running:
+            now = time.monotonic()
+            wake_at = min(deadline for _, deadline in running.values())
+            if self.hedge_after > 0 and queue:
+                wake_at = min(wake_at, last_launch + self.hedge_after)
+            done, _ = wait(list(running), timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                provider, _ = running.pop(future)
+                try:
+                    result, latency = future.result()
+                except Exception as e:
+                    print(f"    [CHAIN] {provider.name} failed: {e}")
+                    self._fail(provider, e)
+                    continue
+                if result:
+                    provider.breaker.record_success()
+                    with self._stats_lock:
+                        provider.successes += 1
+                        provider.total_latency += latency
+                    return provider.name, result
+                print(f"    [CHAIN] {provider.name} returned no image")
+                self._fail(provider)
+
+            now = time.monotonic()
+            for future, (provider, deadline) in list(running.items()):
+                if now >= deadline:
+                    del running[future]
+                    with self._stats_lock:
+                        provider.timeouts += 1
+                    print(f"    [CHAIN] {provider.name} timed out after {provider.timeout:g}s")
+                    self._fail(provider)
+
+            if not running:
+                launch_next()
+            elif self.hedge_after > 0 and queue and now - last_launch >= self.hedge_after:
+                with self._stats_lock:
+                    self.hedges += 1
+                print(f"    [CHAIN] No answer after {self.hedge_after:g}s, hedging with the next provider")
+                launch_next()
+        return None, None
+
+    def summary(self) -> str:
+        parts = []
+        for p in self.providers:
+            average = f", avg {p.total_latency / p.successes:.1f}s" if p.successes else ""
+            parts.append(f"{p.name}: {p.successes}/{p.calls} ok, {p.timeouts} timeouts{average}, breaker {p.breaker.state}")
+        hedges = f"; {self.hedges} hedged" if self.hedges else ""
+        return "; ".join(parts) + hedges
+
+    def close(self):
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NFT Candidate Ranking Engine
+Scores every classification result once, in a vectorized NumPy pass, and
+selects NFT candidates by stable id (the image's file_hash) instead of
+comparing whole result dicts. Eligibility uses the same rules as
+gemini_fixed.should_generate_nft(); scoring functions are pluggable and
+selection can be capped per group (template, source, subreddit, ...).
+
+Usage:
+    python ranking_engine.py results/meme_results.jsonl [--k 3] [--group template] [--per-group 1]
+    python ranking_engine.py --bench [N]
+"""
+
+import os
+import sys
+import json
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+RANK_SCORER = os.getenv("RANK_SCORER", "quality")
+RANK_MIN_POTENTIAL = float(os.getenv("RANK_MIN_POTENTIAL", "0.8"))
+RANK_NON_CHARACTER_CONFIDENCE = 0.98  # Very high bar for memes without a famous character
+
+FAMOUS_KEYWORDS = ("tom", "jerry", "pepe", "doge", "wojak", "chad", "harold", "drake", "scooby", "spongebob", "shrek")
+GENERIC_TEMPLATES = {"unknown", "other", "custom", "image macro", "top text"}
+
+Columns = Dict[str, np.ndarray]
+Scorer = Callable[[Columns], np.ndarray]
+
+
+def _quality(columns: Columns) -> np.ndarray:
+    """NFT potential + confidence + famous-character bonus (the original meme_quality_score)"""
+    return columns["nft_potential"] * 0.5 + columns["confidence"] * 0.4 + columns["famous"] * 0.1
+
+
+def _confidence(columns: Columns) -> np.ndarray:
+    return columns["confidence"].copy()
+
+
+def _potential(columns: Columns) -> np.ndarray:
+    return columns["nft_potential"] + columns["confidence"] * 1e-3  # Confidence breaks ties
+
+
+SCORERS: Dict[str, Scorer] = {
+    "quality": _quality,
+    "confidence": _confidence,
+    "potential": _potential,
+}
+
+
+def register_scorer(name: str, scorer: Scorer):
+    """Make a scoring function selectable by name (e.g. RANK_SCORER=name)"""
+    SCORERS[name] = scorer
+
+
+def result_id(result: Dict[str, Any], index: int) -> str:
+    """Stable id of a result: image hash, else file path, else its position"""
+    return str(result.get("file_hash") or result.get("file") or f"#{index}")
+
+
+def is_famous(template: str) -> bool:
+    template = (template or "").lower()
+    return any(keyword in template for keyword in FAMOUS_KEYWORDS)
+
+
+def _float_column(results: List[Dict[str, Any]], field: str) -> np.ndarray:
+    return np.fromiter((float(r.get(field) or 0.0) for r in results), dtype=np.float64, count=len(results))
+
+
+def _codes(values: List[str]):
+    """(unique values, integer code per row) - per-template work is then done once per template"""
+    uniques, codes = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    return uniques, codes.reshape(-1)
+
+
+class Ranking:
+    """
+    Scores and eligibility for one set of results, addressed by stable id.
+    rank_of()/is_selected() are O(1) lookups once top_k() has been called.
+    """
+
+    def __init__(self, results: List[Dict[str, Any]], ids: List[str], scores: np.ndarray, eligible: np.ndarray):
+        self.results = results
+        self.ids = ids
+        self.scores = scores
+        self.eligible = eligible
+        self._position = {item_id: i for i, item_id in enumerate(ids)}
+        self._selected: Dict[str, int] = {}
+
+    def _group_codes(self, group_by: str) -> np.ndarray:
+        return _codes([str(r.get(group_by) or "Unknown") for r in self.results])[1]
+
+    def top_k(self, k: int, group_by: Optional[str] = None, max_per_group: int = 0) -> List[Dict[str, Any]]:
+        """
+        Best k eligible results, best first; equal scores keep input order.
+        With group_by/max_per_group, at most max_per_group per distinct value.
+        """
+        candidates = np.flatnonzero(self.eligible)
+        # lexsort: last key is primary -> score descending, then input position ascending
+        order = candidates[np.lexsort((candidates, -self.scores[candidates]))]
+
+        if group_by and max_per_group > 0 and len(order):
+            groups = self._group_codes(group_by)[order]
+            by_group = np.argsort(groups, kind="stable")  # Keeps score order inside each group
+            sorted_groups = groups[by_group]
+            starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+            lengths = np.diff(np.r_[starts, len(order)])
+            within = np.empty(len(order), dtype=np.int64)
+            within[by_group] = np.arange(len(order)) - np.repeat(starts, lengths)
+            order = order[within < max_per_group]
+
+        top = order[:k]
+        self._selected = {self.ids[i]: rank for rank, i in enumerate(top, 1)}
+        return [self.results[i] for i in top]
+
+    def selected_ids(self) -> List[str]:
+        """Ids from the last top_k() selection, best first"""
+        return sorted(self._selected, key=self._selected.get)
+
+    def result(self, item_id: str) -> Dict[str, Any]:
+        return self.results[self._position[item_id]]
+
+    def eligible_results(self) -> List[Dict[str, Any]]:
+        return [self.results[i] for i in np.flatnonzero(self.eligible)]
+
+    def is_eligible(self, item_id: str) -> bool:
+        return bool(self.eligible[self._position[item_id]])
+
+    def is_selected(self, item_id: str) -> bool:
+        return item_id in self._selected
+
+    def rank_of(self, item_id: str) -> Optional[int]:
+        """1-based position in the last top_k() selection, or None"""
+        return self._selected.get(item_id)
+
+    def score_of(self, item_id: str) -> float:
+        return float(self.scores[self._position[item_id]])
+
+    @property
+    def eligible_count(self) -> int:
+        return int(self.eligible.sum())
+
+
+class RankingEngine:
+    """
+    Vectorized eligibility + scoring. rank(results) builds the columns once:
+
+    - confidence, nft_potential: float arrays
+    - famous: 1.0 where the template contains a famous-character keyword
+      (evaluated once per distinct template, not once per result)
+    - eligible: the should_generate_nft() rules as one boolean mask
+    """
+
+    def __init__(self, scorer: Any = RANK_SCORER, min_confidence: float = 0.95,
+                 min_potential: float = RANK_MIN_POTENTIAL, meme_types: Iterable[str] = ("reaction", "template", "character")):
+        self.scorer: Scorer = SCORERS[scorer] if isinstance(scorer, str) else scorer
+        self.min_confidence = min_confidence
+        self.min_potential = min_potential
+        self.meme_types = set(meme_types)
+
+    def columns(self, results: List[Dict[str, Any]]) -> Columns:
+        templates, template_codes = _codes([r.get("template") or "Unknown" for r in results])
+        famous = np.array([is_famous(t) for t in templates], dtype=np.float64)
+        generic = np.array([t.lower() in GENERIC_TEMPLATES for t in templates], dtype=bool)
+        types, type_codes = _codes([r.get("meme_type") or "unknown" for r in results])
+        type_ok = np.array([t in self.meme_types for t in types], dtype=bool)
+        empty = np.zeros(0)
+        return {
+            "confidence": _float_column(results, "confidence"),
+            "nft_potential": _float_column(results, "nft_potential"),
+            "famous": famous[template_codes] if len(results) else empty,
+            "generic": generic[template_codes] if len(results) else empty.astype(bool),
+            "type_ok": type_ok[type_codes] if len(results) else empty.astype(bool),
+        }
+
+    def eligibility(self, columns: Columns) -> np.ndarray:
+        confidence = columns["confidence"]
+        return ((confidence >= self.min_confidence)
+                & (columns["nft_potential"] >= self.min_potential)
+                & columns["type_ok"]
+                & ~columns["generic"]
+                & ((columns["famous"] > 0) | (confidence >= RANK_NON_CHARACTER_CONFIDENCE)))
+
+    def rank(self, results: List[Dict[str, Any]]) -> Ranking:
+        columns = self.columns(results)
+        scores = np.asarray(self.scorer(columns), dtype=np.float64)
+        ids, seen = [], set()
+        for i, r in enumerate(results):
+            item_id = result_id(r, i)
+            if item_id in seen:  # The same image twice: each result still needs its own id
+                item_id = f"{item_id}#{i}"
+            seen.add(item_id)
+            ids.append(item_id)
+        return Ranking(results, ids, scores, self.eligibility(columns))
+
+
+def _synthetic_results(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    templates = ["Doge", "Pepe the Frog", "Drake Hotline Bling", "Distracted Boyfriend", "Unknown",
+                 "Wojak", "Expanding Brain", "Two Buttons", "Other", "Scooby Doo Mask Reveal"]
+    types = ["character", "template", "reaction", "other"]
+    confidence = np.round(0.9 + rng.random(n) * 0.1, 3)
+    potential = np.round(0.6 + rng.random(n) * 0.4, 3)
+    return [
+        {"file_hash": f"{i:064x}", "template": templates[i % len(templates)], "meme_type": types[i % len(types)],
+         "confidence": float(confidence[i]), "nft_potential": float(potential[i]), "source": f"r/sub{i % 25}"}
+        for i in range(n)
+    ]
+
+
+def _bench(n: int = 100_000, k: int = 3):
+    results = _synthetic_results(n)
+    engine = RankingEngine()
+
+    started = time.perf_counter()
+    ranking = engine.rank(results)
+    top = ranking.top_k(k)
+    flags = [ranking.is_selected(item_id) or ranking.is_eligible(item_id) for item_id in ranking.ids]
+    vectorized = time.perf_counter() - started
+
+    started = time.perf_counter()
+    grouped = ranking.top_k(k * 10, group_by="source", max_per_group=1)
+    grouped_time = time.perf_counter() - started
+
+    print(f"[BENCH] {n:,} results: rank + top-{k} + per-result flags in {vectorized*1000:.0f} ms "
+          f"({ranking.eligible_count:,} eligible, {sum(flags):,} flagged)")
+    print(f"[BENCH] top-{k*10} with max 1 per source: {grouped_time*1000:.0f} ms ({len(grouped)} selected)")
+
+    # The old approach: per-result list membership against the eligible/top lists (sampled, it is O(N x K))
+    eligible = ranking.eligible_results()
+    sample = results[:200]
+    started = time.perf_counter()
+    for result in sample:
+        _ = result in top or result in eligible
+    per_result = (time.perf_counter() - started) / len(sample)
+    print(f"[BENCH] list-membership selection (old): ~{per_result * n:.1f} s estimated for {n:,} results")
+
+
+def _load_jsonl(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+    if args[0] == "--bench":
+        _bench(int(args[1]) if len(args) > 1 else 100_000)
+        sys.exit(0)
+
+    def option(name: str, default: str) -> str:
+        return args[args.index(name) + 1] if name in args else default
+
+    ranked = RankingEngine().rank(_load_jsonl(args[0]))
+    picks = ranked.top_k(int(option("--k", "3")), option("--group", "") or None, int(option("--per-group", "0")))
+    print(f"[RANK] {ranked.eligible_count} eligible of {len(ranked.ids)} results")
+    for i, item_id in enumerate(ranked.selected_ids(), 1):
+        meme = ranked.result(item_id)
+        print(f"  {i}. {meme.get('template')} (score: {ranked.score_of(item_id):.3f}, confidence: {meme.get('confidence', 0):.2f})")
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Append-Only Results Store
+Every pipeline run is kept as its own immutable JSONL partition, and a
+SQLite index (file hash, template, nft_rank, run) records where each line
+starts, so queries read only the matching lines instead of re-parsing all
+history. results/meme_results.jsonl stays as a snapshot of the latest run
+for existing readers.
+
+Layout:
+    results/store/
+        index.sqlite
+        date=2026-10-17/run=20261017T120501Z_3fa9c2.jsonl
+
+Usage:
+    python results_store.py runs [N]
+    python results_store.py latest [N]          # latest generated NFTs
+    python results_store.py template "Doge" [N]
+    python results_store.py hash <file_hash>
+    python results_store.py rebuild             # re-index partitions from disk
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import uuid
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+RESULTS_STORE_DIR = os.getenv("RESULTS_STORE_DIR", os.path.join("results", "store"))
+USE_RESULTS_STORE = os.getenv("RESULTS_STORE", "1") != "0"
+
+
+def _new_run_id(started_at: float) -> str:
+    stamp = datetime.fromtimestamp(started_at, tz=timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return f"{stamp}_{uuid.uuid4().hex[:6]}"
+
+
+def write_snapshot(path: str, results: Iterable[Dict[str, Any]]):
+    """Replace a JSONL file atomically (readers never see a half-written snapshot)"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.part"
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        for result in results:
+            json.dump(result, out, ensure_ascii=False)
+            out.write("\n")
+    os.replace(tmp_path, path)
+
+
+class ResultsStore:
+    """
+    append_run() writes one partition and indexes it; partitions are never
+    rewritten. Query methods return result dicts (with their "run_id"),
+    newest run first.
+    """
+
+    def __init__(self, root: str = RESULTS_STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id     TEXT PRIMARY KEY,
+                date       TEXT NOT NULL,
+                path       TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                records    INTEGER NOT NULL,
+                generated  INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS records (
+                run_id        TEXT NOT NULL,
+                line          INTEGER NOT NULL,
+                offset        INTEGER NOT NULL,
+                length        INTEGER NOT NULL,
+                file_hash     TEXT,
+                template      TEXT,
+                confidence    REAL,
+                nft_eligible  INTEGER,
+                nft_generated INTEGER,
+                nft_rank      INTEGER,
+                PRIMARY KEY (run_id, line)
+            );
+            CREATE INDEX IF NOT EXISTS idx_records_file_hash ON records (file_hash);
+            CREATE INDEX IF NOT EXISTS idx_records_template ON records (template);
+            CREATE INDEX IF NOT EXISTS idx_records_nft_rank ON records (nft_rank) WHERE nft_rank IS NOT NULL;
+            CREATE INDEX IF NOT EXISTS idx_runs_started_at ON runs (started_at);
+            """
+        )
+        self._conn.commit()
+
+    # ----------------------------------------------------------- writing
+    def append_run(self, results: List[Dict[str, Any]], started_at: Optional[float] = None,
+                   run_id: Optional[str] = None) -> str:
+        """Store one run's results as a new partition; returns its run id"""
+        started_at = started_at if started_at is not None else time.time()
+        run_id = run_id or _new_run_id(started_at)
+        date = datetime.fromtimestamp(started_at, tz=timezone.utc).strftime("%Y-%m-%d")
+        relative = os.path.join(f"date={date}", f"run={run_id}.jsonl")
+        path = os.path.join(self.root, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        rows, offset = [], 0
+        tmp_path = f"{path}.{os.getpid()}.part"
+        with open(tmp_path, "wb") as out:
+            for line, result in enumerate(results):
+                data = json.dumps({**result, "run_id": run_id}, ensure_ascii=False).encode("utf-8") + b"\n"
+                out.write(data)
+                rows.append(self._row(run_id, line, offset, len(data), result))
+                offset += len(data)
+        os.replace(tmp_path, path)
+
+        generated = sum(1 for row in rows if row[8])
+        with self._lock:
+            with self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+                                   (run_id, date, relative, started_at, len(rows), generated))
+                self._conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return run_id
+
+    @staticmethod
+    def _row(run_id: str, line: int, offset: int, length: int, result: Dict[str, Any]) -> tuple:
+        return (run_id, line, offset, length, result.get("file_hash"), result.get("template"),
+                result.get("confidence"), int(bool(result.get("nft_eligible"))),
+                int(bool(result.get("nft_generated"))), result.get("nft_rank"))
+
+    def rebuild_index(self) -> int:
+        """Re-index every partition on disk (e.g. after deleting index.sqlite). Returns runs indexed."""
+        partitions = sorted(glob.glob(os.path.join(self.root, "date=*", "run=*.jsonl")))
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM records")
+                self._conn.execute("DELETE FROM runs")
+                for path in partitions:
+                    run_id = os.path.basename(path)[len("run="):-len(".jsonl")]
+                    date = os.path.basename(os.path.dirname(path))[len("date="):]
+                    rows, offset = [], 0
+                    with open(path, "rb") as f:
+                        for line, data in enumerate(f):
+                            rows.append(self._row(run_id, line, offset, len(data), json.loads(data)))
+                            offset += len(data)
+                    try:
+                        started_at = datetime.strptime(run_id.split("_")[0], "%Y%m%dT%H%M%SZ").replace(
+                            tzinfo=timezone.utc).timestamp()
+                    except ValueError:
+                        started_at = os.path.getmtime(path)
+                    self._conn.execute("INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+                                       (run_id, date, os.path.relpath(path, self.root), started_at, len(rows),
+                                        sum(1 for row in rows if row[8])))
+                    self._conn.executemany("INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(partitions)
+
+    # ----------------------------------------------------------- reading
+    def _load(self, where: str, params: tuple = (), limit: Optional[int] = None,
+              order: str = "u.started_at DESC, r.line ASC") -> List[Dict[str, Any]]:
+        """Fetch matching records by seeking to their indexed offsets"""
+        sql = (f"SELECT u.path, r.offset, r.length FROM records r JOIN runs u ON u.run_id = r.run_id "
+               f"WHERE {where} ORDER BY {order}")
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = params + (int(limit),)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        by_path: Dict[str, List[int]] = defaultdict(list)
+        for i, (path, _, _) in enumerate(rows):
+            by_path[path].append(i)
+        records: List[Optional[Dict[str, Any]]] = [None] * len(rows)
+        for path, positions in by_path.items():
+            with open(os.path.join(self.root, path), "rb") as f:  # One open per partition, in file order
+                for i in sorted(positions, key=lambda i: rows[i][1]):
+                    f.seek(rows[i][1])
+                    records[i] = json.loads(f.read(rows[i][2]))
+        return records
+
+    def latest_generated(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Most recently generated NFTs, newest run first, then by nft_rank"""
+        return self._load("r.nft_rank IS NOT NULL AND r.nft_generated = 1", limit=limit,
+                          order="u.started_at DESC, r.nft_rank ASC")
+
+    def by_template(self, template: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._load("r.template = ?", (template,), limit)
+
+    def by_file_hash(self, file_hash: str) -> List[Dict[str, Any]]:
+        """Every result ever recorded for one image"""
+        return self._load("r.file_hash = ?", (file_hash,))
+
+    def run_results(self, run_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """All results of one run (default: the latest run)"""
+        run_id = run_id or self.latest_run_id()
+        if run_id is None:
+            return []
+        return self._load("r.run_id = ?", (run_id,), order="r.line ASC")
+
+    def latest_run_id(self) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT run_id FROM runs ORDER BY started_at DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def runs(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        sql = "SELECT run_id, date, path, started_at, records, generated FROM runs ORDER BY started_at DESC"
+        params: tuple = ()
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = (int(limit),)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(zip(("run_id", "date", "path", "started_at", "records", "generated"), row)) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_shared_store: Optional[ResultsStore] = None
+_shared_lock = threading.Lock()
+
+
+def get_results_store() -> Optional[ResultsStore]:
+    """Process-wide store, or None when disabled (RESULTS_STORE=0)"""
+    global _shared_store
+    if not USE_RESULTS_STORE:
+        return None
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = ResultsStore()
+        return _shared_store
+
+
+def record_run(results: List[Dict[str, Any]], snapshot_path: str, started_at: Optional[float] = None) -> Optional[str]:
+    """Write the latest-run snapshot and append the run to the store; returns the run id (None if disabled)"""
+    write_snapshot(snapshot_path, results)
+    store = get_results_store()
+    return store.append_run(results, started_at) if store is not None else None
+
+
+def _print_results(results: List[Dict[str, Any]]):
+    for r in results:
+        rank = f"#{r['nft_rank']} " if r.get("nft_rank") else ""
+        print(f"  {r.get('run_id')}  {rank}{r.get('template')} (confidence: {r.get('confidence', 0) or 0:.2f})"
+              f"{'  -> ' + r['nft_image_path'] if r.get('nft_image_path') else ''}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+    store = ResultsStore()
+    command = args[0]
+    if command == "runs":
+        for run in store.runs(int(args[1]) if len(args) > 1 else None):
+            print(f"  {run['run_id']}  {run['records']} results, {run['generated']} NFTs  ({run['path']})")
+    elif command == "latest":
+        _print_results(store.latest_generated(int(args[1]) if len(args) > 1 else 10))
+    elif command == "template" and len(args) > 1:
+        _print_results(store.by_template(args[1], int(args[2]) if len(args) > 2 else None))
+    elif command == "hash" and len(args) > 1:
+        _print_results(store.by_file_hash(args[1]))
+    elif command == "rebuild":
+        print(f"[STORE] Re-indexed {store.rebuild_index()} runs")
+    else:
+        print(__doc__)
+        sys.exit(1)
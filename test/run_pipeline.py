@@ -8,7 +8,14 @@ This script combines:
 2. gemini_fixed.py - Analyzes memes and generates NFT images for familiar templates
 
 Usage:
-    python run_pipeline.py
+    python run_pipeline.py               # in-process streaming pipeline (default)
+    python run_pipeline.py --subprocess  # legacy: run each script as a child process
+    python run_pipeline.py --resume      # continue an interrupted run from its checkpoints
+
+Both modes pick NFTs the same way: once every meme is analyzed, gemini_fixed's
+RankingEngine selection (quality score, RANK_GROUP_BY cap) chooses the top
+MAX_NFT_IMAGES. The in-process mode only differs in overlapping downloads
+with classification instead of running them as separate passes.
 
 Requirements:
     - Reddit API credentials configured in polling.py
@@ -21,7 +28,12 @@ import sys
 import subprocess
 import time
 
-def run_script(script_name, description):
+from checkpoint import RunJournal, resume_requested
+
+# "inprocess" streams memes through all stages in one interpreter; "subprocess" runs the scripts one after another
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "inprocess")
+
+def run_script(script_name, description, args=()):
     """Run a Python script and handle errors"""
     print(f"\n{'='*60}")
     print(f"[STEP] {description}")
@@ -32,7 +44,7 @@ def run_script(script_name, description):
         python_exe = sys.executable
         
         # Run the script
-        result = subprocess.run([python_exe, script_name], 
+        result = subprocess.run([python_exe, script_name, *args], 
                               capture_output=True, 
                               text=True, 
                               cwd=os.getcwd())
@@ -83,6 +95,32 @@ def check_prerequisites():
     
     return True
 
+def run_subprocess_pipeline(resume=False):
+    """Legacy mode: run polling.py, then gemini_fixed.py, as separate processes"""
+    journal = RunJournal("pipeline").start(resume=resume)
+
+    # Step 1: Download viral memes (skipped on resume if the last run already finished it)
+    if journal.done("_polling", "downloaded"):
+        print("\n[CHECKPOINT] Skipping Step 1: memes were already downloaded by the interrupted run")
+    else:
+        if not run_script("polling.py", "STEP 1: Downloading Viral Memes from Reddit"):
+            print("\nPipeline failed at Step 1 (meme downloading)")
+            journal.close()
+            return False
+        journal.record("_polling", "downloaded")
+
+        # Small delay between steps
+        time.sleep(2)
+
+    # Step 2: Generate NFT images (gemini_fixed.py keeps its own per-meme checkpoints)
+    if not run_script("gemini_fixed.py", "STEP 2: Analyzing Memes & Generating NFT Images",
+                      ["--resume"] if resume else []):
+        print("\nPipeline failed at Step 2 (NFT generation)")
+        journal.close()
+        return False
+    journal.finish()
+    return True
+
 def main():
     """Main pipeline execution"""
     print("VIRAL MEME -> NFT PIPELINE")
@@ -93,20 +131,21 @@ def main():
         return False
     
     print("\nAll prerequisites met! Starting pipeline...")
-    
-    # Step 1: Download viral memes
-    if not run_script("polling.py", "STEP 1: Downloading Viral Memes from Reddit"):
-        print("\nPipeline failed at Step 1 (meme downloading)")
-        return False
-    
-    # Small delay between steps
-    time.sleep(2)
-    
-    # Step 2: Generate NFT images
-    if not run_script("gemini_fixed.py", "STEP 2: Analyzing Memes & Generating NFT Images"):
-        print("\nPipeline failed at Step 2 (NFT generation)")
-        return False
-    
+
+    resume = resume_requested(sys.argv[1:])
+    if PIPELINE_MODE == "subprocess" or "--subprocess" in sys.argv:
+        if not run_subprocess_pipeline(resume):
+            return False
+    else:
+        from streaming_pipeline import StreamingPipeline
+        try:
+            if not StreamingPipeline(resume=resume).run():
+                print("\nPipeline failed")
+                return False
+        except Exception as e:
+            print(f"\nPipeline failed: {e}")
+            return False
+
     # Success summary
     print(f"\n{'='*60}")
     print("PIPELINE COMPLETED SUCCESSFULLY!")
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent Seen-Post Index
+SQLite record of every Reddit post a poll has looked at: last score, last
+seen time, computed virality and download/classification status. Lets
+polling.py skip posts that have not changed since the previous poll.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, Any, Iterable, List, Optional
+
+SEEN_INDEX_PATH = os.getenv("SEEN_INDEX_PATH", os.path.join("meme_store", "seen_posts.sqlite"))
+SEEN_INDEX_MAX_AGE_DAYS = float(os.getenv("SEEN_INDEX_MAX_AGE_DAYS", "7"))
+
+
+class SeenPostIndex:
+    """Thread-safe SQLite index of seen posts, keyed by Reddit post id"""
+
+    def __init__(self, path: str = SEEN_INDEX_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS posts (
+                post_id     TEXT PRIMARY KEY,
+                subreddit   TEXT,
+                title       TEXT,
+                url         TEXT,
+                last_score  INTEGER,
+                total_score INTEGER,
+                keywords    TEXT,
+                first_seen  REAL,
+                last_seen   REAL,
+                downloaded  INTEGER DEFAULT 0,
+                classified  INTEGER DEFAULT 0,
+                sha256      TEXT,
+                hot_position INTEGER,
+                top_position INTEGER
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_last_seen ON posts (last_seen)")
+        self._conn.commit()
+
+    def get_many(self, post_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Look up known posts. Unknown ids are simply absent from the result."""
+        ids = list(post_ids)
+        found: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT post_id, subreddit, last_score, total_score, keywords, last_seen, downloaded, classified, sha256, title "
+                    f"FROM posts WHERE post_id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for row in rows:
+                    found[row[0]] = {
+                        "post_id": row[0],
+                        "subreddit": row[1],
+                        "last_score": row[2],
+                        "total_score": row[3],
+                        "keywords": json.loads(row[4]) if row[4] else [],
+                        "last_seen": row[5],
+                        "downloaded": bool(row[6]),
+                        "classified": bool(row[7]),
+                        "sha256": row[8],
+                        "title": row[9],
+                    }
+        return found
+
+    def record_seen(self, posts: List[Dict[str, Any]]):
+        """
+        Upsert posts from a listing. Each dict needs post_id, subreddit, title,
+        url and score; total_score/keywords are None for posts that were not
+        viral candidates, hot_position/top_position are None for posts not in
+        that listing. Download/classification status is preserved.
+        """
+        now = time.time()
+        rows = [
+            (p["post_id"], p["subreddit"], p["title"], p["url"], p["score"], p.get("total_score"),
+             json.dumps(p["keywords"]) if p.get("keywords") is not None else None, now, now,
+             p.get("hot_position"), p.get("top_position"))
+            for p in posts
+        ]
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT INTO posts (post_id, subreddit, title, url, last_score, total_score, keywords, first_seen, last_seen,
+                                   hot_position, top_position)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(post_id) DO UPDATE SET
+                    last_score=excluded.last_score,
+                    total_score=excluded.total_score,
+                    keywords=excluded.keywords,
+                    last_seen=excluded.last_seen,
+                    hot_position=excluded.hot_position,
+                    top_position=excluded.top_position
+                """,
+                rows,
+            )
+            self._conn.commit()
+
+    def touch(self, posts: List[Dict[str, Any]]):
+        """
+        Mark known posts as seen again without rescoring them: only last_seen
+        and the listing positions change, so a slowly drifting score is still
+        measured against the score it was last scored at.
+        """
+        now = time.time()
+        rows = [(now, p.get("hot_position"), p.get("top_position"), p["post_id"]) for p in posts]
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE posts SET last_seen=?, hot_position=?, top_position=? WHERE post_id=?", rows
+            )
+            self._conn.commit()
+
+    def recent_candidates(self, subreddit: str, since: float) -> List[Dict[str, Any]]:
+        """Viral candidates of a subreddit last seen at or after `since` (epoch seconds)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT post_id, title, url, last_score, total_score, keywords, hot_position, top_position FROM posts "
+                "WHERE subreddit=? AND last_seen>=? AND total_score IS NOT NULL",
+                (subreddit, since),
+            ).fetchall()
+        return [
+            {
+                "post_id": row[0],
+                "title": row[1],
+                "url": row[2],
+                "last_score": row[3],
+                "total_score": row[4],
+                "keywords": json.loads(row[5]) if row[5] else [],
+                "hot_position": row[6],
+                "top_position": row[7],
+            }
+            for row in rows
+        ]
+
+    def mark_downloaded(self, post_id: str, sha256: Optional[str]):
+        with self._lock:
+            self._conn.execute("UPDATE posts SET downloaded=1, sha256=? WHERE post_id=?", (sha256, post_id))
+            self._conn.commit()
+
+    def mark_classified(self, post_id: str):
+        with self._lock:
+            self._conn.execute("UPDATE posts SET classified=1 WHERE post_id=?", (post_id,))
+            self._conn.commit()
+
+    def prune(self, max_age_days: float = SEEN_INDEX_MAX_AGE_DAYS) -> int:
+        """Forget posts not seen for max_age_days. Returns the number removed."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM posts WHERE last_seen < ?", (time.time() - max_age_days * 86400,))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
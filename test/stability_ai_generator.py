@@ -6,14 +6,14 @@ Uses the Stability AI REST API to generate high-quality NFT images
 """
 
 import os
-import requests
-import json
-import base64
+import hashlib
+import threading
 from typing import Dict, Any
 
+from stability_client import StabilityError, get_stability_client
+
 # Stability AI API Configuration
 STABILITY_API_KEY = os.getenv("STABILITY_API_KEY", "")
-STABILITY_API_HOST = "https://api.stability.ai"
 STABILITY_ENGINE = "stable-diffusion-v1-6"  # or "stable-diffusion-xl-1024-v1-0"
 
 def generate_nft_image_with_stability(meme_data: Dict[str, Any], output_dir: str) -> str:
@@ -49,73 +49,45 @@ Original context: {description}
 Create a unique, valuable, and visually stunning NFT that captures the essence of this viral meme while being suitable for premium NFT marketplaces.
 """.strip()
     
-    # Stability AI API request
+    # Stability AI API request (shared pooled client, PNG streamed straight to disk)
+    safe_filename = "".join(c for c in template if c.isalnum() or c in (' ', '-', '_')).strip()
+    safe_filename = safe_filename.replace(' ', '_')
+    tmp_path = os.path.join(output_dir, f".{safe_filename}_{os.getpid()}_{threading.get_ident()}.download")
     try:
         print(f"    [STABILITY] Generating NFT image with Stability AI...")
         print(f"    [PROMPT] {template} (confidence: {confidence:.2f})")
         
-        response = requests.post(
-            f"{STABILITY_API_HOST}/v1/generation/{STABILITY_ENGINE}/text-to-image",
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-                "Authorization": f"Bearer {STABILITY_API_KEY}"
-            },
-            json={
-                "text_prompts": [
-                    {
-                        "text": nft_prompt,
-                        "weight": 1
-                    }
-                ],
-                "cfg_scale": 7,
-                "height": 512,
-                "width": 512,
-                "samples": 1,
-                "steps": 30,
-                "style_preset": "digital-art"  # NFT-appropriate style
-            },
+        get_stability_client().text_to_image_file(
+            STABILITY_ENGINE, nft_prompt, tmp_path,
+            weight=1,
+            cfg_scale=7,
+            height=512,
+            width=512,
+            steps=30,
+            style_preset="digital-art",  # NFT-appropriate style
         )
         
-        if response.status_code != 200:
-            error_msg = f"HTTP {response.status_code}"
-            try:
-                error_data = response.json()
-                error_msg = error_data.get("message", error_msg)
-            except:
-                pass
-            print(f"    [ERROR] Stability AI API error: {error_msg}")
-            return ""
-        
-        # Parse response and save image
-        data = response.json()
-        
-        if not data.get("artifacts"):
-            print(f"    [ERROR] No images returned from Stability AI")
-            return ""
-        
-        # Get the first generated image
-        image_data = data["artifacts"][0]
-        image_base64 = image_data["base64"]
-        
-        # Create safe filename
-        safe_filename = "".join(c for c in template if c.isalnum() or c in (' ', '-', '_')).strip()
-        safe_filename = safe_filename.replace(' ', '_')
-        output_path = os.path.join(output_dir, f"{safe_filename}_NFT.png")
-        
-        # Decode and save image
-        with open(output_path, "wb") as f:
-            f.write(base64.b64decode(image_base64))
+        # Content hash in the name: two memes of the same template no longer overwrite each other
+        digest = hashlib.sha256()
+        with open(tmp_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        output_name = f"{safe_filename}_{digest.hexdigest()[:10]}_NFT.png"
+        output_path = os.path.join(output_dir, output_name)
+        os.replace(tmp_path, output_path)
         
-        print(f"    [SUCCESS] Generated NFT image: {safe_filename}_NFT.png")
+        print(f"    [SUCCESS] Generated NFT image: {output_name}")
         return output_path
         
-    except requests.exceptions.RequestException as e:
-        print(f"    [ERROR] Network error with Stability AI: {e}")
+    except StabilityError as e:
+        print(f"    [ERROR] Stability AI API error: {e}")
         return ""
     except Exception as e:
         print(f"    [ERROR] Error generating NFT with Stability AI: {e}")
         return ""
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 def test_stability_ai():
     """Test function to verify Stability AI API connection"""
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stability AI REST Client
+One reusable client for every Stability AI call in the project: a pooled
+keep-alive session, bounded retries with jittered backoff on 429/5xx
+(honouring Retry-After), request/latency accounting, and the binary
+"Accept: image/png" response path so images are streamed instead of
+decoded from multi-megabyte base64 JSON bodies.
+"""
+
+import os
+import time
+import random
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+STABILITY_API_HOST = os.getenv("STABILITY_API_HOST", "https://api.stability.ai")
+STABILITY_RETRIES = int(os.getenv("STABILITY_RETRIES", "3"))
+STABILITY_POOL_SIZE = int(os.getenv("STABILITY_POOL_SIZE", "8"))
+STABILITY_MAX_BACKOFF = float(os.getenv("STABILITY_MAX_BACKOFF", "30"))  # Cap on any single wait (s)
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = float(os.getenv("STABILITY_READ_TIMEOUT", "90"))
+CHUNK_SIZE = 64 * 1024
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class StabilityError(Exception):
+    """A non-retryable or finally-failed Stability AI request"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def auth_problem(self) -> bool:
+        """Missing/invalid key or no credits: retrying later in the run will not help"""
+        return self.status in (401, 402, 403)
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None  # HTTP-date form: fall back to exponential backoff
+
+
+def _error_message(response: requests.Response) -> str:
+    try:
+        data = response.json()
+        return data.get("message") or data.get("name") or response.text[:300]
+    except ValueError:
+        return response.text[:300]
+
+
+class StabilityClient:
+    """
+    Thread-safe Stability AI client.
+
+    text_to_image() returns PNG bytes; text_to_image_file() streams the PNG
+    straight to disk. Both raise StabilityError on failure.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, host: str = STABILITY_API_HOST,
+                 retries: int = STABILITY_RETRIES, pool_size: int = STABILITY_POOL_SIZE,
+                 timeout: Tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT)):
+        self.api_key = api_key if api_key is not None else os.getenv("STABILITY_API_KEY", "")
+        self.host = host.rstrip("/")
+        self.retries = retries
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+        self.bytes_received = 0
+        self.total_latency = 0.0
+
+    # ------------------------------------------------------------ requests
+    def _post(self, path: str, payload: Dict[str, Any], accept: str) -> requests.Response:
+        """POST with bounded, jittered retries; returns a streaming 200 response"""
+        if not self.api_key:
+            raise StabilityError("STABILITY_API_KEY not set in environment")
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "Accept": accept,
+        }
+        attempt = 0
+        while True:
+            with self._stats_lock:
+                self.requests += 1
+            try:
+                response = self.session.post(f"{self.host}{path}", json=payload, headers=headers,
+                                             timeout=self.timeout, stream=True)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                wait, error = None, StabilityError(f"Network error: {e}")
+            else:
+                if response.status_code == 200:
+                    return response
+                error = StabilityError(f"HTTP {response.status_code}: {_error_message(response)}", response.status_code)
+                wait = _retry_after(response)
+                response.close()
+                if response.status_code not in RETRY_STATUSES:
+                    with self._stats_lock:
+                        self.failures += 1
+                    raise error
+
+            if attempt >= self.retries:
+                with self._stats_lock:
+                    self.failures += 1
+                raise error
+            attempt += 1
+            with self._stats_lock:
+                self.retried += 1
+            if wait is None:
+                wait = 2 ** (attempt - 1) * (1 + random.random())  # Full jitter on top of the doubling
+            time.sleep(min(wait, STABILITY_MAX_BACKOFF))
+
+    @staticmethod
+    def text_to_image_payload(prompt: str, width: int, height: int, steps: int, cfg_scale: float,
+                              seed: int = 0, style_preset: Optional[str] = None, weight: Optional[float] = None,
+                              samples: int = 1) -> Dict[str, Any]:
+        text_prompt = {"text": prompt}
+        if weight is not None:
+            text_prompt["weight"] = weight
+        payload = {
+            "text_prompts": [text_prompt],
+            "cfg_scale": cfg_scale,
+            "height": height,
+            "width": width,
+            "samples": samples,
+            "steps": steps,
+            "seed": seed,
+        }
+        if style_preset:
+            payload["style_preset"] = style_preset
+        return payload
+
+    def _stream(self, engine: str, payload: Dict[str, Any], sink) -> int:
+        started = time.monotonic()
+        response = self._post(f"/v1/generation/{engine}/text-to-image", payload, accept="image/png")
+        received = 0
+        try:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                sink(chunk)
+                received += len(chunk)
+        finally:
+            response.close()
+        with self._stats_lock:
+            self.bytes_received += received
+            self.total_latency += time.monotonic() - started
+        if not received:
+            raise StabilityError("Empty image returned from Stability AI")
+        return received
+
+    def text_to_image(self, engine: str, prompt: str, width: int = 1024, height: int = 1024, steps: int = 30,
+                      cfg_scale: float = 7, seed: int = 0, style_preset: Optional[str] = None,
+                      weight: Optional[float] = None) -> bytes:
+        """Generate one image; returns its PNG bytes"""
+        payload = self.text_to_image_payload(prompt, width, height, steps, cfg_scale, seed, style_preset, weight)
+        chunks = []
+        self._stream(engine, payload, chunks.append)
+        return b"".join(chunks)
+
+    def text_to_image_file(self, engine: str, prompt: str, dest: str, **params) -> str:
+        """Generate one image and stream it to dest (atomically); returns dest"""
+        payload = self.text_to_image_payload(prompt, **{"width": 1024, "height": 1024, "steps": 30,
+                                                        "cfg_scale": 7, **params})
+        tmp_path = f"{dest}.{threading.get_ident()}.part"
+        try:
+            with open(tmp_path, "wb") as f:
+                self._stream(engine, payload, f.write)
+            os.replace(tmp_path, dest)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return dest
+
+    # --------------------------------------------------------------- stats
+    def summary(self) -> str:
+        succeeded = self.requests - self.retried - self.failures
+        average = f", avg {self.total_latency / succeeded:.1f}s" if succeeded > 0 else ""
+        return (f"Stability AI: {self.requests} requests ({self.retried} retried, {self.failures} failed)"
+                f"{average}, {self.bytes_received / 1048576:.1f} MB received")
+
+    def close(self):
+        self.session.close()
+
+
+_shared_client: Optional[StabilityClient] = None
+_shared_lock = threading.Lock()
+
+
+def get_stability_client() -> StabilityClient:
+    """Process-wide client, so every caller shares one connection pool"""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = StabilityClient()
+        return _shared_client
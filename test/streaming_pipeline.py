@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+In-Process Streaming Meme -> NFT Pipeline
+
+Runs the polling.py and gemini_fixed.py stages in one interpreter, connected
+by bounded queues:
+
+    fetch listings -> download -> classify -> select -> generate
+
+Each meme moves to the next stage as soon as it is ready: downloads and
+classifications overlap instead of running as separate batch passes. NFT
+selection waits for classification to drain and uses the same RankingEngine
+selection as gemini_fixed.py, so both paths mint the same memes. Progress
+lines are printed (and flushed) as events happen.
+
+Every finished stage is journalled per post; `python streaming_pipeline.py
+--resume` continues an interrupted run with the same ranked memes, without
+re-polling Reddit or repeating finished downloads, classifications and
+generations.
+"""
+
+import os
+import sys
+import time
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional
+
+import polling
+import gemini_fixed
+from meme_store import MemeStore
+from meme_downloader import MemeDownloader
+from classification_cache import ClassificationCache
+from classification_engine import ClassificationEngine
+from cascade_router import CascadeRouter, USE_CASCADE
+from image_preprocess import PREPROCESS_WORKERS, needs_preprocess, preprocess_image
+from seen_index import SeenPostIndex
+from results_store import record_run, RESULTS_STORE_DIR
+from checkpoint import RunJournal, resume_requested
+
+TOP_K = int(os.getenv("PIPELINE_TOP_K", "10"))  # Memes taken from the virality ranking
+QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "16"))
+DOWNLOAD_WORKERS = int(os.getenv("PIPELINE_DOWNLOAD_WORKERS", "4"))
+CLASSIFY_WORKERS = int(os.getenv("PIPELINE_CLASSIFY_WORKERS", "8"))
+GENERATE_WORKERS = int(os.getenv("PIPELINE_GENERATE_WORKERS", "2"))
+
+_DONE = object()  # End-of-stream marker passed between stages
+
+
+class StreamingPipeline:
+    """
+    Five-stage pipeline with bounded queues between stages.
+
+    Listing fetch has to see every subreddit before the top K can be ranked;
+    after that every meme is downloaded and classified independently.
+    Selection is the second barrier: once classification drains, the
+    analyzed memes go through gemini_fixed.select_nft_candidates() (quality
+    score, RANK_GROUP_BY cap), exactly as in the batch path, and the
+    chosen ones are generated concurrently.
+    """
+
+    def __init__(self, top_k: int = TOP_K, max_nft_images: int = gemini_fixed.MAX_NFT_IMAGES,
+                 queue_size: int = QUEUE_SIZE, resume: bool = False):
+        self.top_k = top_k
+        self.max_nft_images = max_nft_images
+        self.download_q: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.classify_q: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.select_q: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.generate_q: "queue.Queue" = queue.Queue(maxsize=queue_size)
+
+        self.store = MemeStore()
+        self.downloader = MemeDownloader(max_workers=DOWNLOAD_WORKERS)
+        self.client = None
+        self.cache: Optional[ClassificationCache] = None
+        self.engine = ClassificationEngine()
+        self.router: Optional[CascadeRouter] = None
+        self.prep_pool: Optional[ProcessPoolExecutor] = None
+        self.index = SeenPostIndex() if polling.INGEST_INCREMENTAL else None
+        self.resume = resume
+        self.journal = RunJournal("streaming_pipeline")
+
+        self.started = 0.0
+        self.run_id: Optional[str] = None
+        self.first_nft_at: Optional[float] = None
+        self.results: Dict[int, Dict[str, Any]] = {}
+        self.counts = {"ranked": 0, "downloaded": 0, "classified": 0, "eligible": 0, "generated": 0}
+        self._lock = threading.Lock()
+        self._print_lock = threading.Lock()
+
+    # ------------------------------------------------------------------ utils
+    def log(self, message: str):
+        with self._print_lock:
+            print(f"[{time.monotonic() - self.started:6.1f}s] {message}", flush=True)
+
+    def _bump(self, key: str):
+        with self._lock:
+            self.counts[key] += 1
+
+    def _run_workers(self, target, count: int, in_q: "queue.Queue", out_q: Optional["queue.Queue"],
+                     on_error=None) -> List[threading.Thread]:
+        """
+        Start `count` workers on in_q; the last one to finish forwards _DONE to out_q.
+        An item whose target raises is logged and handed to on_error(item) (to send a
+        placeholder downstream), so one failure never stalls the stages after it.
+        """
+        remaining = [count]
+        lock = threading.Lock()
+
+        def loop():
+            try:
+                while True:
+                    item = in_q.get()
+                    if item is _DONE:
+                        in_q.put(_DONE)  # Let sibling workers see it too
+                        break
+                    try:
+                        target(item)
+                    except Exception as e:
+                        self.log(f"[ERROR] {target.__name__} failed: {e!r}")
+                        if on_error is not None:
+                            on_error(item)
+            finally:
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last and out_q is not None:
+                    out_q.put(_DONE)
+
+        threads = [threading.Thread(target=loop, daemon=True) for _ in range(count)]
+        for t in threads:
+            t.start()
+        return threads
+
+    # ----------------------------------------------------------------- stages
+    def _journalled_ranking(self) -> List["polling.MemeRecord"]:
+        """The interrupted run's ranked memes, in rank order (empty if it never finished ranking)"""
+        if not self.journal.done("_run", "ranked"):
+            return []
+        top = []
+        for post_id in self.journal.items("ranked"):
+            if post_id == "_run":
+                continue
+            fields = self.journal.get(post_id, "ranked")
+            meme = polling.MemeRecord(post_id, fields["subreddit"], fields["score"], fields["viral_score"],
+                                      fields["total_score"], fields["keywords"], fields["title"], fields["url"])
+            meme.rank = fields["rank"]
+            top.append(meme)
+        return sorted(top, key=lambda meme: meme.rank)
+
+    def fetch_stage(self):
+        """Fetch listings (rate-limited, concurrent), rank, and feed the top K downstream"""
+        try:
+            top = self._journalled_ranking() if self.journal.resumed else []
+            if top:
+                # Same memes as the interrupted run; the download view is kept, not wiped
+                self.log(f"[RESUME] Replaying ranking of run {self.journal.run_id}: {len(top)} memes")
+            else:
+                top, _, candidates = polling.collect_memes(top_k=self.top_k, index=self.index)
+                MemeStore.clear_view(polling.SAVE_DIR)
+                self.log(f"[FETCH] Ranked {candidates} candidates, streaming top {len(top)}")
+                for rank, meme in enumerate(top, 1):
+                    meme.rank = rank
+                    self.journal.record(meme.post_id, "ranked", {
+                        "rank": rank, "subreddit": meme.subreddit, "score": meme.score,
+                        "viral_score": meme.viral_score, "total_score": meme.total_score,
+                        "keywords": list(meme.keywords), "title": meme.title, "url": meme.url,
+                    })
+                self.journal.record("_run", "ranked", len(top))
+            for meme in top:
+                self.counts["ranked"] += 1
+                self.download_q.put(meme)
+        finally:
+            self.download_q.put(_DONE)
+
+    def download_one(self, meme: "polling.MemeRecord"):
+        rank = meme.rank
+        earlier = self.journal.get(meme.post_id, "downloaded")
+        if earlier and os.path.exists(earlier["blob"]):
+            self.journal.replay(meme.post_id, "downloaded")
+            path = MemeStore.link_into(polling.SAVE_DIR, earlier["blob"], earlier["filename"])
+            self._bump("downloaded")
+            self.classify_q.put((rank, meme.post_id, path, len(meme.keywords)))
+            return
+        result = self.store.fetch_many(self.downloader, [(meme.post_id, meme.url)])[0]
+        if result['error']:
+            self.log(f"[DOWNLOAD] #{rank} failed: {result['error']}")
+            self.select_q.put((rank, None))  # Keep the reorder buffer moving
+            return
+        filename = polling.meme_filename(rank, meme)
+        path = MemeStore.link_into(polling.SAVE_DIR, result['path'], filename)
+        if self.index is not None:
+            self.index.mark_downloaded(meme.post_id, result['sha256'])
+        self.journal.record(meme.post_id, "downloaded", {"blob": result['path'], "filename": filename})
+        self._bump("downloaded")
+        self.log(f"[DOWNLOAD] #{rank} {'cached' if result['cached'] else 'saved'}: {filename}")
+        self.classify_q.put((rank, meme.post_id, path, len(meme.keywords)))
+
+    def classify_one(self, item):
+        rank, post_id, path, keywords = item
+        earlier = self.journal.replay(post_id, "classified")
+        if earlier is not None:
+            self._bump("classified")
+            self.log(f"[RESUME] #{rank} {earlier.get('template')} already analyzed")
+            self.select_q.put((rank, earlier))
+            return
+        if self.router is not None:
+            route = self.router.route(path, keywords)
+            if not route["send"]:
+                self.log(f"[CASCADE] #{rank} skipped ({route['reason']})")
+                self.journal.record(post_id, "classified", route["result"])
+                self.select_q.put((rank, route["result"]))
+                return
+        prepared = None
+        if needs_preprocess(path):
+            prepared = self.prep_pool.submit(preprocess_image, path).result()
+            if prepared["error"]:
+                self.log(f"[ANALYZE] #{rank} rejected: {prepared['error']}")
+                self.select_q.put((rank, None))
+                return
+        try:
+            # Cache hits skip the adaptive limiter: only real Gemini calls should steer its window
+            result = gemini_fixed.cached_classification(path, self.cache, prepared)
+            if result is None:
+                result = self.engine.call(lambda p: gemini_fixed.classify_image(self.client, p, self.cache, prepared), path)
+        except Exception as e:
+            self.log(f"[ANALYZE] #{rank} error: {e}")
+            self.select_q.put((rank, None))
+            return
+        if self.index is not None:
+            self.index.mark_classified(post_id)
+        if result.get("rationale") != "parse_error":
+            self.journal.record(post_id, "classified", result)
+        self._bump("classified")
+        self.log(f"[ANALYZE] #{rank} {result.get('template')} (confidence: {result.get('confidence', 0):.2f})")
+        self.select_q.put((rank, result))
+
+    def select_stage(self):
+        """Collect analyzed memes; once classification drains, rank them and send the best to generation"""
+        try:
+            while True:
+                item = self.select_q.get()
+                if item is _DONE:
+                    break
+                rank, result = item
+                if result is not None:  # None: the meme failed an earlier stage
+                    self.results[rank] = result
+
+            ordered = [self.results[rank] for rank in sorted(self.results)]
+            ranking, selected = gemini_fixed.select_nft_candidates(ordered, self.max_nft_images)
+            for item_id, result in zip(ranking.ids, ordered):
+                result["nft_eligible"] = ranking.is_eligible(item_id)
+                result["nft_generated"] = False
+                result["nft_image_path"] = None
+                result["nft_rank"] = None
+            self.counts["eligible"] = ranking.eligible_count
+            for item_id, result in zip(ranking.selected_ids(), selected):
+                self.log(f"[SELECT] {result.get('template')} selected for NFT generation "
+                         f"(quality: {ranking.score_of(item_id):.2f})")
+                self.generate_q.put(result)
+        finally:
+            self.generate_q.put(_DONE)
+
+    def generate_one(self, result: Dict[str, Any]):
+        self.log(f"[GENERATE] Generating NFT image for: {result.get('template')}")
+        nft_path = gemini_fixed.generate_nft_image_checkpointed(self.client, result, self.journal)
+        if nft_path:
+            with self._lock:
+                self.counts["generated"] += 1
+                result["nft_rank"] = self.counts["generated"]
+                if self.first_nft_at is None:
+                    self.first_nft_at = time.monotonic() - self.started
+            result["nft_generated"] = True
+            result["nft_image_path"] = nft_path
+            self.log(f"[GENERATE] NFT ready: {nft_path}")
+
+    # ------------------------------------------------------------------- run
+    def run(self) -> bool:
+        from google import genai
+
+        gemini_fixed.ensure_dirs()
+        self.client = genai.Client()  # reads GEMINI_API_KEY from environment
+        if gemini_fixed.USE_CLASSIFY_CACHE:
+            self.cache = ClassificationCache(gemini_fixed.CLASSIFY_CACHE_PATH)
+        if USE_CASCADE:
+            self.router = CascadeRouter(seen=self.index)
+        self.prep_pool = ProcessPoolExecutor(max_workers=PREPROCESS_WORKERS)
+
+        self.started = time.monotonic()
+        self.journal.start(resume=self.resume)
+        self.log("[PIPELINE] Starting in-process streaming pipeline"
+                 + (f" (resuming run {self.journal.run_id})" if self.journal.resumed else ""))
+        if self.index is not None:
+            self.index.prune()
+
+        select_thread = threading.Thread(target=self.select_stage, daemon=True)
+        select_thread.start()
+        workers = []
+        # A failed item still reaches the select stage as (rank, None), keeping its reorder buffer moving
+        workers += self._run_workers(self.download_one, DOWNLOAD_WORKERS, self.download_q, self.classify_q,
+                                     on_error=lambda meme: self.select_q.put((meme.rank, None)))
+        workers += self._run_workers(self.classify_one, CLASSIFY_WORKERS, self.classify_q, self.select_q,
+                                     on_error=lambda item: self.select_q.put((item[0], None)))
+        workers += self._run_workers(self.generate_one, GENERATE_WORKERS, self.generate_q, None)
+
+        try:
+            self.fetch_stage()
+            for t in workers + [select_thread]:
+                t.join()
+        finally:
+            self.downloader.close()
+            if self.prep_pool is not None:
+                self.prep_pool.shutdown()
+            if self.cache is not None:
+                self.cache.close()
+            gemini_fixed.close_prompt_context(self.client)
+            if self.index is not None:
+                self.index.close()
+            self.journal.close()  # No-op after finish(); an interrupted run stays resumable
+
+        self.write_results()
+        self.journal.finish()
+        self.print_summary()
+        return True
+
+    def write_results(self):
+        """Write results in rank order (same JSONL shape as gemini_fixed.main)"""
+        self.run_id = record_run([self.results[rank] for rank in sorted(self.results)], gemini_fixed.OUT_JSONL,
+                                 time.time() - (time.monotonic() - self.started))
+
+    def print_summary(self):
+        elapsed = time.monotonic() - self.started
+        print(f"\n{'='*60}", flush=True)
+        print("[COMPLETE] STREAMING PIPELINE COMPLETE")
+        print(f"  - Ranked memes: {self.counts['ranked']}")
+        print(f"  - Downloaded: {self.counts['downloaded']}")
+        print(f"  - Analyzed: {self.counts['classified']}")
+        if self.router is not None:
+            print(f"  - {self.router.summary()}")
+        print(f"  - Eligible: {self.counts['eligible']}")
+        print(f"  - NFT images generated: {self.counts['generated']}/{self.max_nft_images}")
+        if self.client is not None:
+            print(f"  - Image providers: {gemini_fixed.get_generation_chain(self.client).summary()}")
+        if gemini_fixed.get_stability_client().requests:
+            print(f"  - {gemini_fixed.get_stability_client().summary()}")
+        artwork_cache = gemini_fixed.get_generation_cache()
+        if artwork_cache is not None:
+            print(f"  - Artwork cache: {artwork_cache.hits} reused / {artwork_cache.misses} generated")
+        if self.first_nft_at is not None:
+            print(f"  - Time to first NFT: {self.first_nft_at:.1f}s")
+        print(f"  - Total time: {elapsed:.1f}s")
+        print(f"  - {self.journal.summary()}")
+        print(f"  - Analysis results: {gemini_fixed.OUT_JSONL}")
+        if self.run_id:
+            print(f"  - Results history: {RESULTS_STORE_DIR} (run {self.run_id})")
+        print(f"  - Generated NFT images: {gemini_fixed.NFT_DIR}", flush=True)
+
+
+def main() -> bool:
+    return StreamingPipeline(resume=resume_requested(sys.argv[1:])).run()
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Streaming Top-K Selector
+Keeps only the K best items seen so far in a min-heap, deduplicated by id,
+so memory and ranking cost stay O(K) however many posts are scanned.
+"""
+
+import heapq
+from typing import Any, Dict, Hashable, List, Tuple
+
+
+class TopKSelector:
+    """
+    Bounded min-heap of (score, order) keyed items.
+
+    - push() is O(log K); items that cannot make the top K are dropped at once.
+    - An id already in the heap is not stored twice; a higher score replaces it.
+    - Ties keep the item with the lower `order` (i.e. the one seen first in a
+      deterministic scan), matching a stable sort over all items.
+    - With max_per_group, at most that many items of one group (e.g. one
+      subreddit) make the final top K; each group keeps its own bounded heap.
+    """
+
+    def __init__(self, k: int, max_per_group: int = 0):
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        self.k = k
+        self.max_per_group = max_per_group
+        self._heap: List[Tuple[float, int, Hashable, Any]] = []
+        self._members: Dict[Hashable, Tuple[float, int]] = {}
+        self._groups: Dict[Hashable, "TopKSelector"] = {}
+        self.seen = 0
+
+    def _beats(self, score: float, order: int, other: Tuple[float, int]) -> bool:
+        return (score, -order) > (other[0], -other[1])
+
+    def push(self, item_id: Hashable, score: float, item: Any, order: int = 0, group: Hashable = None) -> bool:
+        """Offer an item. Returns True if it is currently kept."""
+        self.seen += 1
+        if self.max_per_group > 0:
+            selector = self._groups.get(group)
+            if selector is None:
+                selector = self._groups[group] = TopKSelector(min(self.k, self.max_per_group))
+            return selector.push(item_id, score, item, order)
+
+        current = self._members.get(item_id)
+        if current is not None:
+            if not self._beats(score, order, current):
+                return True
+            # Rare (the same post with a newer score): rebuild without the old entry
+            self._heap = [entry for entry in self._heap if entry[2] != item_id]
+            heapq.heapify(self._heap)
+            del self._members[item_id]
+
+        entry = (score, -order, item_id, item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif self._beats(score, order, (self._heap[0][0], -self._heap[0][1])):
+            evicted = heapq.heapreplace(self._heap, entry)
+            del self._members[evicted[2]]
+        else:
+            return False
+        self._members[item_id] = (score, order)
+        return True
+
+    def _entries(self) -> List[Tuple[float, int, Hashable, Any]]:
+        if self.max_per_group > 0:
+            merged = [entry for selector in self._groups.values() for entry in selector._entries()]
+            return sorted(merged, key=lambda e: (-e[0], -e[1]))[:self.k]
+        return sorted(self._heap, key=lambda e: (-e[0], -e[1]))
+
+    def __len__(self) -> int:
+        return len(self._entries())
+
+    def __contains__(self, item_id: Hashable) -> bool:
+        if self.max_per_group > 0:
+            return any(entry[2] == item_id for entry in self._entries())
+        return item_id in self._members
+
+    def results(self) -> List[Any]:
+        """Items best-first"""
+        return [entry[3] for entry in self._entries()]